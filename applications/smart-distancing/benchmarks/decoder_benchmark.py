@@ -0,0 +1,98 @@
+"""
+Benchmark of the decoding of the raw detector outputs (libs/detectors/utils/output_decoder.py).
+
+For each layout the vectorized decoder is timed against the per-candidate Python loops which the backends used
+before (the loops and the synthetic tensors of tests/fixtures.py, which tests/test_output_decoder.py checks the
+decoder against). The tensors are synthetic by default; tensors recorded on a device can be used
+instead with --tensors, an .npz file with the "boxes", "classes" and "scores" arrays of the SSD layout and/or the
+"detection_out" array of the DetectionOutput layout and/or the flat "trt_output" array of the TensorRT NMS
+plugin (DetectionOutput rows whose label 0 is the background, e.g. saved with np.savez from the backend), and the synthetic
+tensors can be saved with --save to be replayed later.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.decoder_benchmark --candidates 100,1000,10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from libs.detectors.utils.output_decoder import OutputDecoder
+from tests.fixtures import (loop_detection_output, loop_ssd, loop_trt, synthetic_detection_output,
+                            synthetic_ssd_outputs, synthetic_trt_output)
+
+
+def timeit(func, repeat):
+    t_begin = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - t_begin) * 1000 / repeat, result
+
+
+def run_case(loop, decode, repeat):
+    loop_time, _ = timeit(loop, repeat)
+    decoder_time, batches = timeit(decode, repeat)
+    detections = sum(len(batch) for batch in batches)
+    return loop_time, decoder_time, detections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--candidates', default='100,1000,10000', help='number of candidate boxes of each image')
+    parser.add_argument('--batch_size', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--class_id', type=int, default=1)
+    parser.add_argument('--min_score', type=float, default=0.25)
+    parser.add_argument('--tensors', default='', help='an .npz file of recorded output tensors')
+    parser.add_argument('--save', default='', help='save the synthetic tensors of the last size to this .npz file')
+    args = parser.parse_args()
+
+    ssd_decoder = OutputDecoder(args.class_id, args.min_score, layout="SSD")
+    detection_output_decoder = OutputDecoder(args.class_id, args.min_score, layout="DetectionOutput")
+    trt_decoder = OutputDecoder(args.class_id, args.min_score, layout="DetectionOutput", label_offset=1)
+    if args.tensors:
+        recorded = np.load(args.tensors)
+        cases = [('recorded', recorded)]
+    else:
+        cases = []
+        for size in [int(i) for i in args.candidates.split(',')]:
+            boxes, classes, scores = synthetic_ssd_outputs(args.batch_size, size, seed=size)
+            cases.append((str(size), {
+                "boxes": boxes, "classes": classes, "scores": scores,
+                "detection_out": synthetic_detection_output(args.batch_size, size, seed=size),
+                "trt_output": synthetic_trt_output(size, seed=size),
+            }))
+        if args.save:
+            np.savez(args.save, **cases[-1][1])
+
+    print('%-16s %10s %12s %12s %12s' % ('layout', 'candidates', 'loop (ms)', 'decoder (ms)', 'detections'))
+    for name, tensors in cases:
+        if "scores" in tensors:
+            boxes, classes, scores = tensors["boxes"], tensors["classes"], tensors["scores"]
+            loop_time, decoder_time, detections = run_case(
+                lambda: loop_ssd(boxes, classes, scores, args.class_id, args.min_score),
+                lambda: ssd_decoder.decode_ssd(boxes, classes, scores),
+                args.repeat,
+            )
+            print('%-16s %10s %12.3f %12.3f %12d' % ('SSD', name, loop_time, decoder_time, detections))
+        if "detection_out" in tensors:
+            output = tensors["detection_out"]
+            num_images = args.batch_size
+            loop_time, decoder_time, detections = run_case(
+                lambda: loop_detection_output(output, num_images, args.class_id, args.min_score),
+                lambda: detection_output_decoder.decode_detection_output(output, num_images),
+                args.repeat,
+            )
+            print('%-16s %10s %12.3f %12.3f %12d' % ('DetectionOutput', name, loop_time, decoder_time, detections))
+        if "trt_output" in tensors:
+            output = tensors["trt_output"]
+            loop_time, decoder_time, detections = run_case(
+                lambda: loop_trt(output, args.class_id, args.min_score),
+                lambda: trt_decoder.decode_detection_output(output),
+                args.repeat,
+            )
+            print('%-16s %10s %12.3f %12.3f %12d' % ('TensorRT', name, loop_time, decoder_time, detections))
+
+
+if __name__ == '__main__':
+    main()
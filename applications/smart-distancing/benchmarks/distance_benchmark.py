@@ -0,0 +1,144 @@
+"""
+Benchmark of the distance matrix calculation for crowds of N=10...500 people.
+
+For every crowd size the vectorized functions of libs/distances.py are timed against the per-pair loop
+implementation (Distancing.calculate_distance_of_two_points_of_boxes), and the spatial hash violation search
+(libs/spatial_hash.py) against thresholding the full matrix, also on a perspective scene where the boxes grow
+from 8 to 240 pixels towards the bottom of the frame (the pairs examined by the grids are reported). For a
+calibrated camera (libs/ground_plane.py) the lookup table gather is timed against projecting the feet with the
+homography (cv.perspectiveTransform) and the floor distances are timed with both engines. The incremental engine (libs/incremental_distances.py) is run on
+tracked sequences of a slowly walking synthetic crowd, and its time and skipped work are reported for a few
+tolerances. The scenes and the loop implementation are those of tests/fixtures.py, which tests/test_distances.py
+checks the engines against.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.distance_benchmark --sizes 10,20,50,100,200,500
+"""
+import argparse
+import time
+
+import cv2 as cv
+import numpy as np
+
+from libs.distances import center_points_distances, ground_distances
+from libs.incremental_distances import IncrementalDistances
+from libs.spatial_hash import candidate_pairs, find_violating_pairs, find_violating_points
+from tests.fixtures import (loop_distances, perspective_scene, random_scene, synthetic_ground_plane, tracked_sequence,
+                            vectorized_distances)
+from tools.objects_post_process import extract_violating_objects
+
+
+def timeit(func, repeat):
+    t_begin = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - t_begin) * 1000 / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10,20,50,100,200,500')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max_loop_size', type=int, default=200,
+                        help='the loop implementation is only timed up to this crowd size')
+    parser.add_argument('--dist_threshold', type=float, default=150)
+    parser.add_argument('--frames', type=int, default=100, help='length of the sequences of the incremental engine')
+    args = parser.parse_args()
+
+    print('%-26s %5s %12s %12s' % ('method', 'N', 'loop (ms)', 'numpy (ms)'))
+    for dist_method in ('CenterPointsDistance', 'FourCornerPointsDistance'):
+        for size in [int(i) for i in args.sizes.split(',')]:
+            objects = random_scene(size)
+            numpy_time, _ = timeit(lambda: vectorized_distances(objects, dist_method), args.repeat)
+            if size <= args.max_loop_size:
+                loop_time = '%.3f' % timeit(lambda: loop_distances(objects, dist_method), 1)[0]
+            else:
+                loop_time = '-'
+            print('%-26s %5d %12s %12.3f' % (dist_method, size, loop_time, numpy_time))
+
+    print()
+    print('%-26s %5s %12s %12s %8s' % ('method', 'N', 'matrix (ms)', 'grid (ms)', 'pairs'))
+    for dist_method in ('CenterPointsDistance', 'FourCornerPointsDistance'):
+        for size in [int(i) for i in args.sizes.split(',')]:
+            # Keep the density of the crowd constant, so the number of violations grows linearly
+            scale = max(np.sqrt(size / 20.0), 1)
+            resolution = (int(640 * scale), int(480 * scale))
+            objects = random_scene(size, resolution)
+            boxes = np.array([obj["bboxReal"] for obj in objects])
+
+            def matrix_violations():
+                return extract_violating_objects(vectorized_distances(objects, dist_method), args.dist_threshold)
+
+            matrix_time, _ = timeit(matrix_violations, args.repeat)
+            grid_time, sparse_distances = timeit(
+                lambda: find_violating_pairs(boxes, args.dist_threshold, dist_method), args.repeat
+            )
+            print('%-26s %5d %12.3f %12.3f %8d' % (
+                dist_method, size, matrix_time, grid_time, len(sparse_distances.pairs)))
+
+    print()
+    print('%-26s %5s %12s %12s %10s %8s' % ('perspective scene', 'N', 'matrix (ms)', 'grid (ms)', 'examined', 'pairs'))
+    for size in [int(i) for i in args.sizes.split(',')] + [1000, 2000]:
+        boxes = perspective_scene(size)
+        centroids = np.stack([
+            (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+            boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1],
+        ], axis=1)
+        matrix_time, _ = timeit(
+            lambda: extract_violating_objects(center_points_distances(centroids), args.dist_threshold), args.repeat
+        )
+        grid_time, sparse_distances = timeit(lambda: find_violating_pairs(boxes, args.dist_threshold), args.repeat)
+        examined = len(candidate_pairs(boxes, args.dist_threshold))
+        print('%-26s %5d %12.3f %12.3f %10d %8d' % (
+            'CenterPointsDistance', size, matrix_time, grid_time, examined, len(sparse_distances.pairs)))
+
+    print()
+    resolution = (640, 480)
+    build_time, ground_plane = timeit(lambda: synthetic_ground_plane(resolution), 1)
+    print('ground plane lookup table %dx%d built in %.3f ms' % (resolution[0], resolution[1], build_time))
+    print('%-26s %5s %12s %12s %12s %12s' % (
+        'method', 'N', 'project (ms)', 'lookup (ms)', 'matrix (ms)', 'grid (ms)'))
+    for size in [int(i) for i in args.sizes.split(',')]:
+        boxes = np.array([obj["bboxReal"] for obj in random_scene(size, resolution)])
+        feet = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+
+        def project():
+            # The feet are rounded to the pixel grid of the lookup table
+            points = np.clip(np.rint(feet), 0, [resolution[0] - 1, resolution[1] - 1])
+            return cv.perspectiveTransform(points[None].astype(np.float64), ground_plane.homography)[0]
+
+        project_time, _ = timeit(project, args.repeat)
+        lookup_time, positions = timeit(lambda: ground_plane.ground_positions(boxes), args.repeat)
+        points = positions * 100
+
+        def matrix_violations():
+            return extract_violating_objects(ground_distances(points), args.dist_threshold)
+
+        matrix_time, _ = timeit(matrix_violations, args.repeat)
+        grid_time, _ = timeit(lambda: find_violating_points(points, args.dist_threshold), args.repeat)
+        print('%-26s %5d %12.3f %12.3f %12.3f %12.3f' % (
+            'GroundPlane', size, project_time, lookup_time, matrix_time, grid_time))
+
+    print()
+    print('%-26s %5s %12s %12s %12s %8s' % ('tolerance (cm)', 'N', 'matrix (ms)', 'grid (ms)', 'incr. (ms)', 'skipped'))
+    for size in [int(i) for i in args.sizes.split(',')]:
+        frames = tracked_sequence(size, args.frames, seed=size)
+
+        def matrix_sequence():
+            return [extract_violating_objects(center_points_distances(np.stack([
+                (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1],
+            ], axis=1)), args.dist_threshold) for _, boxes in frames]
+
+        matrix_time, _ = timeit(matrix_sequence, 1)
+        grid_time, _ = timeit(lambda: [find_violating_pairs(boxes, args.dist_threshold) for _, boxes in frames], 1)
+        for tolerance in (0, 10, 20):
+            engine = IncrementalDistances(args.dist_threshold, tolerance=tolerance)
+            incremental_time, _ = timeit(lambda: [engine.update(track_ids, boxes) for track_ids, boxes in frames], 1)
+            print('%-26s %5d %12.3f %12.3f %12.3f %8.2f' % (
+                tolerance, size, matrix_time / len(frames), grid_time / len(frames), incremental_time / len(frames),
+                engine.report()["skipped_fraction"]))
+
+
+if __name__ == '__main__':
+    main()
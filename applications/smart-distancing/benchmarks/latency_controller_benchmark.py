@@ -0,0 +1,124 @@
+"""
+Simulation of the latency controller (libs/latency_controller.py) under a varying load.
+
+A camera delivers --fps frames per second to a pipeline whose stage times follow a simple cost model at
+640x480: the inference takes --inference_ms on the frames passed to the detector, the preprocessing and the
+drawing take --render_ms and the JPEG encoding takes --jpeg_ms at quality 95; the last two scale with the number
+of display pixels and the encoding also with the JPEG quality. The load of the device (other cameras, other
+processes) multiplies all of the stage times: it is 1 at first, --peak_load in the middle of the run and 1 again
+at the end. If the slowest stage cannot keep up with the camera its input queue is full, the waiting frames add
+to the latency and the excess frames are dropped.
+
+The run is simulated with the controller and with the fixed settings, and the mean latency, the fraction of the
+frames over the target and the dropped frames are reported for each phase; the controller prints its
+adjustments.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.latency_controller_benchmark --target_ms 150 --peak_load 2.5
+"""
+import argparse
+
+import numpy as np
+
+from libs.latency_controller import LatencyController
+
+RESOLUTION = (640, 480)
+QUEUE_SIZE = 2
+
+
+class ControllerConfig:
+    # The subset of ConfigEngine that LatencyController reads
+    def __init__(self, target_ms, max_stride):
+        self.sections = {
+            "App": {
+                "Resolution": "%d,%d" % RESOLUTION,
+                "TargetLatency": str(target_ms),
+                "LatencyControlInterval": "2",
+                "LatencyHysteresis": "0.2",
+                "MinResolution": "320,240",
+                "JpegQuality": "95",
+                "MinJpegQuality": "50",
+            },
+            "Detector": {"MinDetectionStride": "1", "MaxDetectionStride": str(max_stride)},
+        }
+
+    def get_section_dict(self, section):
+        return self.sections[section]
+
+
+def frame_latency(args, load, stride, resolution, jpeg_quality, detected):
+    """
+    Returns the latency of a frame (seconds) and the fraction of the frames which are dropped with the settings.
+    """
+    pixels = resolution[0] * resolution[1] / float(RESOLUTION[0] * RESOLUTION[1])
+    inference = args.inference_ms * load / 1000
+    render = (args.render_ms * pixels + args.jpeg_ms * pixels * (0.3 + 0.7 * jpeg_quality / 95.0)) * load / 1000
+    # Time of the slowest stage per frame, the inference is amortized over the stride
+    bottleneck = max(inference / stride, render)
+    latency = render + (inference if detected else 0)
+    period = 1.0 / args.fps
+    if bottleneck <= period:
+        return latency, 0.0
+    # The queue before the slowest stage is full
+    return latency + QUEUE_SIZE * bottleneck, 1 - period / bottleneck
+
+
+def simulate(args, controller):
+    # Returns the latencies of the processed frames, the phase of each frame and the dropped frames of each phase
+    rng = np.random.RandomState(0)
+    num_frames = int(args.seconds * args.fps)
+    latencies, phases, dropped = [], [], np.zeros(3)
+    stride, resolution, jpeg_quality = 1, RESOLUTION, 95
+    frames_to_detection = 0
+    total_dropped = 0.0
+    for i in range(num_frames):
+        now = i / float(args.fps)
+        phase = min(int(3 * i / num_frames), 2)
+        load = args.peak_load if phase == 1 else 1.0
+        detected = frames_to_detection <= 0
+        frames_to_detection = stride - 1 if detected else frames_to_detection - 1
+        latency, drop_fraction = frame_latency(args, load, stride, resolution, jpeg_quality, detected)
+        latency *= rng.uniform(0.9, 1.1)
+        total_dropped += drop_fraction
+        dropped[phase] += drop_fraction
+        latencies.append(latency)
+        phases.append(phase)
+        if controller is not None:
+            controller.update(latency, QUEUE_SIZE if drop_fraction > 0 else 0, int(total_dropped), now)
+            stride, resolution, jpeg_quality = (
+                controller.detection_stride, controller.resolution, controller.jpeg_quality
+            )
+    return np.array(latencies), np.array(phases), dropped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=180)
+    parser.add_argument('--fps', type=float, default=25)
+    parser.add_argument('--target_ms', type=float, default=150)
+    parser.add_argument('--peak_load', type=float, default=2.5)
+    parser.add_argument('--max_stride', type=int, default=3)
+    parser.add_argument('--inference_ms', type=float, default=35, help='inference time at load 1')
+    parser.add_argument('--render_ms', type=float, default=12, help='preprocessing and drawing time at 640x480')
+    parser.add_argument('--jpeg_ms', type=float, default=10, help='JPEG encoding time at 640x480 and quality 95')
+    args = parser.parse_args()
+
+    results = []
+    for name in ['fixed', 'controller']:
+        controller = None
+        if name == 'controller':
+            controller = LatencyController(ControllerConfig(args.target_ms, args.max_stride), 'simulated')
+        latencies, phases, dropped = simulate(args, controller)
+        results.append((name, latencies, phases, dropped))
+
+    print('%-11s %-6s %13s %12s %9s' % ('settings', 'load', 'latency (ms)', 'over target', 'dropped'))
+    for name, latencies, phases, dropped in results:
+        for phase in range(3):
+            phase_latencies = latencies[phases == phase]
+            print('%-11s %-6.1f %13.1f %12.3f %9d' % (
+                name, args.peak_load if phase == 1 else 1.0, phase_latencies.mean() * 1000,
+                np.mean(phase_latencies > args.target_ms / 1000), dropped[phase]))
+
+
+if __name__ == '__main__':
+    main()
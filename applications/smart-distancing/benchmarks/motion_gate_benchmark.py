@@ -0,0 +1,140 @@
+"""
+Benchmark of the motion gate (libs/motion_gate.py) which skips the detector on the frames that did not change.
+
+The gate runs on a synthetic corridor: a static textured background with sensor noise, which is empty most of
+the time, and a person who walks through it, stops for a while and walks away. For each MotionGateMaxSkip and
+MotionGatePixelThreshold setting the fraction of skipped inferences, the time of the gate per frame and the
+number of stale frames are reported. A frame is stale if it was skipped although the person moved more than
+--tolerance box heights since the last inference (its reused detections are wrong). The frames of a video can
+be used instead with --video, then only the skipped fraction and the time are reported.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.motion_gate_benchmark --frames 1000
+    python -m benchmarks.motion_gate_benchmark --video data/TownCentreXVID.avi --frames 500
+"""
+import argparse
+import time
+
+import cv2 as cv
+import numpy as np
+
+from libs.motion_gate import MotionGate
+
+
+class GateConfig:
+    # The subset of ConfigEngine that MotionGate reads
+    def __init__(self, max_skip, pixel_threshold, tile_fraction, tiles):
+        self.detector = {
+            "MotionGateMaxSkip": str(max_skip),
+            "MotionGatePixelThreshold": str(pixel_threshold),
+            "MotionGateTileFraction": str(tile_fraction),
+            "MotionGateTiles": tiles,
+        }
+
+    def get_section_dict(self, section):
+        return self.detector
+
+
+def corridor_frames(num_frames, resolution=(640, 480), noise=4.0, seed=0):
+    """
+    Returns the BGR frames of the synthetic corridor and the box (xmin, ymin, xmax, ymax) of the person in each
+    frame, None when the corridor is empty. The person walks in during the second fifth of the video, stands
+    during the third one and walks out during the fourth one.
+    """
+    rng = np.random.RandomState(seed)
+    width, height = resolution
+    background = cv.GaussianBlur(rng.randint(0, 256, (height, width, 3)).astype(np.uint8), (15, 15), 0)
+    person_height, person_width = height // 3, height // 8
+    y_min = height // 2
+    texture = rng.randint(20, 80, (person_height, person_width, 3)).astype(np.uint8)
+    stop_x = width // 2
+    frames, boxes = [], []
+    for i in range(num_frames):
+        phase = 5.0 * i / num_frames
+        if 1 <= phase < 2:
+            x_min = int((phase - 1) * (stop_x + person_width)) - person_width
+        elif 2 <= phase < 3:
+            x_min = stop_x
+        elif 3 <= phase < 4:
+            x_min = stop_x + int((phase - 3) * (width - stop_x))
+        else:
+            x_min = None
+        frame = background.astype(np.float32) + rng.normal(0, noise, background.shape).astype(np.float32)
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+        box = None
+        if x_min is not None:
+            x0, x1 = max(x_min, 0), min(x_min + person_width, width)
+            if x0 < x1:
+                frame[y_min:y_min + person_height, x0:x1] = texture[:, x0 - x_min:x1 - x_min]
+                box = (x0, y_min, x1, y_min + person_height)
+        frames.append(frame)
+        boxes.append(box)
+    return frames, boxes
+
+
+def video_frames(video, num_frames, resolution=(640, 480)):
+    input_cap = cv.VideoCapture(video)
+    frames = []
+    while len(frames) < num_frames:
+        _, cv_image = input_cap.read()
+        if cv_image is None:
+            break
+        frames.append(cv.resize(cv_image, resolution))
+    input_cap.release()
+    return frames
+
+
+def is_stale(box, detected_box, tolerance):
+    # True if the box of the last inference is off by more than tolerance box heights
+    if box is None or detected_box is None:
+        return box is not detected_box
+    box_height = box[3] - box[1]
+    return np.max(np.abs(np.subtract(box, detected_box))) > tolerance * box_height
+
+
+def run_gate(gate, frames, boxes, tolerance):
+    # Returns the time of the gate (ms per frame) and the number of stale frames
+    stale = 0
+    detected_box = None
+    t_begin = time.perf_counter()
+    decisions = [gate.should_detect(frame) for frame in frames]
+    gate_time = (time.perf_counter() - t_begin) * 1000 / len(frames)
+    if boxes is not None:
+        for detect, box in zip(decisions, boxes):
+            if detect:
+                detected_box = box
+            elif is_stale(box, detected_box, tolerance):
+                stale += 1
+    return gate_time, stale
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--video', default='', help='the frames of this video are used instead of the corridor')
+    parser.add_argument('--max_skip', default='10,50,250', help='the MotionGateMaxSkip settings to compare')
+    parser.add_argument('--pixel_threshold', default='15,25,40',
+                        help='the MotionGatePixelThreshold settings to compare')
+    parser.add_argument('--tile_fraction', type=float, default=0.02)
+    parser.add_argument('--tiles', default='8,6')
+    parser.add_argument('--tolerance', type=float, default=0.05,
+                        help='a skipped frame is stale if the person moved more than this many box heights')
+    args = parser.parse_args()
+
+    if args.video:
+        frames, boxes = video_frames(args.video, args.frames), None
+    else:
+        frames, boxes = corridor_frames(args.frames)
+
+    print('%8s %10s %10s %12s %8s' % ('max_skip', 'threshold', 'skipped', 'gate (ms)', 'stale'))
+    for max_skip in [int(i) for i in args.max_skip.split(',')]:
+        for pixel_threshold in [int(i) for i in args.pixel_threshold.split(',')]:
+            gate = MotionGate(GateConfig(max_skip, pixel_threshold, args.tile_fraction, args.tiles))
+            gate_time, stale = run_gate(gate, frames, boxes, args.tolerance)
+            print('%8d %10d %10.3f %12.3f %8s' % (
+                max_skip, pixel_threshold, gate.report()["skipped_fraction"], gate_time,
+                stale if boxes is not None else '-'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""
+Microbenchmarks of the post-processing hot path: ignore_large_boxes, non_max_suppression_fast (hard, class-aware,
+bottom-ordered and soft-NMS), CentroidTracker.update, AssignmentTracker.update, calculate_box_distances,
+extract_violating_objects, visualization_preparation and the drawing functions of ui/utils/visualization_utils.py.
+
+Every function runs on deterministic synthetic scenes (seeded crowds of people walking in a 640x480 frame, with
+a few duplicated and oversized boxes), so two runs on the same machine measure the same work. The "run" command
+writes the median per-call times to a JSON results file, and the "compare" command compares a results file
+with a stored baseline and exits with status 1 if a benchmark got slower than the tolerance.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.postprocess_benchmark run --output baseline.json
+    python -m benchmarks.postprocess_benchmark run --output results.json
+    python -m benchmarks.postprocess_benchmark compare baseline.json results.json --tolerance 0.2
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from libs.assignment_tracker import AssignmentTracker
+from libs.centroid_object_tracker import CentroidTracker
+from libs.core import Distancing
+from libs.detections import DetectionBatch
+from tools.objects_post_process import extract_violating_objects
+from ui.utils import visualization_utils as vis_util
+
+RESOLUTION = (640, 480)
+
+
+def synthetic_scene(num_objects, num_frames=1, duplicate_ratio=0.1, large_ratio=0.05, seed=0):
+    """
+    Generate the detections of a crowd of people walking with constant velocities.
+
+    Args:
+        num_objects: number of people in the scene
+        num_frames: number of consecutive frames
+        duplicate_ratio: fraction of the people that get a second, slightly shifted box (for the NMS)
+        large_ratio: fraction of the people that get an extra box larger than 1/4 of the frame
+        seed: seed of the random generator, the same arguments always give the same scene
+
+    Returns:
+        A list of num_frames DetectionBatch instances with normalized boxes
+    """
+    rng = np.random.RandomState(seed)
+    heights = rng.uniform(0.1, 0.4, num_objects)
+    widths = heights * rng.uniform(0.3, 0.5, num_objects) * RESOLUTION[1] / RESOLUTION[0]
+    centers = rng.uniform(0, 1, (num_objects, 2))
+    velocities = rng.normal(0, 0.003, (num_objects, 2))
+    scores = rng.uniform(0.3, 1, num_objects)
+    duplicates = rng.choice(num_objects, int(num_objects * duplicate_ratio), replace=False)
+    num_large = int(num_objects * large_ratio)
+    large_boxes = np.column_stack([rng.uniform(0, 0.3, (num_large, 2)), rng.uniform(0.7, 1, (num_large, 2))])
+
+    frames = []
+    for frame_number in range(num_frames):
+        # Bounce off the borders of the frame
+        positions = np.abs((centers + frame_number * velocities) % 2)
+        positions = np.where(positions > 1, 2 - positions, positions)
+        boxes = np.column_stack([
+            positions[:, 0] - widths / 2, positions[:, 1] - heights / 2,
+            positions[:, 0] + widths / 2, positions[:, 1] + heights / 2,
+        ])
+        shifted = boxes[duplicates] + rng.normal(0, 0.005, (len(duplicates), 1))
+        frames.append(DetectionBatch.from_arrays(
+            np.concatenate([boxes, shifted, large_boxes]),
+            scores=np.concatenate([scores, scores[duplicates], np.full(num_large, 0.5)]),
+            class_ids=np.ones(num_objects + len(duplicates) + num_large, dtype=np.int32),
+        ))
+    return frames
+
+
+class DistanceSettings:
+    # The attributes of a Distancing instance which calculate_box_distances uses
+    def __init__(self, dist_method, resolution=RESOLUTION):
+        self.dist_method = dist_method
+        self.resolution = resolution
+        self.ground_plane = None
+
+    _real_boxes = Distancing._real_boxes
+
+
+def measure(func, repeat, min_time):
+    """
+    Time a function.
+
+    Args:
+        func: a function without arguments
+        repeat: number of samples
+        min_time: minimum duration of a sample in seconds, the function is called several times per
+            sample if it is faster than that
+
+    Returns:
+        A dictionary of the median, min and mean per-call times in milliseconds
+    """
+    # Calibrate the number of calls per sample
+    number = 1
+    while True:
+        t_begin = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - t_begin
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, int(np.ceil(min_time / elapsed)))
+    samples = []
+    for _ in range(repeat):
+        t_begin = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - t_begin) * 1000 / number)
+    return {
+        "median_ms": float(np.median(samples)),
+        "min_ms": float(np.min(samples)),
+        "mean_ms": float(np.mean(samples)),
+        "calls": number * repeat,
+    }
+
+
+def tracker_sequence(frames, max_disappeared, tracker_class=CentroidTracker):
+    # Track a whole sequence with a new tracker; the time per frame is the result divided by len(frames)
+    def track():
+        tracker = tracker_class(max_disappeared=max_disappeared)
+        for frame in frames:
+            tracker.update(frame)
+    return track
+
+
+def build_benchmarks(size, args):
+    """
+    Returns a list of (name, function) tuples of the benchmarks of a crowd size.
+    """
+    frames = synthetic_scene(size, num_frames=args.tracker_frames, seed=args.seed + size)
+    detections = frames[0]
+    filtered = Distancing.ignore_large_boxes(detections)
+    unique = Distancing.non_max_suppression_fast(filtered, args.nms_threshold)
+    # Post-processed objects of every frame, the input of the tracker
+    tracked_frames = [
+        Distancing.non_max_suppression_fast(Distancing.ignore_large_boxes(frame), args.nms_threshold)
+        for frame in frames
+    ]
+    # The distance stages run on the filtered crowd, the input of the NMS, like the baselines recorded before the
+    # NMS was replaced
+    center_settings = DistanceSettings('CenterPointsDistance')
+    corner_settings = DistanceSettings('FourCornerPointsDistance')
+    distances = Distancing.calculate_box_distances(center_settings, filtered)
+    output_dict = vis_util.visualization_preparation(filtered, distances, args.dist_threshold)
+    category_index = {1: {"id": 1, "name": "Pedestrian"}}
+    frame = np.zeros((RESOLUTION[1], RESOLUTION[0], 3), dtype=np.uint8)
+    birds_eye_window = np.zeros((300, 200, 3), dtype=np.uint8)
+
+    def draw_boxes():
+        vis_util.visualize_boxes_and_labels_on_image_array(
+            frame,
+            output_dict["detection_boxes"],
+            output_dict["detection_classes"],
+            output_dict["detection_scores"],
+            output_dict["detection_colors"],
+            category_index,
+            use_normalized_coordinates=True,
+            line_thickness=3,
+        )
+
+    track = tracker_sequence(tracked_frames, args.max_track_frame)
+    assignment_track = tracker_sequence(tracked_frames, args.max_track_frame, AssignmentTracker)
+    return [
+        ("ignore_large_boxes", lambda: Distancing.ignore_large_boxes(detections)),
+        ("non_max_suppression_fast", lambda: Distancing.non_max_suppression_fast(filtered, args.nms_threshold)),
+        ("non_max_suppression_fast.ClassAware",
+         lambda: Distancing.non_max_suppression_fast(filtered, args.nms_threshold, class_aware=True)),
+        ("non_max_suppression_fast.Bottom",
+         lambda: Distancing.non_max_suppression_fast(filtered, args.nms_threshold, order="Bottom")),
+        ("non_max_suppression_fast.Soft",
+         lambda: Distancing.non_max_suppression_fast(filtered, args.nms_threshold, soft_sigma=0.5, min_score=0.25)),
+        ("CentroidTracker.update", track, len(tracked_frames)),
+        ("AssignmentTracker.update", assignment_track, len(tracked_frames)),
+        ("calculate_box_distances.CenterPointsDistance",
+         lambda: Distancing.calculate_box_distances(center_settings, filtered)),
+        ("calculate_box_distances.FourCornerPointsDistance",
+         lambda: Distancing.calculate_box_distances(corner_settings, filtered)),
+        ("extract_violating_objects", lambda: extract_violating_objects(distances, args.dist_threshold)),
+        ("visualization_preparation",
+         lambda: vis_util.visualization_preparation(filtered, distances, args.dist_threshold)),
+        ("visualize_boxes_and_labels_on_image_array", draw_boxes),
+        ("birds_eye_view",
+         lambda: vis_util.birds_eye_view(birds_eye_window, output_dict["detection_boxes"],
+                                         output_dict["violating_objects"])),
+        ("text_putter", lambda: vis_util.text_putter(frame, 'Frames rate = 30.0(fps)', (0.05, 0.93))),
+    ], {"detections": len(detections), "filtered": len(filtered), "nms_output": len(unique)}
+
+
+def run(args):
+    results = []
+    print('%-48s %5s %12s %12s' % ('benchmark', 'N', 'median (ms)', 'min (ms)'))
+    for size in [int(i) for i in args.sizes.split(',')]:
+        benchmarks, scene = build_benchmarks(size, args)
+        for benchmark in benchmarks:
+            name, func = benchmark[0], benchmark[1]
+            # Number of frames processed by one call, the times are reported per frame
+            frames_per_call = benchmark[2] if len(benchmark) > 2 else 1
+            timing = measure(func, args.repeat, args.min_time)
+            for key in ("median_ms", "min_ms", "mean_ms"):
+                timing[key] /= frames_per_call
+            results.append(dict(name=name, size=size, **timing, **scene))
+            print('%-48s %5d %12.4f %12.4f' % (name, size, timing["median_ms"], timing["min_ms"]))
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "arguments": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as results_file:
+        json.dump(report, results_file, indent=2)
+    print('results are written to', args.output)
+
+
+def compare(args):
+    """
+    Compare the median times of a results file with a baseline. A benchmark is a regression if it is more
+    than tolerance (relative) and min_difference (absolute, milliseconds) slower than the baseline.
+
+    Returns:
+        The number of regressions
+    """
+    with open(args.baseline) as baseline_file:
+        baseline = {(r["name"], r["size"]): r for r in json.load(baseline_file)["results"]}
+    with open(args.results) as results_file:
+        results = {(r["name"], r["size"]): r for r in json.load(results_file)["results"]}
+
+    regressions = 0
+    print('%-48s %5s %12s %12s %8s  %s' % ('benchmark', 'N', 'base (ms)', 'new (ms)', 'ratio', 'status'))
+    for key in sorted(set(baseline) | set(results), key=lambda k: (k[1], k[0])):
+        name, size = key
+        if key not in results:
+            print('%-48s %5d %12.4f %12s %8s  %s' % (name, size, baseline[key]["median_ms"], '-', '-', 'MISSING'))
+            continue
+        if key not in baseline:
+            print('%-48s %5d %12s %12.4f %8s  %s' % (name, size, '-', results[key]["median_ms"], '-', 'NEW'))
+            continue
+        base_time, new_time = baseline[key]["median_ms"], results[key]["median_ms"]
+        ratio = new_time / base_time if base_time > 0 else float('inf')
+        difference = new_time - base_time
+        if ratio > 1 + args.tolerance and difference > args.min_difference:
+            status = 'REGRESSION'
+            regressions += 1
+        elif ratio < 1 - args.tolerance and -difference > args.min_difference:
+            status = 'IMPROVED'
+        else:
+            status = 'OK'
+        print('%-48s %5d %12.4f %12.4f %8.2f  %s' % (name, size, base_time, new_time, ratio, status))
+    print('%d regressions' % regressions)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and write a results file')
+    run_parser.add_argument('--output', default='postprocess_benchmark.json')
+    run_parser.add_argument('--sizes', default='10,50,100,200,500')
+    run_parser.add_argument('--repeat', type=int, default=7, help='number of samples of each benchmark')
+    run_parser.add_argument('--min_time', type=float, default=0.02, help='minimum duration of a sample (seconds)')
+    run_parser.add_argument('--tracker_frames', type=int, default=10)
+    run_parser.add_argument('--nms_threshold', type=float, default=0.5)
+    run_parser.add_argument('--dist_threshold', type=float, default=150)
+    run_parser.add_argument('--max_track_frame', type=int, default=5)
+    run_parser.add_argument('--seed', type=int, default=0)
+
+    compare_parser = subparsers.add_parser('compare', help='compare a results file with a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--tolerance', type=float, default=0.2,
+                                help='relative slowdown that is reported as a regression')
+    compare_parser.add_argument('--min_difference', type=float, default=0.005,
+                                help='slowdowns smaller than this (milliseconds) are ignored as noise')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif compare(args) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Microbenchmark of the frame preprocessing (display resize, detector resize and color conversion).
+
+It compares the allocating implementation (a new array for every step of every frame) with the
+preallocated FramePreprocessor on synthetic 1080p frames.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.preprocessing_benchmark --frames 500
+"""
+import argparse
+import time
+import tracemalloc
+
+import cv2 as cv
+import numpy as np
+
+from libs.preprocessor import FramePreprocessor
+
+
+def allocating_preprocess(cv_image, resolution, image_size):
+    # The per-frame implementation which FramePreprocessor replaces
+    resolution = [int(i) for i in resolution.split(',')]
+    cv_image = cv.resize(cv_image, tuple(resolution))
+    resized_image = cv.resize(cv_image, tuple(image_size))
+    rgb_resized_image = cv.cvtColor(resized_image, cv.COLOR_BGR2RGB)
+    return cv_image, rgb_resized_image
+
+
+def measure(func, frames):
+    """
+    Returns the mean time (ms) and the mean peak of the memory allocated (bytes) by func per frame.
+    """
+    # Warm up
+    for frame in frames[:10]:
+        func(frame)
+    t_begin = time.perf_counter()
+    for frame in frames:
+        func(frame)
+    elapsed_time = time.perf_counter() - t_begin
+
+    tracemalloc.start()
+    peaks = []
+    for frame in frames[:50]:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        func(frame)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - start)
+    tracemalloc.stop()
+    return elapsed_time * 1000 / len(frames), float(np.mean(peaks))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--input_size', default='1920,1080', help='width,height of the input frames')
+    parser.add_argument('--resolution', default='640,480')
+    parser.add_argument('--image_size', default='300,300')
+    args = parser.parse_args()
+
+    input_width, input_height = [int(i) for i in args.input_size.split(',')]
+    image_size = [int(i) for i in args.image_size.split(',')]
+    resolution = [int(i) for i in args.resolution.split(',')]
+    rng = np.random.RandomState(0)
+    # A few distinct frames, so the benchmark is not dominated by cache effects of a single frame
+    frames = [rng.randint(0, 256, (input_height, input_width, 3), dtype=np.uint8) for _ in range(4)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    preprocessor = FramePreprocessor(resolution, image_size, num_buffers=2)
+    results = {
+        'allocating': measure(lambda frame: allocating_preprocess(frame, args.resolution, image_size), frames),
+        'preallocated': measure(preprocessor.process, frames),
+    }
+    print('input %dx%d -> display %s, detector %s' % (input_width, input_height, args.resolution, args.image_size))
+    for name, (frame_time, allocated_bytes) in results.items():
+        print('%-13s %8.3f ms/frame %12.0f bytes allocated/frame' % (name, frame_time, allocated_bytes))
+
+
+if __name__ == '__main__':
+    main()
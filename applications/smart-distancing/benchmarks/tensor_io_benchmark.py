@@ -0,0 +1,138 @@
+"""
+Benchmark of the zero-copy tensor access of the TFLite detectors (libs/detectors/utils/tensor_io.py).
+
+The same frames go through the two ways of feeding a TFLite SSD model and reading its outputs:
+    copy: the frame is resized and converted into a buffer of the preprocessor, copied into the interpreter with
+        set_tensor, and every output is copied out with get_tensor before it is decoded
+    zero-copy: the frame is resized and converted straight into the view of the input tensor, and the outputs are
+        decoded from views of the output tensors
+The bytes which are copied for each frame, the mean time of a frame and the time of a frame without the invoke
+(the part the two ways differ in) are reported, and the detections of both ways are checked to be equal.
+The interpreter of tflite_runtime is used, or the one of tensorflow if tflite_runtime is not installed.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.tensor_io_benchmark --model PATH.tflite [--edgetpu] --frames 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from libs.detectors.utils.output_decoder import OutputDecoder
+from libs.detectors.utils.tensor_io import InterpreterTensors
+from libs.preprocessor import FramePreprocessor
+
+
+def synthetic_frames(num_frames, size=(1280, 720), seed=0):
+    # Smooth random BGR frames, so the resize does real work
+    rng = np.random.RandomState(seed)
+    width, height = size
+    frames = []
+    for _ in range(num_frames):
+        coarse = rng.randint(0, 256, (height // 8, width // 8, 3)).astype(np.uint8)
+        frames.append(np.ascontiguousarray(np.repeat(np.repeat(coarse, 8, axis=0), 8, axis=1)))
+    return frames
+
+
+class CopyPath:
+    # The set_tensor / get_tensor implementation which InterpreterTensors replaces
+    def __init__(self, interpreter, preprocessor, decoder):
+        self.interpreter = interpreter
+        self.preprocessor = preprocessor
+        self.decoder = decoder
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
+        self.invoke_time = 0
+
+    def __call__(self, frame):
+        _, rgb_resized_image = self.preprocessor.process(frame)
+        self.interpreter.set_tensor(self.input_details[0]["index"], np.expand_dims(rgb_resized_image, axis=0))
+        t_begin = time.perf_counter()
+        self.interpreter.invoke()
+        self.invoke_time += time.perf_counter() - t_begin
+        boxes = self.interpreter.get_tensor(self.output_details[0]['index'])
+        labels = self.interpreter.get_tensor(self.output_details[1]['index'])
+        scores = self.interpreter.get_tensor(self.output_details[2]['index'])
+        return self.decoder.decode_ssd(boxes, labels, scores)[0]
+
+
+class ZeroCopyPath:
+    def __init__(self, interpreter, preprocessor, decoder):
+        self.tensors = InterpreterTensors(interpreter)
+        self.preprocessor = preprocessor
+        self.decoder = decoder
+        self.invoke_time = 0
+
+    def __call__(self, frame):
+        display_frame = self.preprocessor.resize_display(frame)
+        result = self.tensors.run(
+            lambda input_image: self.preprocessor.prepare_detector_input(display_frame, input_image),
+            lambda boxes, labels, scores: self.decoder.decode_ssd(boxes, labels, scores)[0],
+        )
+        self.invoke_time += self.tensors.inference_time
+        return result
+
+
+def measure(path, frames, warmup=5):
+    # Mean time (ms) of a frame and of a frame without the invoke, and the results
+    for frame in frames[:warmup]:
+        path(frame)
+    path.invoke_time = 0
+    t_begin = time.perf_counter()
+    results = [path(frame) for frame in frames]
+    total_time = (time.perf_counter() - t_begin) * 1000 / len(frames)
+    return total_time, total_time - path.invoke_time * 1000 / len(frames), results
+
+
+def load_interpreter(model, edgetpu):
+    # The interpreter of tflite_runtime, or of tensorflow if tflite_runtime is not installed
+    try:
+        from tflite_runtime.interpreter import Interpreter, load_delegate
+    except ImportError:
+        try:
+            from tensorflow.lite.python.interpreter import Interpreter, load_delegate
+        except ImportError:
+            raise SystemExit('the tensor io benchmark needs tflite_runtime or tensorflow, neither is installed')
+    delegates = [load_delegate("libedgetpu.so.1")] if edgetpu else None
+    return Interpreter(model, experimental_delegates=delegates)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', required=True, help='a TFLite SSD model with the postprocess op')
+    parser.add_argument('--edgetpu', action='store_true', help='load the EdgeTPU delegate (an _edgetpu model)')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--input_size', default='1280,720', help='width,height of the input frames')
+    parser.add_argument('--resolution', default='640,480')
+    parser.add_argument('--class_id', type=int, default=0)
+    parser.add_argument('--min_score', type=float, default=0.25)
+    args = parser.parse_args()
+
+    interpreter = load_interpreter(args.model, args.edgetpu)
+    interpreter.allocate_tensors()
+    tensors = InterpreterTensors(interpreter)
+    if tensors.input_dtype != np.uint8:
+        raise ValueError('the benchmark feeds uint8 images, the model input is ' + str(tensors.input_dtype))
+    input_height, input_width = tensors.input_shape[:2]
+    resolution = [int(i) for i in args.resolution.split(',')]
+    frames = synthetic_frames(args.frames, tuple(int(i) for i in args.input_size.split(',')))
+    decoder = OutputDecoder(args.class_id, args.min_score)
+
+    print('%-10s %14s %12s %16s %8s' % ('path', 'copied (B)', 'frame (ms)', 'no invoke (ms)', 'equal'))
+    copy_path = CopyPath(interpreter, FramePreprocessor(resolution, (input_width, input_height)), decoder)
+    copy_time, copy_io_time, copy_results = measure(copy_path, frames)
+    print('%-10s %14d %12.3f %16.3f %8s' % (
+        'copy', tensors.input_bytes + tensors.output_bytes, copy_time, copy_io_time, '-'))
+    zero_copy_path = ZeroCopyPath(interpreter, FramePreprocessor(resolution, (input_width, input_height)), decoder)
+    zero_copy_time, zero_copy_io_time, zero_copy_results = measure(zero_copy_path, frames)
+    equal = all(
+        np.array_equal(a.boxes, b.boxes) and np.array_equal(a.scores, b.scores)
+        for a, b in zip(copy_results, zero_copy_results)
+    )
+    print('%-10s %14d %12.3f %16.3f %8s' % ('zero-copy', 0, zero_copy_time, zero_copy_io_time, equal))
+    print('saved %d bytes and %.3f ms per frame' % (
+        tensors.input_bytes + tensors.output_bytes, copy_io_time - zero_copy_io_time))
+
+
+if __name__ == '__main__':
+    main()
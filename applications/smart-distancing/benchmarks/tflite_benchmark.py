@@ -0,0 +1,90 @@
+"""
+Throughput of the CPU TFLite detector (libs/detectors/tflite/) for several [Detector] NumThreads settings.
+
+For each thread count the model of the config is loaded in a new interpreter and run on the same frames (the
+frames of --video resized to [Detector] ImageSize, or seeded random frames), and the mean and median inference
+time, the frames per second and the speedup over one thread are reported. The detections of every setting are
+checked against the single-threaded run, the number of threads must not change the results. The detector needs
+tflite_runtime, the benchmark exits with a message if it is not installed.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.tflite_benchmark --config config-skeleton.ini --model PATH.tflite --threads 1,2,4,Auto
+"""
+import argparse
+import time
+
+import cv2 as cv
+import numpy as np
+
+from libs.config_engine import ConfigEngine
+
+
+def load_frames(video, num_frames, image_size, seed=0):
+    # num_frames RGB frames of image_size (width, height)
+    frames = []
+    if video:
+        input_cap = cv.VideoCapture(video)
+        while len(frames) < num_frames:
+            _, cv_image = input_cap.read()
+            if cv_image is None:
+                break
+            frames.append(cv.cvtColor(cv.resize(cv_image, image_size), cv.COLOR_BGR2RGB))
+        input_cap.release()
+    if len(frames) == 0:
+        rng = np.random.RandomState(seed)
+        frames = [rng.randint(0, 256, (image_size[1], image_size[0], 3), dtype=np.uint8) for _ in range(num_frames)]
+    return frames
+
+
+def run(detector, frames, warmup=5):
+    # Per-frame inference times (ms) and results
+    for frame in frames[:warmup]:
+        detector.inference(frame)
+    times, results = [], []
+    for frame in frames:
+        t_begin = time.perf_counter()
+        results.append(detector.inference(frame))
+        times.append((time.perf_counter() - t_begin) * 1000)
+    return np.array(times), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', default='config-skeleton.ini')
+    parser.add_argument('--model', default='', help='the .tflite file, defaults to [Detector] ModelPath')
+    parser.add_argument('--threads', default='1,2,4,Auto', help='the NumThreads settings to compare')
+    parser.add_argument('--video', default='', help='the frames of this video are used instead of random frames')
+    parser.add_argument('--frames', type=int, default=100)
+    args = parser.parse_args()
+
+    try:
+        from libs.detectors.tflite.mobilenet_ssd import Detector
+    except ImportError as e:
+        raise SystemExit('the tflite benchmark needs tflite_runtime (' + str(e) + ')')
+    config = ConfigEngine(args.config)
+    detector_config = config.get_section_dict('Detector')
+    if args.model:
+        detector_config['ModelPath'] = args.model
+    image_size = tuple(int(i) for i in detector_config['ImageSize'].split(',')[:2])
+    frames = load_frames(args.video, args.frames, image_size)
+
+    print('%-8s %8s %12s %12s %8s %8s %8s' % ('setting', 'threads', 'mean (ms)', 'median (ms)', 'fps', 'speedup',
+                                              'equal'))
+    base_time, base_results = None, None
+    for num_threads in args.threads.split(','):
+        detector_config['NumThreads'] = num_threads
+        detector = Detector(config)
+        times, results = run(detector, frames)
+        if base_results is None:
+            base_time, base_results = times.mean(), results
+        equal = all(
+            np.array_equal(base.boxes, result.boxes) and np.array_equal(base.scores, result.scores)
+            for base, result in zip(base_results, results)
+        )
+        print('%-8s %8d %12.3f %12.3f %8.1f %8.2f %8s' % (
+            num_threads, detector.num_threads, times.mean(), np.median(times), 1000 / times.mean(),
+            base_time / times.mean(), equal))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark of the ROI crops and the tiled inference (libs/inference_regions.py).
+
+A detector misses the people who cover too few pixels of its input, so squashing a wide high-resolution frame
+to 300x300 loses the distant pedestrians. The benchmark simulates such a detector on the seeded synthetic crowd
+of the Dummy device: a person is detected in a region if at least half of the box is inside of the region and
+the visible part is at least --min_pixels high in the detector input (the box is clipped to the region, so the
+people who cross a tile border are also detected partly in the neighbouring tile). For the whole frame, a
+region of interest and a few tile grids (with and without the extra pass on the whole region) it reports the number of inferences per frame, the recall of the people
+whose feet are in the region of interest, the duplicated boxes left after the cross-tile NMS and the time of the
+merge.
+
+Usage (from applications/smart-distancing):
+    python -m benchmarks.tiled_inference_benchmark --frames 200 --min_pixels 30
+"""
+import argparse
+import time
+
+import numpy as np
+
+from libs.detections import DetectionBatch
+from libs.detectors.dummy.crowd import SyntheticCrowd
+from libs.inference_regions import InferenceRegions
+
+RESOLUTION = (640, 480)
+# The people of the synthetic crowd appear below 20% of the frame height
+ROI_POINTS = [[0, 0.2 * RESOLUTION[1]], [RESOLUTION[0], 0.2 * RESOLUTION[1]], [RESOLUTION[0], RESOLUTION[1]],
+              [0, RESOLUTION[1]]]
+
+
+def simulated_detector(boxes, rect, input_height, min_pixels, rng):
+    """
+    Returns the DetectionBatch which the simulated detector outputs for the region rect of a frame whose persons
+    have the normalized boxes, with boxes normalized to the region. The class id of a box is the index of its
+    person, so the duplicates can be counted after the merge.
+    """
+    clipped = np.concatenate([np.maximum(boxes[:, :2], rect[:2]), np.minimum(boxes[:, 2:], rect[2:])], axis=1)
+    widths, heights = clipped[:, 2] - clipped[:, 0], clipped[:, 3] - clipped[:, 1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    visible = np.where((widths > 0) & (heights > 0), widths * heights, 0) / areas
+    region_height = rect[3] - rect[1]
+    detected = (visible >= 0.5) & (heights / region_height * input_height >= min_pixels)
+    size = np.array([rect[2] - rect[0], region_height] * 2)
+    region_boxes = (clipped[detected] - rect[[0, 1, 0, 1]]) / size
+    region_boxes += rng.normal(0, 0.005, region_boxes.shape)
+    scores = np.clip(0.5 + 0.4 * visible[detected] + rng.normal(0, 0.02, int(detected.sum())), 0, 1)
+    return DetectionBatch.from_arrays(np.clip(region_boxes, 0, 1), scores=scores, class_ids=np.flatnonzero(detected))
+
+
+def evaluate(regions, scenes, input_height, min_pixels, roi):
+    # Returns the recall, the duplicated boxes per frame and the time of the merge (ms per frame)
+    rng = np.random.RandomState(0)
+    found, total, duplicates, merge_time = 0, 0, 0, 0.0
+    for boxes in scenes:
+        outputs = [simulated_detector(boxes, rect, input_height, min_pixels, rng) for rect in regions.rects]
+        t_begin = time.perf_counter()
+        merged = regions.merge(outputs)
+        merge_time += time.perf_counter() - t_begin
+        truth = np.flatnonzero(roi.inside(boxes))
+        persons = np.unique(merged.class_ids)
+        found += len(np.intersect1d(truth, persons))
+        total += len(truth)
+        duplicates += len(merged) - len(persons)
+    return found / max(total, 1), duplicates / len(scenes), merge_time * 1000 / len(scenes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--crowd_size', type=int, default=40)
+    parser.add_argument('--input_height', type=int, default=300, help='height of the detector input')
+    parser.add_argument('--min_pixels', type=float, default=30,
+                        help='the simulated detector misses the people smaller than this in its input')
+    parser.add_argument('--overlap', type=float, default=0.2)
+    parser.add_argument('--merge_threshold', type=float, default=0.6)
+    args = parser.parse_args()
+
+    crowd = SyntheticCrowd(args.crowd_size, seed=0)
+    scenes = []
+    for _ in range(args.frames):
+        crowd.step()
+        scenes.append(np.clip(crowd.boxes(), 0, 1))
+    roi = InferenceRegions(RESOLUTION, ROI_POINTS)
+
+    print('%-14s %11s %8s %12s %11s' % ('regions', 'inferences', 'recall', 'duplicates', 'merge (ms)'))
+    settings = [
+        ('frame', None, (1, 1), False), ('roi', ROI_POINTS, (1, 1), False),
+        ('tiles 2x2', None, (2, 2), False), ('tiles 2x2+full', None, (2, 2), True),
+        ('tiles 3x2+full', None, (3, 2), True), ('roi 2x2', ROI_POINTS, (2, 2), False),
+        ('roi 2x2+full', ROI_POINTS, (2, 2), True), ('roi 3x2+full', ROI_POINTS, (3, 2), True),
+    ]
+    for name, roi_points, tiles, full_region in settings:
+        regions = InferenceRegions(RESOLUTION, roi_points, tiles, args.overlap, args.merge_threshold, full_region)
+        recall, duplicates, merge_time = evaluate(regions, scenes, args.input_height, args.min_pixels, roi)
+        print('%-14s %11d %8.3f %12.2f %11.3f' % (name, len(regions), recall, duplicates, merge_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+A multi-object tracker that assigns the detections of a frame to the tracks optimally.
+
+The state of all of the tracks is one structured numpy array (TRACK_DTYPE), so the prediction, the cost matrix
+and the bookkeeping of a frame are a few vectorized operations whatever the number of tracks. Each frame:
+
+1. every track is moved by its velocity (constant-velocity prediction),
+2. the (track, detection) pairs within a gate are found and their cost is computed: 1 - IoU of the boxes, or
+   the distance of the centroids in predicted box heights. The pairs outside of the gate (or of different
+   classes) can not be matched. In a crowd, the detections near each track are first found with the grids of
+   libs/spatial_hash.py, so the gate is not tested on all of the N x M pairs,
+3. the pairs which are the only candidate of both their track and their detection are matched directly, the
+   remaining ambiguous tracks and detections are assigned by the Hungarian algorithm
+   (scipy.optimize.linear_sum_assignment), so the solver only sees the crowded parts of the scene,
+4. the unmatched detections start new tracks and the tracks unmatched for more than max_disappeared frames
+   are removed.
+
+Track ids are integers which are never reused, so an id identifies the same person across frames. The tracker
+also keeps the last history_length positions, box heights and timestamps of each track, see
+libs/trajectory_history.py and the trajectory and trajectories methods.
+"""
+from collections import OrderedDict
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from libs.detections import DetectionBatch
+from libs.nms import intersections_and_area_sums
+from libs.spatial_hash import grid_pairs, height_bands
+from libs.trajectory_history import TrajectoryHistory
+
+TRACK_DTYPE = np.dtype([
+    ("track_id", np.int64),
+    # Normalized (xmin, ymin, xmax, ymax) of the box, predicted for the current frame
+    ("bbox", np.float64, (4,)),
+    ("score", np.float32),
+    ("class_id", np.int32),
+    # Normalized centroid displacement per frame
+    ("velocity", np.float64, (2,)),
+    # Number of consecutive frames without a matching detection
+    ("disappeared", np.int32),
+    # Frame number and centroid of the last matching detection
+    ("last_frame", np.int64),
+    ("last_centroid", np.float64, (2,)),
+])
+
+COSTS = ("IoU", "Centroid")
+# Above this number of (track, detection) pairs (about 256 tracks and detections), the gate is only tested on the
+# pairs found by the grids, which costs a fixed number of numpy calls per band of heights
+GRID_PAIRS = 65536
+
+
+class AssignmentTracker:
+    """
+    Track the detected objects with an optimal assignment of the detections to the tracks, see the module
+    docstring. It has the same interface as CentroidTracker.
+
+    :param max_disappeared: A track which is not matched for more than max_disappeared frames is removed.
+    :param cost: "IoU" matches the boxes by 1 - IoU, "Centroid" by the distance of the centroids relative to the
+        height of the box of the track.
+    :param min_iou: Minimum IoU of a match with the IoU cost.
+    :param max_distance: Maximum centroid distance (in box heights) of a match with the Centroid cost.
+    :param history_length: Number of frames of the trajectory history of each track.
+    """
+
+    def __init__(self, max_disappeared=50, cost="IoU", min_iou=0.1, max_distance=1.0, history_length=32):
+        if cost not in COSTS:
+            raise ValueError("unknown tracker cost: " + str(cost))
+        self.max_disappeared = max_disappeared
+        self.cost = cost
+        self.min_iou = min_iou
+        self.max_distance = max_distance
+        # Maximum cost of a match, and the cost of leaving a track or a detection unmatched
+        self.max_cost = 1 - min_iou if cost == "IoU" else max_distance
+        self.tracks = np.empty(0, dtype=TRACK_DTYPE)
+        # Row i of the history belongs to the track of row i of self.tracks
+        self.history = TrajectoryHistory(history_length)
+        self.nextobject_id = 0
+        # Number of frames seen by the tracker (updated or predicted)
+        self.frame_number = 0
+
+    @staticmethod
+    def _centroids(boxes):
+        return np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2])
+
+    def _advance(self):
+        # Constant-velocity prediction of the boxes of the next frame
+        self.frame_number += 1
+        if len(self.tracks) > 0:
+            self.tracks["bbox"] += np.tile(self.tracks["velocity"], 2)
+
+    def _candidate_pairs(self, boxes):
+        """
+        Returns the (track indices, detection indices) of the pairs within the gate. The gate is tested in
+        float32 without divisions, only the costs of these pairs are computed. For small scenes (or an IoU gate
+        of 0, which every pair passes) the gate of all of the pairs is tested at once, otherwise only on the
+        pairs found by _grid_pairs.
+        """
+        track_boxes = self.tracks["bbox"].astype(np.float32)
+        boxes = boxes.astype(np.float32)
+        if len(track_boxes) * len(boxes) <= GRID_PAIRS or (self.cost == "IoU" and not self.min_iou > 0):
+            if self.cost == "IoU":
+                intersections, area_sums = intersections_and_area_sums(track_boxes, boxes)
+                # IoU >= min_iou
+                gate = intersections * (1 + self.min_iou) >= self.min_iou * area_sums
+            else:
+                track_centroids, centroids = self._centroids(track_boxes), self._centroids(boxes)
+                squared_distances = ((track_centroids[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+                max_distances = self.max_distance * (track_boxes[:, 3] - track_boxes[:, 1])
+                gate = squared_distances <= (max_distances ** 2)[:, None]
+            return np.nonzero(gate)
+        num_detections = len(boxes)
+        rows, cols = self._grid_pairs(track_boxes, boxes)
+        track_boxes, boxes = track_boxes[rows], boxes[cols]
+        if self.cost == "IoU":
+            widths = np.minimum(track_boxes[:, 2], boxes[:, 2]) - np.maximum(track_boxes[:, 0], boxes[:, 0])
+            heights = np.minimum(track_boxes[:, 3], boxes[:, 3]) - np.maximum(track_boxes[:, 1], boxes[:, 1])
+            intersections = np.maximum(widths, 0) * np.maximum(heights, 0)
+            area_sums = ((track_boxes[:, 2] - track_boxes[:, 0]) * (track_boxes[:, 3] - track_boxes[:, 1])
+                         + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]))
+            gate = intersections * (1 + self.min_iou) >= self.min_iou * area_sums
+        else:
+            offsets = self._centroids(track_boxes) - self._centroids(boxes)
+            max_distances = self.max_distance * (track_boxes[:, 3] - track_boxes[:, 1])
+            gate = (offsets ** 2).sum(axis=1) <= max_distances ** 2
+        rows, cols = rows[gate], cols[gate]
+        # Same order as np.nonzero on the dense gate
+        order = np.argsort(rows * num_detections + cols, kind="stable")
+        return rows[order], cols[order]
+
+    def _grid_pairs(self, track_boxes, boxes):
+        """
+        Returns the (track indices, detection indices) of the pairs whose centroids are close enough to be
+        within the gate, a superset of the pairs within the gate. The tracks (and for the IoU gate the
+        detections) are grouped in bands of similar heights (see libs/spatial_hash.py height_bands) and the grid
+        of each band is sized by its largest boxes, so a few large boxes do not widen the search of the others:
+
+        - IoU gate: two boxes only overlap if their centroids are closer than half the sum of their widths
+          (heights) horizontally (vertically), so the centroids of a pair of bands are divided by these half
+          sums and bucketed into unit cells. A box overlaps another with IoU >= min_iou only if it is at most
+          1 / min_iou times as tall, the pairs of bands further apart are skipped.
+        - Centroid gate: the centroids are at most max_distance times the height of the track apart.
+
+        Each candidate costs several times a pair of the dense gate, so in a scene packed so tightly that most
+        of the boxes overlap (a third of the pairs are candidates) the grids are about twice as slow as the
+        dense gate; in a crowd spread over the frame they only return a few candidates per track.
+        """
+        track_centroids, centroids = self._centroids(track_boxes), self._centroids(boxes)
+        track_sizes = np.column_stack([track_boxes[:, 2] - track_boxes[:, 0], track_boxes[:, 3] - track_boxes[:, 1]])
+        all_rows, all_cols = [], []
+        if self.cost == "IoU":
+            sizes = np.column_stack([boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]])
+            detection_bands = height_bands(sizes[:, 1])
+            for band in height_bands(track_sizes[:, 1]):
+                band_sizes = track_sizes[band]
+                for detection_band in detection_bands:
+                    detection_sizes = sizes[detection_band]
+                    if (detection_sizes[:, 1].min() * self.min_iou > band_sizes[:, 1].max()
+                            or band_sizes[:, 1].min() * self.min_iou > detection_sizes[:, 1].max()):
+                        continue
+                    scale = np.maximum((band_sizes.max(axis=0) + detection_sizes.max(axis=0)) / 2 * 1.001, 1e-6)
+                    pairs = grid_pairs(track_centroids[band] / scale, centroids[detection_band] / scale, 1.0)
+                    all_rows.append(band[pairs[:, 0]])
+                    all_cols.append(detection_band[pairs[:, 1]])
+        else:
+            reaches = self.max_distance * track_sizes[:, 1]
+            for band in height_bands(reaches):
+                pairs = grid_pairs(track_centroids[band], centroids, max(float(reaches[band].max()) * 1.001, 1e-6))
+                all_rows.append(band[pairs[:, 0]])
+                all_cols.append(pairs[:, 1])
+        if len(all_rows) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(all_rows), np.concatenate(all_cols)
+
+    def _costs(self, track_boxes, boxes):
+        # The cost of each pair of track_boxes[k] and boxes[k]
+        if self.cost == "IoU":
+            widths = np.minimum(track_boxes[:, 2], boxes[:, 2]) - np.maximum(track_boxes[:, 0], boxes[:, 0])
+            heights = np.minimum(track_boxes[:, 3], boxes[:, 3]) - np.maximum(track_boxes[:, 1], boxes[:, 1])
+            intersections = np.maximum(widths, 0) * np.maximum(heights, 0)
+            unions = ((track_boxes[:, 2] - track_boxes[:, 0]) * (track_boxes[:, 3] - track_boxes[:, 1])
+                      + (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]) - intersections)
+            return 1 - np.divide(intersections, unions, out=np.zeros_like(intersections), where=unions > 0)
+        track_heights = np.maximum(track_boxes[:, 3] - track_boxes[:, 1], 1e-6)
+        offsets = self._centroids(track_boxes) - self._centroids(boxes)
+        return np.hypot(offsets[:, 0], offsets[:, 1]) / track_heights
+
+    def _assign(self, rows, cols, costs, num_detections):
+        """
+        Solve the assignment of the candidate pairs (rows[k], cols[k]) with the costs costs[k], all of them
+        within the gate.
+
+        Returns the (track indices, detection indices) of the matched pairs.
+        """
+        row_candidates = np.bincount(rows, minlength=len(self.tracks))
+        col_candidates = np.bincount(cols, minlength=num_detections)
+        # A pair whose track and detection have no other candidate is an isolated match
+        unique = (row_candidates[rows] == 1) & (col_candidates[cols] == 1)
+        matched_rows, matched_cols = rows[unique], cols[unique]
+        if np.all(unique):
+            return matched_rows, matched_cols
+        # The remaining tracks and detections are in the crowded parts of the scene
+        ambiguous_rows = np.unique(rows[~unique])
+        ambiguous_cols = np.unique(cols[~unique])
+        sub_rows = np.searchsorted(ambiguous_rows, rows[~unique])
+        sub_cols = np.searchsorted(ambiguous_cols, cols[~unique])
+        # A pair outside of the gate costs as much as leaving its track unmatched, so the solver does not
+        # shift a chain of neighbouring tracks to match one more detection
+        sub_costs = np.full((len(ambiguous_rows), len(ambiguous_cols)), self.max_cost)
+        sub_costs[sub_rows, sub_cols] = costs[~unique]
+        sub_gate = np.zeros(sub_costs.shape, dtype=bool)
+        sub_gate[sub_rows, sub_cols] = True
+        solved_rows, solved_cols = linear_sum_assignment(sub_costs)
+        matched = sub_gate[solved_rows, solved_cols]
+        matched_rows = np.concatenate([matched_rows, ambiguous_rows[solved_rows[matched]]])
+        matched_cols = np.concatenate([matched_cols, ambiguous_cols[solved_cols[matched]]])
+        return matched_rows, matched_cols
+
+    def _register(self, detections):
+        # Start a new track for each detection
+        new_tracks = np.zeros(len(detections), dtype=TRACK_DTYPE)
+        new_tracks["track_id"] = np.arange(self.nextobject_id, self.nextobject_id + len(detections))
+        new_tracks["bbox"] = detections.boxes
+        new_tracks["score"] = detections.scores
+        new_tracks["class_id"] = detections.class_ids
+        new_tracks["last_frame"] = self.frame_number
+        new_tracks["last_centroid"] = self._centroids(new_tracks["bbox"])
+        self.nextobject_id += len(detections)
+        self.tracks = np.concatenate([self.tracks, new_tracks])
+        self.history.add_tracks(len(detections))
+
+    def update(self, detected_objects, timestamp=None):
+        """
+        Predict the tracks for the current frame, match them with the detected objects, start new tracks for
+        the unmatched detections and remove the tracks which are lost for more than max_disappeared frames.
+
+        Args:
+            detected_objects: A DetectionBatch of the detected objects.
+            timestamp: time of the frame in seconds for the trajectory history, defaults to the frame number
+
+        Return:
+            tracked_objects: A DetectionBatch of the tracked objects, the track_id column holds the track ids.
+        """
+        if not isinstance(detected_objects, DetectionBatch):
+            tracked = self.update(DetectionBatch.from_dicts(detected_objects), timestamp)
+            return OrderedDict(zip(tracked.track_ids.tolist(), tracked.to_dicts()))
+
+        self._advance()
+        matched = np.zeros(len(self.tracks), dtype=bool)
+        registered = np.zeros(len(detected_objects), dtype=bool)
+        if len(self.tracks) > 0 and len(detected_objects) > 0:
+            boxes = detected_objects.boxes.astype(np.float64)
+            rows, cols = self._candidate_pairs(boxes)
+            costs = self._costs(self.tracks["bbox"][rows], boxes[cols])
+            gate = (costs <= self.max_cost) & (self.tracks["class_id"][rows] == detected_objects.class_ids[cols])
+            rows, cols = self._assign(rows[gate], cols[gate], costs[gate], len(detected_objects))
+            matched[rows] = True
+            registered[cols] = True
+
+            tracks = self.tracks[rows]
+            tracks["bbox"] = detected_objects.boxes[cols]
+            tracks["score"] = detected_objects.scores[cols]
+            centroids = self._centroids(tracks["bbox"])
+            # Average velocity since the previous detection of the track
+            elapsed_frames = np.maximum(self.frame_number - tracks["last_frame"], 1)
+            tracks["velocity"] = (centroids - tracks["last_centroid"]) / elapsed_frames[:, None]
+            tracks["last_frame"] = self.frame_number
+            tracks["last_centroid"] = centroids
+            tracks["disappeared"] = 0
+            self.tracks[rows] = tracks
+
+        self.tracks["disappeared"][~matched] += 1
+        alive = self.tracks["disappeared"] <= self.max_disappeared
+        if not np.all(alive):
+            self.tracks = self.tracks[alive]
+            self.history.keep(alive)
+        if not np.all(registered):
+            self._register(detected_objects[~registered])
+        self._record(timestamp)
+        return self.tracked_batch()
+
+    def _record(self, timestamp):
+        # Append the current boxes of the tracks to their trajectory history
+        self.history.record(
+            self.tracks["bbox"], self.frame_number if timestamp is None else timestamp, self.tracks["disappeared"] == 0
+        )
+
+    def trajectory(self, track_id):
+        """
+        Returns the trajectory history of a track from the oldest to the newest entry, a dictionary of
+        "positions" (normalized centroids [K, 2]), "heights" (normalized box heights [K]), "timestamps" [K] and
+        "detected" ([K], False for the extrapolated boxes), or None if the track does not exist anymore.
+        """
+        rows = np.flatnonzero(self.tracks["track_id"] == track_id)
+        if len(rows) == 0:
+            return None
+        history = self.history.chronological(rows)
+        valid = history.pop("valid")[0]
+        return {key: values[0][valid] for key, values in history.items()}
+
+    def trajectories(self):
+        """
+        Returns the trajectory history of all of the tracks as arrays, see TrajectoryHistory.chronological, with
+        the "track_ids" of their rows.
+        """
+        history = self.history.chronological()
+        history["track_ids"] = self.tracks["track_id"].copy()
+        return history
+
+    def tracked_batch(self):
+        # A DetectionBatch of the tracked objects, the track_id column holds the track ids
+        return DetectionBatch.from_arrays(
+            self.tracks["bbox"],
+            scores=self.tracks["score"],
+            class_ids=self.tracks["class_id"],
+            track_ids=self.tracks["track_id"],
+        )
+
+    def predict(self, timestamp=None):
+        """
+        Move each track by its estimated velocity (constant velocity motion model).
+        It is used instead of update for the frames that are not passed to the detector.
+
+        Args:
+            timestamp: time of the frame in seconds for the trajectory history, defaults to the frame number
+
+        Return:
+            tracked_objects: A DetectionBatch of the extrapolated objects.
+        """
+        self._advance()
+        self.history.record(
+            self.tracks["bbox"], self.frame_number if timestamp is None else timestamp,
+            np.zeros(len(self.tracks), dtype=bool),
+        )
+        return self.tracked_batch()
+
+    def relative_speeds(self):
+        """
+        Returns a numpy array of the speed of each track relative to its box height (box heights per frame),
+        see CentroidTracker.relative_speeds.
+        """
+        heights = self.tracks["bbox"][:, 3] - self.tracks["bbox"][:, 1]
+        moving = heights > 0
+        return np.linalg.norm(self.tracks["velocity"][moving], axis=1) / heights[moving]
@@ -4,26 +4,51 @@ from collections import OrderedDict
 import numpy as np
 from scipy.spatial import distance as dist
 
+from libs.detections import DETECTION_DTYPE, DetectionBatch
+
 
 class CentroidTracker:
     """
     A simple object tracker based on euclidean distance of bounding boxe centroids of two consecutive frames.
     if a box is lost between two frames the tracker keeps the box for next max_disappeared frames.
 
+    The tracker also estimates the velocity of each object (normalized centroid displacement per frame), so
+    the boxes can be extrapolated with the predict method for the frames which are not passed to the detector.
+
+    The tracker consumes and produces DetectionBatch instances; the track_id column of its output is the
+    unique id of each tracked object. A list of object dictionaries is also accepted by update for dict-based
+    callers, in which case an OrderedDict of object dictionaries is returned.
+
     :param max_disappeared: If a box is losted betweeb two frames the tracker keep the box for next
      max_disappeared frames.
     """
 
     def __init__(self, max_disappeared=50):
         self.nextobject_id = 0
+        # Maps the object id to its last DETECTION_DTYPE record (a 0-d structured array)
         self.tracked_objects = OrderedDict()
         self.disappeared = OrderedDict()
         self.max_disappeared = max_disappeared
-
-    def register(self, object_item):
+        # Number of frames seen by the tracker (updated or predicted)
+        self.frame_number = 0
+        # Velocity of each object and the (frame number, centroid) of its last detection
+        self.velocities = OrderedDict()
+        self.last_detections = OrderedDict()
+
+    @staticmethod
+    def _centroid(record):
+        # Normalized (cx, cy) of a record's box
+        x0, y0, x1, y1 = record["bbox"].astype(np.float64)
+        return np.array([(x0 + x1) / 2, (y0 + y1) / 2])
+
+    def register(self, detection):
         # Register a new detected object and set a unique id for it
-        self.tracked_objects[self.nextobject_id] = object_item
+        record = np.array(detection, dtype=DETECTION_DTYPE)
+        record["track_id"] = self.nextobject_id
+        self.tracked_objects[self.nextobject_id] = record
         self.disappeared[self.nextobject_id] = 0
+        self.velocities[self.nextobject_id] = np.zeros(2)
+        self.last_detections[self.nextobject_id] = (self.frame_number, self._centroid(record))
         self.nextobject_id += 1
 
     def diregister(self, object_id):
@@ -36,8 +61,18 @@ class CentroidTracker:
         """
         del self.tracked_objects[object_id]
         del self.disappeared[object_id]
-
-    def update(self, detected_objects):
+        del self.velocities[object_id]
+        del self.last_detections[object_id]
+
+    def _update_velocity(self, object_id, record):
+        # Average velocity of the object since its previous detection
+        centroid = self._centroid(record)
+        last_frame_number, last_centroid = self.last_detections[object_id]
+        elapsed_frames = max(self.frame_number - last_frame_number, 1)
+        self.velocities[object_id] = (centroid - last_centroid) / elapsed_frames
+        self.last_detections[object_id] = (self.frame_number, centroid)
+
+    def update(self, detected_objects, timestamp=None):
         """
         Updates the objects from the previous frame.
         This function compares previous frame with current frame and take following actions:
@@ -50,28 +85,32 @@ class CentroidTracker:
         current frame, register it as lost and increment its disappeared counter.
 
         Args:
-            detected_objects: List of detected objects.
+            detected_objects: A DetectionBatch of the detected objects.
+            timestamp: ignored, this tracker does not keep a trajectory history (see AssignmentTracker)
 
         Return:
-            tracked_objects: List of updated objects.
+            tracked_objects: A DetectionBatch of the updated objects.
         """
+        if not isinstance(detected_objects, DetectionBatch):
+            self.update(DetectionBatch.from_dicts(detected_objects))
+            return OrderedDict(zip(self.tracked_objects.keys(), self.tracked_batch().to_dicts()))
+
+        self.frame_number += 1
         if len(detected_objects) == 0:
             for object_id in list(self.disappeared.keys()):
                 self.disappeared[object_id] += 1
                 # Removed an object from the tracker when the object is missing in the 'max_disappeared' previous frames.
                 if self.disappeared[object_id] > self.max_disappeared:
                     self.diregister(object_id)
-            return self.tracked_objects
+            return self.tracked_batch()
 
-        input_centroids = np.zeros((len(detected_objects), 2))
-        for i, object_item in enumerate(detected_objects):
-            input_centroids[i] = (object_item["centroid"][0], object_item["centroid"][1])
+        input_centroids = detected_objects.centroids[:, 0:2].astype(np.float64)
         if len(self.tracked_objects) == 0:
             for i in range(0, len(input_centroids)):
-                self.register(detected_objects[i])
+                self.register(detected_objects.data[i])
         else:
             object_ids = list(self.tracked_objects.keys())
-            object_centroids = [object_item["centroid"][0:2] for object_item in self.tracked_objects.values()]
+            object_centroids = [self._centroid(record) for record in self.tracked_objects.values()]
             computed_dist = dist.cdist(np.array(object_centroids), input_centroids)
             rows = computed_dist.min(axis=1).argsort()
             cols = computed_dist.argmin(axis=1)[rows]
@@ -81,8 +120,11 @@ class CentroidTracker:
                 if row in used_rows or col in used_cols:
                     continue
                 object_id = object_ids[row]
-                self.tracked_objects[object_id] = detected_objects[col]
+                record = np.array(detected_objects.data[col], dtype=DETECTION_DTYPE)
+                record["track_id"] = object_id
+                self.tracked_objects[object_id] = record
                 self.disappeared[object_id] = 0
+                self._update_velocity(object_id, record)
                 used_rows.add(row)
                 used_cols.add(col)
 
@@ -90,20 +132,49 @@ class CentroidTracker:
             unused_cols = set(range(0, computed_dist.shape[1])).difference(used_cols)
 
             if computed_dist.shape[0] >= computed_dist.shape[1]:
-                biggest_existing_id = int(detected_objects[-1]["id"].split("-")[-1])
-
                 for row in unused_rows:
                     object_id = object_ids[row]
-                    self.tracked_objects[object_id]["id"] = self.tracked_objects[object_id]["id"].split("-")[
-                                                                0] + "-" + str(
-                        biggest_existing_id + 1)
                     self.disappeared[object_id] += 1
-                    biggest_existing_id += 1
                     if self.disappeared[object_id] > self.max_disappeared:
                         self.diregister(object_id)
 
             else:
                 for col in unused_cols:
-                    self.register(detected_objects[col])
+                    self.register(detected_objects.data[col])
+
+        return self.tracked_batch()
 
-        return self.tracked_objects
+    def tracked_batch(self):
+        # A DetectionBatch of the tracked objects, the track_id column holds the object ids
+        if len(self.tracked_objects) == 0:
+            return DetectionBatch()
+        return DetectionBatch(np.stack(list(self.tracked_objects.values())))
+
+    def predict(self, timestamp=None):
+        """
+        Move each tracked object by its estimated velocity (constant velocity motion model).
+        It is used instead of update for the frames that are not passed to the detector.
+
+        Return:
+            tracked_objects: A DetectionBatch of the extrapolated objects.
+        """
+        self.frame_number += 1
+        for object_id, record in self.tracked_objects.items():
+            dx, dy = self.velocities[object_id]
+            if dx == 0 and dy == 0:
+                continue
+            record["bbox"] += np.array([dx, dy, dx, dy], dtype=np.float32)
+        return self.tracked_batch()
+
+    def relative_speeds(self):
+        """
+        Returns a numpy array of the speed of each tracked object relative to its box height
+        (box heights per frame), which is a measure of the motion of the scene that does not depend
+        on the distance of the objects from the camera.
+        """
+        speeds = []
+        for object_id, record in self.tracked_objects.items():
+            height = record["bbox"][3] - record["bbox"][1]
+            if height > 0:
+                speeds.append(np.linalg.norm(self.velocities[object_id]) / height)
+        return np.array(speeds)
@@ -58,6 +58,27 @@ class ConfigEngine:
     def get_section_dict(self, section):
         return self.section_options_dict[section]
 
+    def get_video_sources(self):
+        """
+        Returns a list of dictionaries, one for each video source (camera) of the config.
+
+        Every source is defined in its own [Source_<n>] section which has at least a VideoPath option.
+        If the config does not have any source section, [App] VideoPath is used as the only source.
+        Each returned dictionary contains the options of the section plus an "Id" (the index of the
+        source) and a "Name" (defaults to the section name).
+        """
+        source_sections = [section for section in self.section_options_dict.keys() if section.startswith("Source_")]
+        source_sections.sort(key=lambda section: int(section.split("_")[-1]))
+        sources = []
+        for source_id, section in enumerate(source_sections):
+            source = dict(self.section_options_dict[section])
+            source["Id"] = source_id
+            source.setdefault("Name", section)
+            sources.append(source)
+        if len(sources) == 0:
+            sources.append({"Id": 0, "Name": "default", "VideoPath": self.section_options_dict["App"]["VideoPath"]})
+        return sources
+
     def get_boolean(self, section, option):
         result = None
         self.lock.acquire()
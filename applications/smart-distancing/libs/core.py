@@ -1,35 +1,78 @@
 import time
+from concurrent.futures import Future
 import cv2 as cv
 import numpy as np
 import math
 from libs.centroid_object_tracker import CentroidTracker
+from libs.assignment_tracker import AssignmentTracker
 from scipy.spatial import distance as dist
 from libs.loggers.loggers import Logger
+from libs.pipeline import Pipeline, StreamStats
+from libs.detectors.shared_detector import SharedDetector
+from libs.detection_stride import DetectionStrideController
+from libs.motion_gate import MotionGate
+from libs.latency_controller import LatencyController
+from libs.preprocessor import FramePreprocessor
+from libs.distances import center_points_distances, four_corner_points_distances, ground_distances
+from libs.spatial_hash import find_violating_pairs, find_violating_points
+from libs.incremental_distances import IncrementalDistances
+from libs.ground_plane import ground_plane_from_config
+from libs.inference_regions import inference_regions_from_config
+from libs.detections import DetectionBatch, as_detection_batch, select
+from libs.metrics import StageMetrics
+from libs.nms import non_max_suppression, soft_non_max_suppression
+from libs.recording import DetectionRecorder, recording_path
 
 
 class Distancing:
-
-    def __init__(self, config):
+    """
+    Process a video source (camera): detect the people, track them, calculate the distances between
+    them and pass the results to the logger and the ui.
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    :param detector: A detector instance which may be shared between several Distancing instances
+        (e.g. a SharedDetector). If it is None a new detector is built for the configured device.
+    :param source: A dictionary of the video source options, see ConfigEngine.get_video_sources.
+        If it is None the first source of the config is used.
+    """
+
+    def __init__(self, config, detector=None, source=None):
         self.config = config
         self.ui = None
-        self.detector = None
+        self.detector = detector
         self.device = self.config.get_section_dict('Detector')['Device']
         self.running_video = False
-        self.tracker = CentroidTracker(
-            max_disappeared=int(self.config.get_section_dict("PostProcessor")["MaxTrackFrame"]))
-        self.logger = Logger(self.config)
-        if self.device == 'Jetson':
-            from libs.detectors.jetson.detector import Detector
-            self.detector = Detector(self.config)
-        elif self.device == 'EdgeTPU':
-            from libs.detectors.edgetpu.detector import Detector
-            self.detector = Detector(self.config)
-        elif self.device == 'Dummy':
-            from libs.detectors.dummy.detector import Detector
-            self.detector = Detector(self.config)
-        elif self.device == 'x86':
-            from libs.detectors.x86.detector import Detector
-            self.detector = Detector(self.config)
+        self.source = source if source is not None else self.config.get_video_sources()[0]
+        self.source_id = self.source["Id"]
+        self.video_path = self.source["VideoPath"]
+        postprocessor_config = self.config.get_section_dict("PostProcessor")
+        max_track_frame = int(postprocessor_config["MaxTrackFrame"])
+        if postprocessor_config.get("Tracker", "Assignment") == "Centroid":
+            self.tracker = CentroidTracker(max_disappeared=max_track_frame)
+        else:
+            self.tracker = AssignmentTracker(
+                max_disappeared=max_track_frame, cost=postprocessor_config.get("TrackerCost", "IoU"),
+                history_length=int(postprocessor_config.get("HistoryLength", 32)))
+        # Each camera of a multi-camera config logs into its own directory (and records into its own file)
+        if len(self.config.get_video_sources()) > 1:
+            self.logger = Logger(self.config, self.source["Name"])
+            source_name = self.source["Name"]
+        else:
+            self.logger = Logger(self.config)
+            source_name = None
+        if self.detector is None:
+            self.detector = SharedDetector(self.config, source_name)
+        # If [Detector] RecordPath is set, the raw detector outputs are recorded for the Replay device
+        self.record_path = self.config.get_section_dict('Detector').get('RecordPath', '')
+        if self.record_path:
+            self.record_path = recording_path(self.record_path, source_name)
+        self.recorder = None
+        # Number of frames read from the current video
+        self.frames_read = 0
+        # Throughput and end-to-end latency of this video source
+        self.stats = StreamStats()
+        # Latency histograms of the processing stages, see libs/metrics.py
+        self.metrics = StageMetrics()
 
         self.image_size = [int(i) for i in self.config.get_section_dict('Detector')['ImageSize'].split(',')]
 
@@ -40,40 +83,260 @@ class Distancing:
 
         self.dist_method = self.config.get_section_dict("PostProcessor")["DistMethod"]
         self.dist_threshold = self.config.get_section_dict("PostProcessor")["DistThreshold"]
+        # "Matrix" computes all of the NxN distances, "SpatialHash" only finds the violating pairs, "Incremental"
+        # keeps the distances of the tracks across frames and only recomputes the tracks which moved
+        self.distance_engine = self.config.get_section_dict("PostProcessor").get("DistanceEngine", "Matrix")
+        self.resolution = [int(i) for i in self.config.get_section_dict('App')['Resolution'].split(',')]
+        # Homography of the floor of a calibrated camera (from its source section, or from [App]), the distances
+        # are measured on the floor instead of estimated from the box heights. None if not calibrated.
+        calibration = self.source
+        if "CalibrationImagePoints" not in calibration:
+            calibration = self.config.get_section_dict('App')
+        self.ground_plane = ground_plane_from_config(calibration, self.resolution)
+        # The region of interest and the tiles the detector runs on (from the source section, or from [App]),
+        # None if the whole frame is passed to the detector. The Replay device has no frames to crop.
+        self.regions = None
+        if self.device != 'Replay':
+            self.regions = inference_regions_from_config(
+                self.source, self.config.get_section_dict('App'), self.resolution
+            )
+        self.incremental_distances = None
+        if self.distance_engine == 'Incremental':
+            self.incremental_distances = IncrementalDistances(
+                self.dist_threshold, self.dist_method,
+                tolerance=float(postprocessor_config.get("IncrementalTolerance", 10)),
+                ground_plane=self.ground_plane,
+            )
+        # Settings of the non-maximum suppression of the duplicated boxes, see libs/nms.py
+        self.nms_threshold = float(postprocessor_config["NMSThreshold"])
+        self.nms_order = postprocessor_config.get("NMSOrder", "Bottom")
+        self.nms_class_aware = postprocessor_config.get("NMSMode", "ClassAgnostic") == "ClassAware"
+        self.soft_nms_sigma = float(postprocessor_config.get("SoftNMSSigma", 0))
+        self.nms_min_score = float(self.config.get_section_dict('Detector').get('MinScore', 0))
+
+        # Size of the queues between the stages of the video pipeline, and whether a full queue
+        # drops its oldest frame ("DropOldest") or blocks the previous stage ("Block").
+        app_config = self.config.get_section_dict('App')
+        self.queue_size = int(app_config.get('PipelineQueueSize', 2))
+        self.drop_oldest = app_config.get('PipelineDropPolicy', 'DropOldest') == 'DropOldest'
+        if self.config.get_section_dict('Detector')['Device'] == 'Replay':
+            # Every recorded frame is replayed, dropping one would lose its recorded output or reuse marker
+            self.drop_oldest = False
+        self.pipeline = None
+        # Number of frames the detector can run at once; if more than one, the inference stage submits the
+        # frames and the post-processing stage waits for their results, so several frames are in flight
+        self.async_requests = getattr(self.detector, 'async_requests', 1)
+        # The preprocessor reuses its output buffers, it needs one buffer set for every frame that may be
+        # in flight in the pipeline: one in each stage and the capacity of each of the 4 queues, and a detector
+        # input for each region of a frame.
+        num_regions = len(self.regions) if self.regions is not None else 1
+        self.preprocessor = FramePreprocessor(
+            self.resolution, self.image_size[:2], num_buffers=(sum(self._queue_sizes()) + 4 + 2) * num_regions
+        )
+        # If the detector exposes its input tensor (the TFLite devices), the inference stage resizes and converts
+        # the frames straight into it instead of into a buffer of the preprocessor which is then copied
+        input_height, input_width = self.image_size[1], self.image_size[0]
+        self.zero_copy_input = self.async_requests <= 1 and self.regions is None and (
+            getattr(self.detector, 'input_shape', None) == (input_height, input_width, 3)
+        )
+        # Runs the detector on every K-th frame, the tracker extrapolates the boxes of the other frames
+        self.stride_controller = DetectionStrideController(self.config)
+        # Skips the detector when nothing changed since its last inference ([Detector] MotionGateMaxSkip > 0),
+        # the Replay device has no frames to compare
+        self.motion_gate = MotionGate(self.config)
+        if not self.motion_gate.enabled or self.device == 'Replay':
+            self.motion_gate = None
+        # The objects and distances of the last post-processed frame, reused for the unchanged frames
+        self._last_result = None
+        # Adjusts the display resolution, the detection stride and the JPEG quality of the ui to hold the
+        # end-to-end latency under [App] TargetLatency (0 disables it)
+        self.latency_controller = LatencyController(self.config, source_name)
+        if not self.latency_controller.enabled:
+            self.latency_controller = None
 
     def set_ui(self, ui):
         self.ui = ui
 
-    def __process(self, cv_image):
+    def preprocess(self, cv_image):
+        """
+        Resize the input frame to the display resolution and prepare the detector input.
+
+        Returns:
+            cv_image: the frame resized to [App] Resolution
+            rgb_resized_image: the frame resized to [Detector] ImageSize and converted to RGB
         """
-        return object_list list of  dict for each obj,
-        obj["bbox"] is normalized coordinations for [x0, y0, x1, y1] of box
+        return self.preprocessor.process(cv_image)
+
+    def postprocess(self, tmp_objects_list, timestamp=None):
         """
+        Convert the raw detector output to a DetectionBatch and calculate the distances.
+        timestamp: time of the frame in seconds for the trajectory history of the tracker, see calculate_distancing
 
-        # Resize input image to resolution
-        resolution = [int(i) for i in self.config.get_section_dict('App')['Resolution'].split(',')]
-        cv_image = cv.resize(cv_image, tuple(resolution))
+        returns:
+        objects_list: a DetectionBatch of the post processed objects, see calculate_distancing
+        distancings: a NxN ndarray of distances between the objects
+        """
+        if not isinstance(tmp_objects_list, DetectionBatch):
+            tmp_objects_list = DetectionBatch.from_detector_output(tmp_objects_list)
+        objects_list, distancings = self.calculate_distancing(tmp_objects_list, timestamp)
+        return objects_list, distancings
 
-        resized_image = cv.resize(cv_image, tuple(self.image_size[:2]))
-        rgb_resized_image = cv.cvtColor(resized_image, cv.COLOR_BGR2RGB)
+    def extrapolate(self, timestamp=None):
+        """
+        Estimate the objects of a frame which is not passed to the detector by moving the tracked
+        objects with their estimated velocities, and calculate the distances between them.
+
+        returns:
+        objects_list: a DetectionBatch of the extrapolated objects, same as the output of calculate_distancing
+        distancings: a NxN ndarray of distances between the objects
+        """
+        with self.metrics.time("tracking"):
+            objects_list = self.tracker.predict(timestamp)
+        with self.metrics.time("distance"):
+            distances = self.calculate_distances(objects_list)
+        return objects_list, distances
+
+    def __process(self, cv_image):
+        """
+        return objects_list a DetectionBatch of the detected objects,
+        its boxes are the normalized coordinations [x0, y0, x1, y1] of the boxes
+        """
+        cv_image, rgb_resized_image = self.preprocess(cv_image)
         tmp_objects_list = self.detector.inference(rgb_resized_image)
-        [w,h] = resolution
-
-        for obj in tmp_objects_list:
-            box = obj["bbox"]
-            x0 = box[1]
-            y0 = box[0]
-            x1 = box[3]
-            y1 = box[2]
-            obj["centroid"] = [(x0 + x1) / 2, (y0 + y1) / 2, x1 - x0, y1 - y0]
-            obj["bbox"] = [x0, y0, x1, y1]
-            obj["centroidReal"]=[(x0 + x1)*w / 2, (y0 + y1)*h / 2, (x1 - x0)*w, (y1 - y0)*h]
-            obj["bboxReal"]=[x0*w,y0*h,x1*w,y1*h]
- 
-        objects_list, distancings = self.calculate_distancing(tmp_objects_list)
+        objects_list, distancings = self.postprocess(tmp_objects_list)
         return cv_image, objects_list, distancings
 
-    def process_video(self, video_uri):
+    def _read_frames(self, input_cap):
+        # Generator of decoded frames, runs on the capture thread of the pipeline
+        self.frames_read = 0
+        while input_cap.isOpened() and self.running_video:
+            with self.metrics.time("capture"):
+                ret, cv_image = input_cap.read()
+            if not ret:
+                # End of the video file (or the stream is closed)
+                break
+            frame_index = self.frames_read
+            self.frames_read += 1
+            if np.shape(cv_image) != ():
+                yield {"cv_image": cv_image, "capture_time": time.perf_counter(), "frame_index": frame_index}
+
+    def _preprocess_stage(self, frame):
+        # Frames which are not passed to the detector only need to be resized to the display resolution
+        with self.metrics.time("preprocess"):
+            if self.device == 'Replay':
+                # The recorded outputs are replayed on exactly the frames which were passed to the detector during
+                # the recording, the stride would choose other frames since the replay has no inference time
+                detect = self.detector.recorded(frame["frame_index"])
+                if self.detector.reused(frame["frame_index"]):
+                    # The motion gate skipped the detector during the recording and the last result was reused
+                    frame["unchanged"] = True
+            else:
+                detect = self.stride_controller.should_detect()
+            if self.latency_controller is not None and \
+                    self.preprocessor.resolution != self.latency_controller.resolution:
+                # The buffers are reallocated on this thread, so no frame is resized into them meanwhile
+                self.preprocessor.set_resolution(self.latency_controller.resolution)
+            captured_image = frame["cv_image"]
+            frame["cv_image"] = self.preprocessor.resize_display(captured_image)
+            if detect and self.motion_gate is not None and not self.motion_gate.should_detect(frame["cv_image"]):
+                # Nothing moved since the last inference, its result is reused
+                detect = False
+                frame["unchanged"] = True
+            if detect and self.device == 'Replay':
+                # The Replay device looks the recorded outputs up by the index of the frame
+                frame["detector_input"] = frame["frame_index"]
+            elif detect and self.regions is not None:
+                # One detector input for each region, cropped from the frame at its captured resolution
+                frame["detector_input"] = [
+                    self.preprocessor.prepare_detector_input(crop) for crop in self.regions.crops(captured_image)
+                ]
+            elif detect and not self.zero_copy_input:
+                frame["detector_input"] = self.preprocessor.prepare_detector_input(frame["cv_image"])
+            else:
+                # With a zero-copy input the inference stage prepares the detector input from the display frame
+                frame["detector_input"] = frame["cv_image"] if detect else None
+        return frame
+
+    def _inference_stage(self, frame):
+        detector_input = frame.pop("detector_input")
+        if detector_input is None:
+            frame["raw_objects"] = None
+            return frame
+        frame["inference_begin"] = time.perf_counter()
+        if self.regions is not None:
+            # The detections of the regions are merged into the detections of the frame
+            frame["raw_objects"] = self.regions.merge(self.detector.inference_batch(detector_input))
+            return self._inference_done(frame)
+        if self.async_requests > 1:
+            # A Future of the detector output, resolved by _inference_done in the post-processing stage
+            frame["raw_objects"] = self.detector.inference_async(detector_input)
+            return frame
+        if self.zero_copy_input:
+            frame["raw_objects"] = self.detector.inference_into(
+                lambda input_image: self.preprocessor.prepare_detector_input(detector_input, input_image)
+            )
+        else:
+            frame["raw_objects"] = self.detector.inference(detector_input)
+        return self._inference_done(frame)
+
+    def _inference_done(self, frame):
+        # Record the inference time (from the submission for the asynchronous inference)
+        if isinstance(frame["raw_objects"], Future):
+            frame["raw_objects"] = frame["raw_objects"].result()
+        inference_time = time.perf_counter() - frame.pop("inference_begin")
+        self.stride_controller.update_inference_time(inference_time)
+        self.metrics.observe("inference", inference_time)
+        return frame
+
+    def _postprocess_stage(self, frame):
+        if "inference_begin" in frame:
+            # The frames leave the inference stage in order, so the asynchronous results are collected in order
+            self._inference_done(frame)
+        raw_objects = frame.pop("raw_objects")
+        # Position of the frame in the video (headless mode) or its capture time
+        timestamp = frame.get("timestamp", frame["capture_time"])
+        reused = frame.pop("unchanged", False) and self._last_result is not None
+        if self.recorder is not None and (raw_objects is not None or reused):
+            # The detector outputs are recorded on this thread, in the order of the frames, and the frames which
+            # reuse the last result are marked so the replay reuses it too
+            self.recorder.write(frame.get("frame_index", self.recorder.frames), None if reused else raw_objects)
+        if reused:
+            frame["objects"], frame["distances"] = self._last_result
+            return frame
+        if raw_objects is None:
+            frame["objects"], frame["distances"] = self.extrapolate(timestamp)
+        else:
+            frame["objects"], frame["distances"] = self.postprocess(raw_objects, timestamp)
+        self._last_result = frame["objects"], frame["distances"]
+        self.stride_controller.update_motion(self.tracker.relative_speeds())
+        return frame
+
+    def _render_stage(self, frame):
+        with self.metrics.time("logging"):
+            self.logger.update(frame["objects"], frame["distances"])
+        with self.metrics.time("drawing"):
+            self.ui.update(frame["cv_image"], frame["objects"], frame["distances"], self.source_id)
+        done_time = time.perf_counter()
+        self.stats.update(frame["capture_time"], done_time)
+        if self.latency_controller is not None:
+            knob = self.latency_controller.update(
+                done_time - frame["capture_time"], sum(self.queue_depths().values()),
+                sum(self.dropped_frames().values()), done_time
+            )
+            if knob == "detection_stride":
+                self.stride_controller.set_stride_floor(self.latency_controller.detection_stride)
+
+    def process_video(self, video_uri=None):
+        """
+        Process a video through a pipeline of capture, preprocessing, inference, post-processing and
+        rendering/logging stages. Each stage runs on its own thread and stages are connected by bounded
+        queues ([App] PipelineQueueSize), so a slow stage does not block the others.
+
+        Args:
+            video_uri: path or url of the video, defaults to the VideoPath of the video source
+        """
+        if video_uri is None:
+            video_uri = self.video_path
         input_cap = cv.VideoCapture(video_uri)
 
         if (input_cap.isOpened()):
@@ -83,53 +346,130 @@ class Distancing:
             return
 
         self.running_video = True
-        while input_cap.isOpened() and self.running_video:
-            _, cv_image = input_cap.read()
-            if np.shape(cv_image) != ():
-                cv_image, objects, distancings = self.__process(cv_image)
-            else:
-                continue
-            self.logger.update(objects, distancings)
-            self.ui.update(cv_image, objects, distancings)
-        input_cap.release()
+        self.pipeline = self.build_pipeline(self._read_frames(input_cap))
+        if self.record_path:
+            self.recorder = DetectionRecorder(self.record_path, input_cap.get(cv.CAP_PROP_FPS))
+            print('recording the detector outputs to ', self.record_path)
+        try:
+            self.pipeline.run()
+        finally:
+            input_cap.release()
+            self.running_video = False
+            if self.recorder is not None:
+                self.recorder.close(self.frames_read)
+                self.recorder = None
+
+    def build_pipeline(self, frames, render_stage=None, drop_oldest=None):
+        """
+        Build the preprocessing, inference, post-processing and rendering pipeline of a stream of frames.
+
+        Args:
+            frames: an iterable of frame dictionaries with "cv_image" (BGR frame) and "capture_time"
+            (time.perf_counter() of the capture) keys, see _read_frames.
+            render_stage: the function of the last stage, it receives the frame dictionary with "cv_image",
+            "objects" and "distances". Defaults to logging and updating the ui.
+            drop_oldest: the queue policy, defaults to [App] PipelineDropPolicy.
+
+        Returns:
+            A Pipeline instance, call its run method to process the frames.
+        """
+        return Pipeline(
+            frames,
+            [
+                ("preprocess", self._preprocess_stage),
+                ("inference", self._inference_stage),
+                ("postprocess", self._postprocess_stage),
+                ("render", render_stage if render_stage is not None else self._render_stage),
+            ],
+            queue_size=self._queue_sizes(),
+            drop_oldest=self.drop_oldest if drop_oldest is None else drop_oldest,
+        )
+
+    def _queue_sizes(self):
+        # Capacity of the input queue of each stage, the queue after the inference stage holds the frames in
+        # flight of the asynchronous inference
+        return [self.queue_size, self.queue_size, max(self.queue_size, self.async_requests), self.queue_size]
+
+    def queue_depths(self):
+        # Returns a dictionary of {stage name: number of frames waiting before the stage}
+        if self.pipeline is None:
+            return {}
+        return {stage.name: stage.input_queue.qsize() for stage in self.pipeline.stages}
+
+    def distance_work(self):
+        # Returns the work report of the Incremental distance engine (see libs/incremental_distances.py), or None
+        if self.incremental_distances is None:
+            return None
+        return self.incremental_distances.report()
+
+    def gated_inferences(self):
+        # Returns the report of the motion gate (see libs/motion_gate.py), or None if it is disabled
+        if self.motion_gate is None:
+            return None
+        return self.motion_gate.report()
+
+    def latency_control(self):
+        # Returns the report of the latency controller (see libs/latency_controller.py), or None if it is disabled
+        if self.latency_controller is None:
+            return None
+        return self.latency_controller.report()
+
+    def jpeg_quality(self):
+        # Quality of the JPEG frames of the ui, lowered by the latency controller when the latency is over target
+        if self.latency_controller is None:
+            return int(self.config.get_section_dict('App').get('JpegQuality', 95))
+        return self.latency_controller.jpeg_quality
+
+    def dropped_frames(self):
+        # Returns a dictionary of {stage name: number of frames dropped before the stage}
+        if self.pipeline is None:
+            return {}
+        return self.pipeline.dropped_frames()
+
+    def stop_video(self):
         self.running_video = False
+        if self.pipeline is not None:
+            self.pipeline.stop()
 
     def process_image(self, image_path):
         # Process and pass the image to ui modules
         cv_image = cv.imread(image_path)
         cv_image, objects, distancings = self.__process(cv_image)
-        self.ui.update(cv_image, objects, distancings)
+        self.ui.update(cv_image, objects, distancings, self.source_id)
 
-    def calculate_distancing(self, objects_list):
+    def calculate_distancing(self, objects_list, timestamp=None):
         """
         this function post-process the raw boxes of object detector and calculate a distance matrix
         for detected bounding boxes.
         post processing is consist of:
         1. omitting large boxes by filtering boxes which are biger than the 1/4 of the size the image.
         2. omitting duplicated boxes by applying an auxilary non-maximum-suppression.
-        3. apply a simple object tracker to make the detection more robust.
+        3. track the objects to make the detection more robust, the track_id column of the output holds the track
+        ids, which are stable across frames.
 
         params:
-        object_list: a list of dictionaries. each dictionary has attributes of a detected object such as
-        "id", "centroid" (a tuple of the normalized centroid coordinates (cx,cy,w,h) of the box) and "bbox" (a tuple
-        of the normalized (xmin,ymin,xmax,ymax) coordinate of the box)
+        object_list: a DetectionBatch of the detected objects (or a list of dictionaries, each dictionary has
+        attributes of a detected object such as "id" and "bbox" (a tuple of the normalized (xmin,ymin,xmax,ymax)
+        coordinate of the box))
+        timestamp: time of the frame in seconds for the trajectory history of the tracker, defaults to the
+        frame number
 
         returns:
-        object_list: the post processed version of the input
+        object_list: a DetectionBatch, the post processed version of the input
         distances: a NxN ndarray which i,j element is distance between i-th and l-th bounding box
 
         """
-        new_objects_list = self.ignore_large_boxes(objects_list)
-        new_objects_list = self.non_max_suppression_fast(new_objects_list,
-                                                         float(self.config.get_section_dict("PostProcessor")[
-                                                                   "NMSThreshold"]))
-        tracked_boxes = self.tracker.update(new_objects_list)
-        new_objects_list = [tracked_boxes[i] for i in tracked_boxes.keys()]
-        for i, item in enumerate(new_objects_list):
-            item["id"] = item["id"].split("-")[0] + "-" + str(i)
-
-        centroids = np.array( [obj["centroid"] for obj in new_objects_list] )
-        distances = self.calculate_box_distances(new_objects_list)
+        with self.metrics.time("nms"):
+            new_objects_list = self.ignore_large_boxes(as_detection_batch(objects_list))
+            new_objects_list = self.non_max_suppression_fast(
+                new_objects_list, self.nms_threshold, class_aware=self.nms_class_aware, order=self.nms_order,
+                soft_sigma=self.soft_nms_sigma, min_score=self.nms_min_score,
+            )
+        with self.metrics.time("tracking"):
+            new_objects_list = self.tracker.update(new_objects_list, timestamp)
+
+        with self.metrics.time("distance"):
+            distances = self.calculate_distances(new_objects_list)
 
         return new_objects_list, distances
 
@@ -139,72 +479,71 @@ class Distancing:
         """
         filtering boxes which are biger than the 1/4 of the size the image
         params:
-            object_list: a list of dictionaries. each dictionary has attributes of a detected object such as
-            "id", "centroid" (a tuple of the normalized centroid coordinates (cx,cy,w,h) of the box) and "bbox" (a tuple
-            of the normalized (xmin,ymin,xmax,ymax) coordinate of the box)
+            object_list: a DetectionBatch, or a list of dictionaries. each dictionary has attributes of a detected
+            object such as "id" and "bbox" (a tuple of the normalized (xmin,ymin,xmax,ymax) coordinate of the box)
         returns:
         object_list: input object list without large boxes
         """
-        large_boxes = []
-        for i in range(len(object_list)):
-            if (object_list[i]["centroid"][2] * object_list[i]["centroid"][3]) > 0.25:
-                large_boxes.append(i)
-        updated_object_list = [j for i, j in enumerate(object_list) if i not in large_boxes]
-        return updated_object_list
+        centroids = as_detection_batch(object_list).centroids
+        small_boxes = (centroids[:, 2] * centroids[:, 3]) <= 0.25
+        return select(object_list, small_boxes)
 
     @staticmethod
-    def non_max_suppression_fast(object_list, overlapThresh):
+    def non_max_suppression_fast(object_list, overlapThresh, class_aware=False, order="Bottom", soft_sigma=0.0,
+                                 min_score=0.0):
 
         """
-        omitting duplicated boxes by applying an auxilary non-maximum-suppression.
+        omitting duplicated boxes by applying an auxilary non-maximum-suppression, see libs/nms.py.
         params:
-        object_list: a list of dictionaries. each dictionary has attributes of a detected object such
-        "id", "centroid" (a tuple of the normalized centroid coordinates (cx,cy,w,h) of the box) and "bbox" (a tuple
-        of the normalized (xmin,ymin,xmax,ymax) coordinate of the box)
+        object_list: a DetectionBatch, or a list of dictionaries. each dictionary has attributes of a detected
+        object such as "id" and "bbox" (a tuple of the normalized (xmin,ymin,xmax,ymax) coordinate of the box)
 
         overlapThresh: threshold of minimum IoU of to detect two box as duplicated.
+        class_aware: only suppress the overlapping boxes of the same class.
+        order: "Score" keeps the most confident boxes first, "Bottom" the boxes closest to the camera.
+        soft_sigma: if > 0, apply Gaussian soft-NMS with this sigma instead: the scores of the overlapping boxes
+        are decayed and the boxes whose score falls below min_score are removed.
 
         returns:
-        object_list: input object list without duplicated boxes
+        object_list: input object list without duplicated boxes, in the input order
         """
         # if there are no boxes, return an empty list
-        boxes = np.array([item["centroid"] for item in object_list])
-        corners = np.array([item["bbox"] for item in object_list])
-        if len(boxes) == 0:
-            return []
-        if boxes.dtype.kind == "i":
-            boxes = boxes.astype("float")
-        # initialize the list of picked indexes
-        pick = []
-        cy = boxes[:, 1]
-        cx = boxes[:, 0]
-        h = boxes[:, 3]
-        w = boxes[:, 2]
-        x1 = corners[:, 0]
-        x2 = corners[:, 2]
-        y1 = corners[:, 1]
-        y2 = corners[:, 3]
-        area = (h + 1) * (w + 1)
-        idxs = np.argsort(cy + (h / 2))
-        while len(idxs) > 0:
-            last = len(idxs) - 1
-            i = idxs[last]
-            pick.append(i)
-            xx1 = np.maximum(x1[i], x1[idxs[:last]])
-            yy1 = np.maximum(y1[i], y1[idxs[:last]])
-            xx2 = np.minimum(x2[i], x2[idxs[:last]])
-            yy2 = np.minimum(y2[i], y2[idxs[:last]])
-
-            w = np.maximum(0, xx2 - xx1 + 1)
-            h = np.maximum(0, yy2 - yy1 + 1)
-            # compute the ratio of overlap
-            overlap = (w * h) / area[idxs[:last]]
-            # delete all indexes from the index list that have
-            idxs = np.delete(idxs, np.concatenate(([last],
-                                                   np.where(overlap > overlapThresh)[0])))
-        updated_object_list = [j for i, j in enumerate(object_list) if i in pick]
-        return updated_object_list
+        if len(object_list) == 0:
+            return select(object_list, [])
+        detections = as_detection_batch(object_list)
+        class_ids = detections.class_ids if class_aware else None
+        if soft_sigma > 0:
+            pick, scores = soft_non_max_suppression(
+                detections.boxes, detections.scores, sigma=soft_sigma, min_score=min_score, class_ids=class_ids
+            )
+            if isinstance(object_list, DetectionBatch):
+                picked = detections[pick]
+                picked.scores[:] = scores
+                return picked
+            return [dict(obj, score=float(score)) for obj, score in zip(select(object_list, pick), scores)]
+        pick = non_max_suppression(
+            detections.boxes, detections.scores, iou_threshold=overlapThresh, class_ids=class_ids, order=order
+        )
+        return select(object_list, pick)
+
+    def calculate_distances(self, objects_list):
+        """
+        Calculate the distances between the objects with the configured [PostProcessor] DistanceEngine.
 
+        returns:
+        distances: a NxN ndarray of all of the distances ("Matrix" engine) or a SparseDistances instance
+        that only contains the pairs closer than DistThreshold ("SpatialHash" and "Incremental" engines)
+        """
+        if self.incremental_distances is not None:
+            return self.incremental_distances.update(
+                as_detection_batch(objects_list).track_ids, self._real_boxes(objects_list)
+            )
+        if self.distance_engine == 'SpatialHash':
+            boxes = self._real_boxes(objects_list)
+            if self.ground_plane is not None:
+                return find_violating_points(self.ground_plane.ground_positions(boxes) * 100, self.dist_threshold)
+            return find_violating_pairs(boxes, self.dist_threshold, self.dist_method)
+        return self.calculate_box_distances(objects_list)
 
     def calculate_distance_of_two_points_of_boxes(self,first_point, second_point):
     
@@ -245,50 +584,38 @@ class Distancing:
         This function calculates a distance matrix for detected bounding boxes.
         Two methods are implemented to calculate the distances, first one estimates distance of center points of the
         boxes and second one uses minimum distance of each of 4 points of bounding boxes.
+        The whole matrix is computed with array operations, see libs/distances.py. If the camera is calibrated
+        the distances between the feet of the people on the floor are used instead, see libs/ground_plane.py.
 
         params:
-        object_list: a list of dictionaries. each dictionary has attributes of a detected object such as
-        "id", "centroidReal" (a tuple of the centroid coordinates (cx,cy,w,h) of the box) and "bboxReal" (a tuple
-        of the (xmin,ymin,xmax,ymax) coordinate of the box)
+        object_list: a DetectionBatch, or a list of dictionaries. each dictionary has attributes of a detected
+        object such as "id", "centroidReal" (a tuple of the centroid coordinates (cx,cy,w,h) of the box) and
+        "bboxReal" (a tuple of the (xmin,ymin,xmax,ymax) coordinate of the box)
 
         returns:
         distances: a NxN ndarray which i,j element is estimated distance between i-th and j-th bounding box in real scene (cm)
 
         """
 
-        distances = []
-        for i in range(len(nn_out)):
-            distance_row=[]
-            for j in range(len(nn_out)):
-                if i == j:
-                    l = 0
-                else:
-                    if ( self.dist_method == 'FourCornerPointsDistance' ):
-                        lower_left_of_first_box = [nn_out[i]["bboxReal"][0],nn_out[i]["bboxReal"][1],nn_out[i]["centroidReal"][3]]
-                        lower_right_of_first_box = [nn_out[i]["bboxReal"][2],nn_out[i]["bboxReal"][1],nn_out[i]["centroidReal"][3]]
-                        upper_left_of_first_box = [nn_out[i]["bboxReal"][0],nn_out[i]["bboxReal"][3],nn_out[i]["centroidReal"][3]]
-                        upper_right_of_first_box = [nn_out[i]["bboxReal"][2],nn_out[i]["bboxReal"][3],nn_out[i]["centroidReal"][3]]
-                        
-                        lower_left_of_second_box = [nn_out[j]["bboxReal"][0],nn_out[j]["bboxReal"][1],nn_out[j]["centroidReal"][3]]
-                        lower_right_of_second_box = [nn_out[j]["bboxReal"][2],nn_out[j]["bboxReal"][1],nn_out[j]["centroidReal"][3]]
-                        upper_left_of_second_box = [nn_out[j]["bboxReal"][0],nn_out[j]["bboxReal"][3],nn_out[j]["centroidReal"][3]]
-                        upper_right_of_second_box = [nn_out[j]["bboxReal"][2],nn_out[j]["bboxReal"][3],nn_out[j]["centroidReal"][3]]
-
-                        l1 = self.calculate_distance_of_two_points_of_boxes(lower_left_of_first_box, lower_left_of_second_box)
-                        l2 = self.calculate_distance_of_two_points_of_boxes(lower_right_of_first_box, lower_right_of_second_box)
-                        l3 = self.calculate_distance_of_two_points_of_boxes(upper_left_of_first_box, upper_left_of_second_box)
-                        l4 = self.calculate_distance_of_two_points_of_boxes(upper_right_of_first_box, upper_right_of_second_box)
-                        
-                        l = min(l1, l2, l3, l4)
-                    elif ( self.dist_method == 'CenterPointsDistance' ):
-                        center_of_first_box = [nn_out[i]["centroidReal"][0],nn_out[i]["centroidReal"][1],nn_out[i]["centroidReal"][3]]
-                        center_of_second_box = [nn_out[j]["centroidReal"][0],nn_out[j]["centroidReal"][1],nn_out[j]["centroidReal"][3]]
-
-                        l = self.calculate_distance_of_two_points_of_boxes(center_of_first_box, center_of_second_box) 
-                distance_row.append(l)    
-            distances.append(distance_row)
-        distances_asarray = np.asarray(distances, dtype=np.float32)
-        return distances_asarray
+        boxes = self._real_boxes(nn_out)
+        if self.ground_plane is not None:
+            return ground_distances(self.ground_plane.ground_positions(boxes) * 100)
+        if self.dist_method == 'FourCornerPointsDistance':
+            return four_corner_points_distances(boxes, boxes[:, 3] - boxes[:, 1])
+        elif self.dist_method == 'CenterPointsDistance':
+            centroids = np.stack([
+                (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1],
+            ], axis=1)
+            return center_points_distances(centroids)
+        else:
+            raise ValueError('Not supported distance method named: ', self.dist_method)
+
+    def _real_boxes(self, objects_list):
+        # (xmin, ymin, xmax, ymax) pixel coordinates of the boxes in the frame resized to [App] Resolution
+        if isinstance(objects_list, DetectionBatch):
+            return objects_list.real_boxes(self.resolution)
+        return np.array([obj["bboxReal"] for obj in objects_list], dtype=np.float64).reshape(-1, 4)
 
 
 
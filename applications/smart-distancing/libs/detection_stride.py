@@ -0,0 +1,87 @@
+import numpy as np
+
+
+class DetectionStrideController:
+    """
+    Decide which frames are passed to the detector. The detector runs every K-th frame (the stride) and the
+    tracker extrapolates the boxes of the frames in between.
+
+    The stride adapts to the scene and the device:
+    1. Motion: the faster people move (in box heights per frame), the smaller the stride, so the extrapolated
+    boxes do not drift more than MotionTolerance box heights from the real position before the next detection.
+    2. Latency budget: the stride is at least large enough that the inference time amortized over K frames fits
+    the per-frame LatencyBudget.
+    3. Latency target: the stride is at least stride_floor, which the latency controller raises when the end-to-end
+    latency of the camera is over its target (see libs/latency_controller.py).
+    The stride is always kept between [Detector] MinDetectionStride and MaxDetectionStride.
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    """
+
+    def __init__(self, config):
+        detector_config = config.get_section_dict('Detector')
+        self.min_stride = max(int(detector_config.get('MinDetectionStride', 1)), 1)
+        self.max_stride = max(int(detector_config.get('MaxDetectionStride', 1)), self.min_stride)
+        self.latency_budget = float(detector_config.get('LatencyBudget', 100)) / 1000  # Seconds
+        self.motion_tolerance = float(detector_config.get('MotionTolerance', 0.25))
+        self.stride = self.min_stride
+        self.stride_floor = self.min_stride
+        # Exponential moving average of the inference time (seconds)
+        self.inference_time = None
+        self.total_frames = 0
+        self.detected_frames = 0
+        self._frames_to_detection = 0
+
+    def should_detect(self):
+        """
+        Returns True if the current frame should be passed to the detector.
+        Should be called exactly once per frame.
+        """
+        self.total_frames += 1
+        if self._frames_to_detection <= 0:
+            self._frames_to_detection = self.stride - 1
+            self.detected_frames += 1
+            return True
+        self._frames_to_detection -= 1
+        return False
+
+    def update_inference_time(self, inference_time):
+        # Seconds
+        if self.inference_time is None:
+            self.inference_time = inference_time
+        else:
+            self.inference_time = 0.9 * self.inference_time + 0.1 * inference_time
+
+    def update_motion(self, relative_speeds):
+        """
+        Adapt the stride to the motion of the scene.
+
+        Args:
+            relative_speeds: A numpy array of the speeds of the tracked objects in box heights per frame,
+            see CentroidTracker.relative_speeds
+        """
+        if self.max_stride == self.min_stride:
+            return
+        # Use a high percentile to ignore a few noisy tracks
+        speed = np.percentile(relative_speeds, 90) if len(relative_speeds) > 0 else 0
+        if speed > 0:
+            motion_stride = int(self.motion_tolerance / speed)
+        else:
+            motion_stride = self.max_stride
+        if self.inference_time is not None and self.latency_budget > 0:
+            latency_stride = int(np.ceil(self.inference_time / self.latency_budget))
+        else:
+            latency_stride = self.min_stride
+        self.stride = int(np.clip(max(motion_stride, latency_stride, self.stride_floor), self.min_stride,
+                                  self.max_stride))
+
+    def set_stride_floor(self, stride_floor):
+        # Lower bound of the stride, the next update_motion may raise the stride above it
+        self.stride_floor = int(np.clip(stride_floor, self.min_stride, self.max_stride))
+        self.stride = max(self.stride, self.stride_floor)
+
+    def skipped_fraction(self):
+        # Fraction of the frames which were not passed to the detector
+        if self.total_frames == 0:
+            return 0.0
+        return 1 - self.detected_frames / self.total_frames
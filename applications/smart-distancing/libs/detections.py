@@ -0,0 +1,178 @@
+"""
+Columnar representation of the detected objects of a frame.
+
+The detections of a frame are stored in a single structured NumPy array (one record per object), so every
+post-processing stage can read and write whole columns (boxes, scores, class ids, track ids) instead of building
+and parsing one Python dictionary per object. DetectionBatch.from_dicts and DetectionBatch.to_dicts convert from
+and to the list-of-dictionaries format ({"id": "0-3", "bbox": [...], ...}) for dict-based callers.
+"""
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ("bbox", np.float32, (4,)),  # Normalized (xmin, ymin, xmax, ymax)
+    ("score", np.float32),
+    ("class_id", np.int32),
+    ("track_id", np.int32),  # -1 for objects which are not tracked
+])
+
+
+class DetectionBatch:
+    """
+    The detected objects of a frame as a structured NumPy array of DETECTION_DTYPE records.
+
+    :param data: A 1-d numpy array of DETECTION_DTYPE, or None for an empty batch.
+    """
+
+    def __init__(self, data=None):
+        if data is None:
+            data = np.zeros(0, dtype=DETECTION_DTYPE)
+        self.data = np.atleast_1d(data)
+
+    @classmethod
+    def from_arrays(cls, boxes, scores=None, class_ids=None, track_ids=None):
+        """
+        Build a batch from column arrays.
+
+        Args:
+            boxes: A numpy array of shape [N, 4], normalized (xmin, ymin, xmax, ymax) of each object
+            scores: A numpy array of shape [N], defaults to 1
+            class_ids: A numpy array of shape [N], defaults to 0
+            track_ids: A numpy array of shape [N], defaults to -1
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        data = np.zeros(len(boxes), dtype=DETECTION_DTYPE)
+        data["bbox"] = boxes
+        data["score"] = 1 if scores is None else scores
+        data["class_id"] = 0 if class_ids is None else class_ids
+        data["track_id"] = -1 if track_ids is None else track_ids
+        return cls(data)
+
+    @classmethod
+    def from_detector_output(cls, objects_list):
+        """
+        Build a batch from the output of a detector's inference method, a list of dictionaries whose "bbox"
+        is the normalized (ymin, xmin, ymax, xmax) of the box and "id" is "<class id>-<index>".
+        """
+        if len(objects_list) == 0:
+            return cls()
+        boxes = np.array([obj["bbox"] for obj in objects_list], dtype=np.float32).reshape(-1, 4)
+        return cls.from_arrays(
+            boxes[:, [1, 0, 3, 2]],
+            scores=[obj.get("score", 1.0) for obj in objects_list],
+            class_ids=[int(str(obj["id"]).split("-")[0]) for obj in objects_list],
+        )
+
+    @classmethod
+    def from_dicts(cls, objects_list):
+        """
+        Build a batch from post-processed objects, a list of dictionaries whose "bbox" is the normalized
+        (xmin, ymin, xmax, ymax) of the box and "id" is "<class id>-<track id>".
+        """
+        if isinstance(objects_list, DetectionBatch):
+            return objects_list
+        if len(objects_list) == 0:
+            return cls()
+        ids = [str(obj.get("id", 0)).split("-") for obj in objects_list]
+        return cls.from_arrays(
+            [obj["bbox"] for obj in objects_list],
+            scores=[obj.get("score", 1.0) for obj in objects_list],
+            class_ids=[int(object_id[0]) for object_id in ids],
+            track_ids=[int(object_id[-1]) if len(object_id) > 1 else -1 for object_id in ids],
+        )
+
+    def to_dicts(self, resolution=None):
+        """
+        Convert the batch to a list of dictionaries with "id", "bbox", "score" and "centroid" keys, plus
+        "bboxReal" and "centroidReal" (pixel coordinates) if the (width, height) resolution is given.
+        """
+        objects_list = []
+        centroids = self.centroids
+        real_boxes = self.real_boxes(resolution) if resolution is not None else None
+        real_centroids = self.real_centroids(resolution) if resolution is not None else None
+        for i, record in enumerate(self.data):
+            obj = {
+                "id": str(record["class_id"]) + "-" + str(record["track_id"]),
+                "bbox": record["bbox"].tolist(),
+                "score": float(record["score"]),
+                "centroid": centroids[i].tolist(),
+            }
+            if resolution is not None:
+                obj["centroidReal"] = real_centroids[i].tolist()
+                obj["bboxReal"] = real_boxes[i].tolist()
+            objects_list.append(obj)
+        return objects_list
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        # Integer, slice, mask or index array; always returns a DetectionBatch
+        return DetectionBatch(self.data[index])
+
+    def copy(self):
+        return DetectionBatch(self.data.copy())
+
+    @staticmethod
+    def concatenate(batches):
+        batches = list(batches)
+        if len(batches) == 0:
+            return DetectionBatch()
+        return DetectionBatch(np.concatenate([batch.data for batch in batches]))
+
+    @property
+    def boxes(self):
+        # A view of the [N, 4] normalized (xmin, ymin, xmax, ymax) boxes
+        return self.data["bbox"]
+
+    @property
+    def scores(self):
+        return self.data["score"]
+
+    @property
+    def class_ids(self):
+        return self.data["class_id"]
+
+    @property
+    def track_ids(self):
+        return self.data["track_id"]
+
+    @property
+    def centroids(self):
+        # A new [N, 4] float64 array of the normalized (cx, cy, w, h) of the boxes
+        boxes = self.boxes.astype(np.float64)
+        return np.stack([
+            (boxes[:, 0] + boxes[:, 2]) / 2,
+            (boxes[:, 1] + boxes[:, 3]) / 2,
+            boxes[:, 2] - boxes[:, 0],
+            boxes[:, 3] - boxes[:, 1],
+        ], axis=1)
+
+    def real_boxes(self, resolution):
+        # [N, 4] (xmin, ymin, xmax, ymax) in pixels of a frame with the (width, height) resolution
+        width, height = resolution
+        return self.boxes.astype(np.float64) * np.array([width, height, width, height], dtype=np.float64)
+
+    def real_centroids(self, resolution):
+        # [N, 4] (cx, cy, w, h) in pixels of a frame with the (width, height) resolution
+        width, height = resolution
+        return self.centroids * np.array([width, height, width, height], dtype=np.float64)
+
+
+def as_detection_batch(objects):
+    # Accept a DetectionBatch or a list of post-processed object dictionaries
+    if isinstance(objects, DetectionBatch):
+        return objects
+    return DetectionBatch.from_dicts(objects)
+
+
+def select(objects, indices):
+    """
+    Select objects by index (or boolean mask) and return them in the same container type,
+    a DetectionBatch or a list of dictionaries.
+    """
+    if isinstance(objects, DetectionBatch):
+        return objects[indices]
+    indices = np.asarray(indices)
+    if indices.dtype == bool:
+        indices = np.flatnonzero(indices)
+    return [objects[i] for i in indices]
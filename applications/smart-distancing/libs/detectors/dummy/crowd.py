@@ -0,0 +1,113 @@
+"""
+A seeded synthetic crowd of pedestrians walking on the ground, used by the Dummy device to stress the
+post-processing, tracking, distance and ui paths without a model or an accelerator.
+
+Every person has a position on the floor (the normalized image position of their feet), a walking direction
+that drifts slowly and a speed. The size of the boxes grows with the y coordinate of the feet like in the
+view of a surveillance camera, the boxes jitter a little and the detector misses some of the persons: the
+ones hidden behind a closer person (occlusion) and some random ones (flicker). The same arguments always
+generate the same sequence of detections.
+"""
+import numpy as np
+
+from libs.detections import DetectionBatch
+
+# Height of a person's box (fraction of the frame height) at the top and at the bottom of the frame
+MIN_HEIGHT = 0.08
+MAX_HEIGHT = 0.4
+# Ratio of the width of a box to its height, both in normalized coordinates of a 16:9 frame
+WIDTH_RATIO = 0.4 * 9 / 16
+# The feet stay in the lower part of the frame, the upper part is the far end of the floor or the walls
+MIN_FEET_Y = 0.3
+
+
+class SyntheticCrowd:
+    """
+    :param crowd_size: Number of persons in the scene.
+    :param walking_speed: Mean speed of the persons close to the camera, as a fraction of the frame height
+        per frame. The far persons move slower in the image.
+    :param occlusion_rate: Probability that a person who is mostly hidden behind a closer person is missed.
+    :param flicker_rate: Probability that any person is missed in a frame.
+    :param seed: Seed of the random generator.
+    """
+
+    def __init__(self, crowd_size=20, walking_speed=0.005, occlusion_rate=0.5, flicker_rate=0.05, seed=0):
+        self.crowd_size = max(int(crowd_size), 0)
+        self.walking_speed = float(walking_speed)
+        self.occlusion_rate = float(occlusion_rate)
+        self.flicker_rate = float(flicker_rate)
+        self._rng = np.random.RandomState(seed)
+        n = self.crowd_size
+        self.feet = np.column_stack([self._rng.uniform(0, 1, n), self._rng.uniform(MIN_FEET_Y, 1, n)])
+        self.headings = self._rng.uniform(0, 2 * np.pi, n)
+        self.speeds = np.abs(self._rng.normal(self.walking_speed, self.walking_speed / 4, n))
+        self.height_factors = self._rng.uniform(0.9, 1.1, n)
+        self.base_scores = self._rng.uniform(0.5, 1, n)
+        self.frame_index = 0
+
+    def _scales(self):
+        # Relative size of each person in the image, 0 at the top of the floor and 1 at the bottom of the frame
+        return (self.feet[:, 1] - MIN_FEET_Y) / (1 - MIN_FEET_Y)
+
+    def boxes(self):
+        """
+        Returns:
+            The true (xmin, ymin, xmax, ymax) normalized boxes of all of the persons, a float array of shape (N, 4)
+        """
+        heights = (MIN_HEIGHT + (MAX_HEIGHT - MIN_HEIGHT) * self._scales()) * self.height_factors
+        widths = heights * WIDTH_RATIO
+        x, y = self.feet[:, 0], self.feet[:, 1]
+        return np.column_stack([x - widths / 2, y - heights, x + widths / 2, y])
+
+    def step(self):
+        """
+        Move the persons by one frame. The walking directions drift randomly and the persons bounce off the
+        borders of the floor.
+        """
+        n = self.crowd_size
+        self.headings += self._rng.normal(0, 0.1, n)
+        perspective = 0.25 + 0.75 * self._scales()
+        self.feet[:, 0] += np.cos(self.headings) * self.speeds * perspective
+        self.feet[:, 1] += np.sin(self.headings) * self.speeds * perspective
+        for axis, low in ((0, 0.0), (1, MIN_FEET_Y)):
+            below, above = self.feet[:, axis] < low, self.feet[:, axis] > 1
+            self.feet[below, axis] = 2 * low - self.feet[below, axis]
+            self.feet[above, axis] = 2 - self.feet[above, axis]
+            # Reflect the direction of motion along the axis
+            if axis == 0:
+                self.headings[below | above] = np.pi - self.headings[below | above]
+            else:
+                self.headings[below | above] = -self.headings[below | above]
+        self.frame_index += 1
+
+    def _occluded(self, boxes):
+        # Mask of the persons whose box is covered more than half by the box of a closer person
+        x1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+        y1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+        x2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+        y2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+        intersections = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        # closer[i, j] is True if the feet of j are lower in the image than the feet of i
+        closer = boxes[None, :, 3] > boxes[:, None, 3]
+        return np.any(closer & (intersections > areas[:, None] / 2), axis=1)
+
+    def detections(self, class_id=0):
+        """
+        Returns:
+            A DetectionBatch of the detected persons of the current frame, with jittered boxes clipped to
+            the frame and noisy scores
+        """
+        boxes = self.boxes()
+        n = len(boxes)
+        visible = self._rng.uniform(0, 1, n) >= self.flicker_rate
+        if n > 1 and self.occlusion_rate > 0:
+            visible &= ~(self._occluded(boxes) & (self._rng.uniform(0, 1, n) < self.occlusion_rate))
+        heights = boxes[:, 3] - boxes[:, 1]
+        boxes = boxes + self._rng.normal(0, 0.02, (n, 4)) * heights[:, None]
+        scores = np.clip(self.base_scores + self._rng.normal(0, 0.05, n), 0, 1)
+        return DetectionBatch.from_arrays(
+            np.clip(boxes[visible], 0, 1),
+            scores=scores[visible],
+            class_ids=np.full(np.count_nonzero(visible), class_id, dtype=np.int32),
+        )
@@ -1,29 +1,48 @@
-import numpy as np
 import time
 
+from libs.detectors.dummy.crowd import SyntheticCrowd
+from libs.detectors.utils.fps_calculator import convert_infr_time_to_fps
+
+
 class Detector:
     """
-    Detects Random bounding boxes
+    Detects the persons of a synthetic crowd
 
-    Detector class is a high level class for detecting object using edgetpu devices.
-    When an instance of the Detector is created you can call inference method and feed your
-    input image in order to get the detection results.
+    Detector class returns the detections of a seeded synthetic crowd (see crowd.py) instead of running a
+    model, so the tracker, distance and ui paths can be load tested deterministically without an accelerator.
+    Each inference call moves the crowd by one frame, the input image is ignored.
 
     :param config: Is a ConfigEngine instance which provides necessary parameters.
     """
 
     def __init__(self, config):
         self.config = config
-        self.name = self.config.get_section_dict('Detector')['Name']
-        self.class_id = self.config.get_section_dict('Detector')['ClassID']
+        detector_config = self.config.get_section_dict('Detector')
+        self.name = detector_config['Name']
+        self.class_id = int(detector_config['ClassID'])
+        self.crowd = SyntheticCrowd(
+            crowd_size=int(detector_config.get('CrowdSize', 20)),
+            walking_speed=float(detector_config.get('WalkingSpeed', 0.005)),
+            occlusion_rate=float(detector_config.get('OcclusionRate', 0.5)),
+            flicker_rate=float(detector_config.get('FlickerRate', 0.05)),
+            seed=int(detector_config.get('CrowdSeed', 0)),
+        )
+        # Artificial latency of each inference call (seconds), 0 runs as fast as possible
+        self.latency = float(detector_config.get('SimulatedLatency', 0)) / 1000
+        self.fps = None
 
     def inference(self, resized_rgb_image):
-        self.fps = np.random.choice([0.5, 1, 2])
-        time.sleep(1.0 / self.fps)
-        bbox_transform = np.array([[1, 0, 0, 0], [0, 1, 0, 0], [1, 0, 1, 0], [0, 1, 0, 1]]) * 0.5
-        class_id = self.class_id
-        return [{
-            'id': str(class_id)+"-"+str(i),
-            'bbox': (bbox_transform @ np.random.rand(4)).tolist(),
-            'cls': class_id
-        } for i in range(np.random.randint(5))]
+        return self.inference_batch([resized_rgb_image])[0]
+
+    def inference_batch(self, resized_rgb_images):
+        # Simulate a device which processes the whole batch in a single call
+        t_begin = time.perf_counter()
+        result = []
+        for _ in resized_rgb_images:
+            self.crowd.step()
+            result.append(self.crowd.detections(self.class_id))
+        if self.latency > 0:
+            time.sleep(self.latency)
+        inference_time = max(time.perf_counter() - t_begin, 1e-6)
+        self.fps = convert_infr_time_to_fps(inference_time / max(len(resized_rgb_images), 1))
+        return result
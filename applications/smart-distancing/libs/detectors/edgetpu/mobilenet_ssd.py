@@ -1,11 +1,12 @@
 import os
-import time
 import numpy as np
 import wget
 
 from tflite_runtime.interpreter import load_delegate
 from tflite_runtime.interpreter import Interpreter
 from ..utils.fps_calculator import convert_infr_time_to_fps
+from ..utils.output_decoder import OutputDecoder
+from ..utils.tensor_io import InterpreterTensors
 
 
 class Detector:
@@ -43,13 +44,13 @@ class Detector:
         # Load TFLite model and allocate tensors
         self.interpreter = Interpreter(self.model_path, experimental_delegates=[load_delegate("libedgetpu.so.1")])
         self.interpreter.allocate_tensors()
-        # Get the model input and output tensor details
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+        # Views of the input and output tensors (boxes, labels and scores), no copy is made for each frame
+        self.tensors = InterpreterTensors(self.interpreter)
+        # (height, width, channels) of the images that inference_into writes into the input tensor
+        self.input_shape = self.tensors.input_shape
 
-        # Get class id from config
-        self.class_id = int(self.config.get_section_dict('Detector')['ClassID'])
-        self.score_threshold = float(self.config.get_section_dict('Detector')['MinScore'])
+        # Filters the boxes of the configured ClassID and MinScore
+        self.decoder = OutputDecoder.from_config(self.config)
 
     def inference(self, resized_rgb_image):
         """
@@ -59,26 +60,37 @@ class Detector:
             resized_rgb_image: uint8 numpy array with shape (img_height, img_width, channels)
 
         Returns:
-            result: a dictionary contains of [{"id": 0, "bbox": [x1, y1, x2, y2], "score":s%}, {...}, {...}, ...]
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
         """
-        input_image = np.expand_dims(resized_rgb_image, axis=0)
-        # Fill input tensor with input_image
-        self.interpreter.set_tensor(self.input_details[0]["index"], input_image)
-        t_begin = time.perf_counter()
-        self.interpreter.invoke()
-        inference_time = time.perf_counter() - t_begin  # Second
-        self.fps = convert_infr_time_to_fps(inference_time)
-        # The function `get_tensor()` returns a copy of the tensor data.
-        # Use `tensor()` in order to get a pointer to the tensor.
-        boxes = self.interpreter.get_tensor(self.output_details[0]['index'])
-        labels = self.interpreter.get_tensor(self.output_details[1]['index'])
-        scores = self.interpreter.get_tensor(self.output_details[2]['index'])
-        # TODO: will be used for getting number of objects
-        # num = self.interpreter.get_tensor(self.output_details[3]['index'])
-
-        result = []
-        for i in range(boxes.shape[1]):  # number of boxes
-            if labels[0, i] == self.class_id and scores[0, i] > self.score_threshold:
-                result.append({"id": str(self.class_id) + '-' + str(i), "bbox": boxes[0, i, :], "score": scores[0, i]})
+        return self.inference_into(lambda input_image: np.copyto(input_image, resized_rgb_image))
 
+    def inference_into(self, fill_input):
+        """
+        Run inference on an image which fill_input writes straight into the input tensor of the interpreter,
+        e.g. FramePreprocessor.prepare_detector_input resizes and colour-converts a frame into it.
+        Args:
+            fill_input: a function which receives a uint8 numpy array with shape input_shape and writes the
+                RGB image into it
+
+        Returns:
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
+        """
+        result = self.tensors.run(fill_input, self._decode)
+        self.fps = convert_infr_time_to_fps(self.tensors.inference_time)
         return result
+
+    def _decode(self, boxes, labels, scores):
+        # The outputs are views of the interpreter's tensors, the decoder copies the kept boxes
+        return self.decoder.decode_ssd(boxes, labels, scores)[0]
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        The model is compiled with a fixed batch size of 1, so the interpreter is invoked once per image.
+
+        Args:
+            resized_rgb_images: list of uint8 numpy arrays with shape (img_height, img_width, channels)
+
+        Returns:
+            result: a list which contains the result of inference function for each image
+        """
+        return [self.inference(resized_rgb_image) for resized_rgb_image in resized_rgb_images]
@@ -27,9 +27,22 @@ class Detector:
             resized_rgb_image: A numpy array with shape [height, width, channels]
 
         Returns:
-            output: List of objects, each obj is a dict with two keys "id" and "bbox" and "score"
-            e.g. [{"id": 0, "bbox": [x1, y1, x2, y2], "score":s%}, {...}, {...}, ...]
+            output: A DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
         """
         self.fps = self.net.fps
         output = self.net.inference(resized_rgb_image)
         return output
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        Run inference on a list of images and get Frames rate (fps)
+
+        Args:
+            resized_rgb_images: A list of numpy arrays with shape [height, width, channels]
+
+        Returns:
+            output: List of the inference results of the images, see inference method
+        """
+        output = self.net.inference_batch(resized_rgb_images)
+        self.fps = self.net.fps
+        return output
@@ -4,6 +4,7 @@ import tensorrt as trt
 import pycuda.driver as cuda
 import time
 from ..utils.fps_calculator import convert_infr_time_to_fps
+from ..utils.output_decoder import DETECTION_OUTPUT_SIZE, OutputDecoder
 import pycuda.autoinit  # Required for initializing CUDA driver
 
 
@@ -12,7 +13,8 @@ class Detector:
     Perform object detection with the given prebuilt tensorrt engine.
 
     :param config: Is a ConfigEngine instance which provides necessary parameters.
-    :param output_layout:
+    :param output_layout: Number of values of each detection of the engine output, only the 7 values of the
+        DetectionOutput layout are supported, see libs/detectors/utils/output_decoder.py
     """
 
     def _load_plugins(self):
@@ -49,9 +51,11 @@ class Detector:
         """ Initialize TensorRT plugins, engine and conetxt. """
         self.config = config
         self.model = self.config.get_section_dict('Detector')['Name']
-        self.class_id = int(self.config.get_section_dict('Detector')['ClassID'])
-        self.conf_threshold = self.config.get_section_dict('Detector')['MinScore']
+        if output_layout != DETECTION_OUTPUT_SIZE:
+            raise ValueError('unsupported output layout: ' + str(output_layout))
         self.output_layout = output_layout
+        # The TensorRT NMS plugin outputs DetectionOutput rows, label 0 of the model is the background
+        self.decoder = OutputDecoder.from_config(self.config, layout="DetectionOutput", label_offset=1)
         self.trt_logger = trt.Logger(trt.Logger.INFO)
         self._load_plugins()
         self.engine = self._load_engine()
@@ -78,25 +82,6 @@ class Detector:
         img = (2.0 / 255.0) * img - 1.0
         return img
 
-    def _postprocess_trt(self, img, output):
-        """ Postprocess TRT SSD output. """
-        img_h, img_w, _ = img.shape
-        boxes, confs, clss = [], [], []
-        for prefix in range(0, len(output), self.output_layout):
-            # index = int(output[prefix+0])
-            conf = float(output[prefix + 2])
-            if conf < float(self.conf_threshold):
-                continue
-            x1 = (output[prefix + 3])  # * img_w)
-            y1 = (output[prefix + 4])  # * img_h)
-            x2 = (output[prefix + 5])  # * img_w)
-            y2 = (output[prefix + 6])  # * img_h)
-            cls = int(output[prefix + 1])
-            boxes.append((y1, x1, y2, x2))
-            confs.append(conf)
-            clss.append(cls)
-        return boxes, confs, clss
-
     def inference(self, img):
         """
         Detect objects in the input image.
@@ -105,7 +90,7 @@ class Detector:
             img: uint8 numpy array with shape (img_height, img_width, channels)
 
         Returns:
-            result: a dictionary contains of [{"id": 0, "bbox": [x1, y1, x2, y2], "score": s% }, {...}, {...}, ...]
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
         """
         img_resized = self._preprocess_trt(img)
         # transfer the data to the GPU, run inference and the copy the results back
@@ -128,11 +113,16 @@ class Detector:
 
         # Calculate Frames rate (fps)
         self.fps = convert_infr_time_to_fps(inference_time)
-        output = self.host_outputs[0]
-        boxes, scores, classes = self._postprocess_trt(img, output)
-        result = []
-        for i in range(len(boxes)):  # number of boxes
-            if classes[i] == self.class_id + 1:
-                result.append({"id": str(classes[i] - 1) + '-' + str(i), "bbox": boxes[i], "score": scores[i]})
-
-        return result
+        return self.decoder.decode_detection_output(self.host_outputs[0])[0]
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        The engine buffers are allocated for a single image, so the engine is executed once per image.
+
+        Args:
+            resized_rgb_images: list of uint8 numpy arrays with shape (img_height, img_width, channels)
+
+        Returns:
+            result: a list which contains the result of inference function for each image
+        """
+        return [self.inference(resized_rgb_image) for resized_rgb_image in resized_rgb_images]
@@ -0,0 +1,47 @@
+from libs.detections import DetectionBatch
+from libs.recording import read_recording, recording_path
+
+
+class Detector:
+    """
+    Replay the detector outputs of a recording (see libs/recording.py) instead of running a model.
+
+    The recorded outputs are looked up by the index of the frame in the video, so they are replayed on exactly
+    the frames they were recorded on: the pipeline passes the frames which were passed to the detector during
+    the recording (see recorded), whatever the detection stride or the timing of the replay would choose, the
+    frames whose detector was skipped by the motion gate reuse the result of the frame before them (see
+    reused), and the tracker extrapolates the other ones like it did then. There is no artificial latency, so the
+    post-processing runs as fast as possible.
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    :param source_name: Name of the video source, each camera of a multi-camera config replays its own
+        recording, see recording_path.
+    """
+
+    def __init__(self, config, source_name=None):
+        self.config = config
+        self.name = self.config.get_section_dict('Detector')['Name']
+        self.path = recording_path(self.config.get_section_dict('Detector')['ReplayPath'], source_name)
+        self.video_fps, self.frame_count, self.frames = read_recording(self.path)
+
+    def recorded(self, frame_index):
+        # True if the frame was passed to the detector during the recording
+        return self.frames.get(frame_index) is not None
+
+    def reused(self, frame_index):
+        # True if the frame reused the result of the frame before it during the recording
+        return frame_index in self.frames and self.frames[frame_index] is None
+
+    def inference(self, frame_index):
+        """
+        Returns the recorded DetectionBatch of a frame, or an empty batch if the frame was not passed to the
+        detector during the recording.
+
+        Args:
+            frame_index: index of the frame in the video; the Replay device takes it instead of an image
+        """
+        detections = self.frames.get(frame_index)
+        return DetectionBatch() if detections is None else detections
+
+    def inference_batch(self, frame_indices):
+        return [self.inference(frame_index) for frame_index in frame_indices]
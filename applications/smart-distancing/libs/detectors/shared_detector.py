@@ -0,0 +1,117 @@
+import threading
+from concurrent.futures import Future
+
+from libs.detectors.utils.batch_collector import BatchCollector
+
+
+class SharedDetector:
+    """
+    Build the detector of the configured device once and share it between several video streams.
+
+    The underlying detectors (TFLite interpreters, TensorRT contexts, ...) are not thread-safe, so the
+    inference calls of the different streams are serialized with a lock. If [Detector] MaxBatchSize is
+    bigger than one, the frames of the streams are gathered by a BatchCollector and the detector runs
+    once per batch instead of once per frame. The devices with several infer requests (x86 openvino with
+    [Detector] InferRequests) run the images of inference_async in parallel without the lock. The TFLite
+    devices (EdgeTPU, TFLite) let inference_into write the image straight into their input tensor.
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    :param source_name: Name of the video source for the devices which depend on it (Replay), None if the
+        detector is shared or the config has a single source.
+    """
+
+    def __init__(self, config, source_name=None):
+        self.config = config
+        self.device = self.config.get_section_dict('Detector')['Device']
+        self.net = None
+        self._lock = threading.Lock()
+        if self.device == 'Jetson':
+            from libs.detectors.jetson.detector import Detector
+            self.net = Detector(self.config)
+        elif self.device == 'EdgeTPU':
+            from libs.detectors.edgetpu.detector import Detector
+            self.net = Detector(self.config)
+        elif self.device == 'Dummy':
+            from libs.detectors.dummy.detector import Detector
+            self.net = Detector(self.config)
+        elif self.device == 'x86':
+            from libs.detectors.x86.detector import Detector
+            self.net = Detector(self.config)
+        elif self.device == 'TFLite':
+            from libs.detectors.tflite.detector import Detector
+            self.net = Detector(self.config)
+        elif self.device == 'Replay':
+            from libs.detectors.replay.detector import Detector
+            self.net = Detector(self.config, source_name)
+        else:
+            raise ValueError('Not supported device named: ', self.device)
+        self.name = self.net.name
+
+        self.collector = None
+        max_batch_size = int(self.config.get_section_dict('Detector').get('MaxBatchSize', 1))
+        if max_batch_size > 1:
+            max_wait_time = float(self.config.get_section_dict('Detector').get('MaxBatchWaitTime', 0.01))
+            self.collector = BatchCollector(self, max_batch_size, max_wait_time)
+
+    @property
+    def fps(self):
+        return getattr(self.net, 'fps', None)
+
+    def inference(self, resized_rgb_image):
+        """
+        Run inference on an image, see the inference method of the device's Detector.
+        """
+        if self.collector is not None:
+            return self.collector.inference(resized_rgb_image)
+        with self._lock:
+            return self.net.inference(resized_rgb_image)
+
+    @property
+    def async_requests(self):
+        # Number of images the device can run at once, more than one if it implements inference_async
+        return getattr(self.net, 'async_requests', 1)
+
+    def inference_async(self, resized_rgb_image):
+        """
+        Submit an image to the detector and return a concurrent.futures.Future of its result. The devices with
+        several infer requests run the images in parallel, the others run the inference before returning.
+        """
+        if self.async_requests > 1:
+            # The requests of the device are thread-safe, no lock is needed
+            return self.net.inference_async(resized_rgb_image)
+        future = Future()
+        try:
+            future.set_result(self.inference(resized_rgb_image))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def recorded(self, frame_index):
+        # Replay device: True if the frame was passed to the detector during the recording
+        return self.net.recorded(frame_index)
+
+    def reused(self, frame_index):
+        # Replay device: True if the frame reused the result of the frame before it during the recording
+        return self.net.reused(frame_index)
+
+    @property
+    def input_shape(self):
+        # (height, width, channels) of the images of inference_into, None if the device does not support it
+        if self.collector is not None:
+            return None
+        return getattr(self.net, 'input_shape', None)
+
+    def inference_into(self, fill_input):
+        """
+        Run inference on an image which fill_input writes straight into the input tensor of the device, see
+        the inference_into method of the device's Detector. Only supported if input_shape is not None.
+        """
+        with self._lock:
+            return self.net.inference_into(fill_input)
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        Run inference on a list of images, see the inference_batch method of the device's Detector.
+        """
+        with self._lock:
+            return self.net.inference_batch(resized_rgb_images)
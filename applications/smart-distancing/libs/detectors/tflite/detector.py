@@ -0,0 +1,67 @@
+class Detector:
+    """
+    Detector class is a high level class for detecting object on the CPU with the TFLite interpreter.
+    When an instance of the Detector is created you can call inference method and feed your
+    input image in order to get the detection results.
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.net = None
+        self.fps = None
+        # Get model name from the config
+        self.name = self.config.get_section_dict('Detector')['Name']
+        from . import mobilenet_ssd
+        if self.name in mobilenet_ssd.MODEL_FILES:
+            self.net = mobilenet_ssd.Detector(self.config)
+        else:
+            raise ValueError('Not supported network named: ', self.name)
+
+    def inference(self, resized_rgb_image):
+        """
+        Run inference on an image and get Frames rate (fps)
+
+        Args:
+            resized_rgb_image: A numpy array with shape [height, width, channels]
+
+        Returns:
+            output: A DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
+        """
+        output = self.net.inference(resized_rgb_image)
+        self.fps = self.net.fps
+        return output
+
+    @property
+    def input_shape(self):
+        # (height, width, channels) of the images of inference_into
+        return self.net.input_shape
+
+    def inference_into(self, fill_input):
+        """
+        Run inference on an image written straight into the input tensor of the network and get Frames rate (fps)
+
+        Args:
+            fill_input: A function which writes the RGB image into the uint8 array of shape input_shape it receives
+
+        Returns:
+            output: A DetectionBatch of the detected objects, see inference method
+        """
+        output = self.net.inference_into(fill_input)
+        self.fps = self.net.fps
+        return output
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        Run inference on a list of images and get Frames rate (fps)
+
+        Args:
+            resized_rgb_images: A list of numpy arrays with shape [height, width, channels]
+
+        Returns:
+            output: List of the inference results of the images, see inference method
+        """
+        output = self.net.inference_batch(resized_rgb_images)
+        self.fps = self.net.fps
+        return output
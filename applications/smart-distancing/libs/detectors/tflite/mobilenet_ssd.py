@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+
+from tflite_runtime.interpreter import Interpreter
+from ..utils.fps_calculator import convert_infr_time_to_fps
+from ..utils.output_decoder import OutputDecoder
+from ..utils.tensor_io import InterpreterTensors
+
+# The CPU versions of the EdgeTPU models: the quantized .tflite files before they are compiled by edgetpu_compiler
+MODEL_FILES = {
+    "mobilenet_ssd_v2": "mobilenet_ssd_v2_coco_quant_postprocess.tflite",
+    "pedestrian_ssd_mobilenet_v2": "ped_ssd_mobilenet_v2_quantized.tflite",
+    "pedestrian_ssdlite_mobilenet_v2": "ped_ssdlite_mobilenet_v2_quantized.tflite",
+}
+
+
+def num_threads_from_config(detector_config):
+    # [Detector] NumThreads, a number or Auto (one thread per CPU core)
+    num_threads = detector_config.get('NumThreads', 'Auto')
+    if num_threads == 'Auto':
+        return os.cpu_count() or 1
+    return max(int(num_threads), 1)
+
+
+class Detector:
+    """
+    Perform object detection with the given model on the CPU. The model is a .tflite file of an SSD with the
+    TFLite postprocess op, like the EdgeTPU models but not compiled for the EdgeTPU, so no delegate is loaded
+    and the interpreter runs the ops on [Detector] NumThreads threads. The quantized (uint8) and float models
+    are both supported, float inputs are normalized to [-1, 1].
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        detector_config = self.config.get_section_dict('Detector')
+        # Get the model name from the config
+        self.model_name = detector_config['Name']
+        # Frames Per Second
+        self.fps = None
+        self.model_file = MODEL_FILES[self.model_name]
+        self.model_path = 'libs/detectors/tflite/data/' + self.model_file
+
+        # Get the model .tflite file path from the config.
+        user_model_path = detector_config['ModelPath']
+        if len(user_model_path) > 0:
+            print('using %s as model' % user_model_path)
+            self.model_path = user_model_path
+        if not os.path.isfile(self.model_path):
+            raise FileNotFoundError(
+                'model does not exist under: %s, set [Detector] ModelPath to the CPU (not compiled for the '
+                'EdgeTPU) .tflite file of %s' % (self.model_path, self.model_name)
+            )
+
+        # Load TFLite model and allocate tensors
+        self.num_threads = num_threads_from_config(detector_config)
+        try:
+            self.interpreter = Interpreter(self.model_path, num_threads=self.num_threads)
+        except TypeError:
+            # tflite_runtime < 2.3 has no num_threads argument and runs on one thread
+            print('this tflite_runtime can not set the number of threads, using 1 thread')
+            self.num_threads = 1
+            self.interpreter = Interpreter(self.model_path)
+        print('TFLite interpreter of %s running on %d threads' % (self.model_name, self.num_threads))
+        self.interpreter.allocate_tensors()
+        # Views of the input and output tensors (boxes, labels and scores), no copy is made for each frame
+        self.tensors = InterpreterTensors(self.interpreter)
+        # (height, width, channels) of the images that inference_into writes into the input tensor
+        self.input_shape = self.tensors.input_shape
+        # The uint8 image of the float models, normalized into their input tensor
+        self._float_input = self.tensors.input_dtype == np.float32
+        self._image = np.empty(self.input_shape, dtype=np.uint8) if self._float_input else None
+
+        # Filters the boxes of the configured ClassID and MinScore
+        self.decoder = OutputDecoder.from_config(self.config)
+
+    def inference(self, resized_rgb_image):
+        """
+        inference function sets input tensor to input image and gets the output.
+        The interpreter instance provides corresponding detection output which is used for creating result
+        Args:
+            resized_rgb_image: uint8 numpy array with shape (img_height, img_width, channels)
+
+        Returns:
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
+        """
+        return self.inference_into(lambda input_image: np.copyto(input_image, resized_rgb_image))
+
+    def inference_into(self, fill_input):
+        """
+        Run inference on an image which fill_input writes straight into the input tensor of the interpreter,
+        e.g. FramePreprocessor.prepare_detector_input resizes and colour-converts a frame into it.
+        Args:
+            fill_input: a function which receives a uint8 numpy array with shape input_shape and writes the
+                RGB image into it
+
+        Returns:
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
+        """
+        if self._float_input:
+            fill_input = self._normalized(fill_input)
+        result = self.tensors.run(fill_input, self._decode)
+        self.fps = convert_infr_time_to_fps(self.tensors.inference_time)
+        return result
+
+    def _normalized(self, fill_input):
+        # Write the uint8 image into a buffer, then normalize it to [-1, 1] into the float input tensor
+        def fill_float_input(input_image):
+            fill_input(self._image)
+            np.subtract(self._image, 127.5, out=input_image, dtype=np.float32)
+            input_image *= 1 / 127.5
+        return fill_float_input
+
+    def _decode(self, boxes, labels, scores):
+        # The outputs are views of the interpreter's tensors, the decoder copies the kept boxes
+        return self.decoder.decode_ssd(boxes, labels, scores)[0]
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        The model has a fixed batch size of 1, so the interpreter is invoked once per image; each invocation
+        already runs on all of the threads.
+
+        Args:
+            resized_rgb_images: list of uint8 numpy arrays with shape (img_height, img_width, channels)
+
+        Returns:
+            result: a list which contains the result of inference function for each image
+        """
+        return [self.inference(resized_rgb_image) for resized_rgb_image in resized_rgb_images]
@@ -0,0 +1,75 @@
+"""
+Collect the frames of several video streams into batches for the detector.
+
+Each stream calls inference() with a single image from its own thread and blocks until the result is ready.
+A worker thread gathers the waiting images until the batch is full or the first image of the batch has waited
+for max_wait_time seconds, then runs a single inference_batch() call for all of them.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchCollector:
+    """
+    Gather images from several streams and run them through the detector's inference_batch method.
+
+    :param detector: A detector instance that implements inference_batch(images).
+    :param max_batch_size: Maximum number of images in a batch.
+    :param max_wait_time: Maximum time (seconds) to wait for more images after the first image of a batch arrived.
+    """
+
+    def __init__(self, detector, max_batch_size, max_wait_time):
+        self.detector = detector
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait_time = float(max_wait_time)
+        # Size of the last batch and the total number of batches, useful for tuning max_wait_time
+        self.last_batch_size = 0
+        self.batches = 0
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batch_collector", daemon=True)
+        self._thread.start()
+
+    def inference(self, resized_rgb_image):
+        """
+        Queue an image for the next batch and wait for its result.
+
+        Args:
+            resized_rgb_image: uint8 numpy array with shape (img_height, img_width, channels)
+
+        Returns:
+            result: list of the detected objects of the image, same as the detector's inference method
+        """
+        future = Future()
+        self._requests.put((resized_rgb_image, future))
+        return future.result()
+
+    def _collect(self):
+        # Block for the first image, then wait at most max_wait_time for the rest of the batch
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait_time
+        while len(batch) < self.max_batch_size:
+            remaining_time = deadline - time.perf_counter()
+            if remaining_time <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining_time))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            images = [image for image, _ in batch]
+            try:
+                results = self.detector.inference_batch(images)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.last_batch_size = len(batch)
+            self.batches += 1
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,105 @@
+"""
+Decode the raw output tensors of the detection models into DetectionBatch instances.
+
+All of the backends filter the candidate boxes of their models the same way (keep the boxes of the configured
+class whose score is above MinScore, normalize the coordinates), only the layout of the output tensors differs:
+
+    "SSD": the TensorFlow / TFLite SSD postprocess outputs, separate boxes [B, N, 4] (ymin, xmin, ymax, xmax),
+        classes [B, N] and scores [B, N] tensors (EdgeTPU and x86 models).
+    "DetectionOutput": the Caffe-style DetectionOutput layer of OpenVINO and of the TensorRT NMS plugin, rows of
+        7 values [image_id, label, score, xmin, ymin, xmax, ymax], the first row whose image_id is negative ends
+        the detections.
+
+The candidates are filtered with NumPy masks instead of a Python loop, so the decoding of a frame does not depend
+on the number of candidates of the model, and no dictionary is built for each object.
+"""
+import numpy as np
+
+from libs.detections import DetectionBatch
+
+LAYOUTS = ("SSD", "DetectionOutput")
+
+# Number of values of a row of the DetectionOutput layout
+DETECTION_OUTPUT_SIZE = 7
+
+
+class OutputDecoder:
+    """
+    :param class_id: Id of the class to keep, as reported in the output DetectionBatch.
+    :param score_threshold: The boxes whose score is not above this are removed.
+    :param layout: "SSD" or "DetectionOutput", see the module docstring.
+    :param label_offset: Difference between the labels of the model and class_id, e.g. 1 for the models whose
+        label 0 is the background class.
+    """
+
+    def __init__(self, class_id, score_threshold, layout="SSD", label_offset=0):
+        if layout not in LAYOUTS:
+            raise ValueError("unknown output layout: " + str(layout))
+        self.class_id = int(class_id)
+        self.score_threshold = float(score_threshold)
+        self.layout = layout
+        self.label_offset = int(label_offset)
+
+    @classmethod
+    def from_config(cls, config, layout="SSD", label_offset=0):
+        # Read ClassID and MinScore once, when the detector is built
+        detector_config = config.get_section_dict('Detector')
+        return cls(detector_config['ClassID'], detector_config['MinScore'], layout, label_offset)
+
+    def _batch(self, boxes, labels, scores):
+        # DetectionBatch of the candidates of one image which pass the class and score filter
+        labels = np.rint(labels).astype(np.int64)
+        keep = (labels == self.class_id + self.label_offset) & (scores > self.score_threshold)
+        return DetectionBatch.from_arrays(
+            np.clip(boxes[keep], 0, 1), scores=scores[keep], class_ids=np.full(int(keep.sum()), self.class_id)
+        )
+
+    def decode_ssd(self, boxes, classes, scores):
+        """
+        Decode the outputs of the "SSD" layout.
+
+        Args:
+            boxes: A float array of shape [B, N, 4] (or [N, 4] for one image), normalized (ymin, xmin, ymax, xmax)
+            classes: A numeric array of shape [B, N] (or [N]), the label of each box
+            scores: A float array of shape [B, N] (or [N])
+
+        Returns:
+            A list of B DetectionBatch instances with normalized (xmin, ymin, xmax, ymax) boxes
+        """
+        scores = np.asarray(scores)
+        num_images = scores.shape[0] if scores.ndim > 1 else 1
+        boxes = np.asarray(boxes).reshape(num_images, -1, 4)[:, :, [1, 0, 3, 2]]
+        classes = np.asarray(classes).reshape(num_images, -1)
+        scores = scores.reshape(num_images, -1)
+        return [self._batch(boxes[i], classes[i], scores[i]) for i in range(num_images)]
+
+    def decode_detection_output(self, output, num_images=1):
+        """
+        Decode the outputs of the "DetectionOutput" layout.
+
+        Args:
+            output: A float array whose size is a multiple of 7, the rows of all of the images of a batch
+            num_images: Number of images of the batch, the rows of the other image ids (padding) are ignored
+
+        Returns:
+            A list of num_images DetectionBatch instances with normalized (xmin, ymin, xmax, ymax) boxes
+        """
+        rows = np.asarray(output).reshape(-1, DETECTION_OUTPUT_SIZE)
+        image_ids = rows[:, 0]
+        ended = np.flatnonzero(image_ids < 0)
+        if len(ended) > 0:
+            rows, image_ids = rows[:ended[0]], image_ids[:ended[0]]
+        image_ids = image_ids.astype(np.int64)
+        results = []
+        for i in range(num_images):
+            image_rows = rows[image_ids == i]
+            results.append(self._batch(image_rows[:, 3:7], image_rows[:, 1], image_rows[:, 2]))
+        return results
+
+    def decode(self, *outputs, num_images=1):
+        """
+        Decode the outputs of the configured layout, see decode_ssd and decode_detection_output.
+        """
+        if self.layout == "SSD":
+            return self.decode_ssd(*outputs)
+        return self.decode_detection_output(outputs[0], num_images)
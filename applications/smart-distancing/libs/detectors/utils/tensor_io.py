@@ -0,0 +1,58 @@
+"""
+Zero-copy access to the input and output tensors of a TFLite interpreter.
+
+Interpreter.set_tensor copies the input image into the interpreter and get_tensor returns a copy of each output.
+Interpreter.tensor(index)() instead returns a numpy view of the tensor buffer, so the input image can be written
+(resized and colour-converted) straight into the buffer and the outputs can be decoded in place. The interpreter
+refuses to run while such a view is alive, so the views only live inside run(): the input view while the image
+is written, the output views while they are read.
+"""
+import time
+
+import numpy as np
+
+
+class InterpreterTensors:
+    """
+    :param interpreter: A TFLite Interpreter whose tensors are allocated.
+    :param num_outputs: Number of output tensors passed to read_outputs, in the order of get_output_details.
+    """
+
+    def __init__(self, interpreter, num_outputs=3):
+        self.interpreter = interpreter
+        input_details = self.interpreter.get_input_details()[0]
+        self.input_index = input_details['index']
+        self.input_dtype = np.dtype(input_details['dtype'])
+        # (height, width, channels) of the input image
+        self.input_shape = tuple(int(i) for i in input_details['shape'][1:])
+        output_details = self.interpreter.get_output_details()[:num_outputs]
+        self.output_indices = [details['index'] for details in output_details]
+        # Size of the copies that set_tensor and get_tensor make for each frame
+        self.input_bytes = int(np.prod(input_details['shape'])) * self.input_dtype.itemsize
+        self.output_bytes = sum(
+            int(np.prod(details['shape'])) * np.dtype(details['dtype']).itemsize for details in output_details
+        )
+        # Duration (seconds) of the last invoke
+        self.inference_time = None
+
+    def run(self, fill_input, read_outputs):
+        """
+        Write an image into the input tensor, run the interpreter and read its outputs without copying them.
+
+        Args:
+            fill_input: A function which receives the view of the input tensor (an array of shape input_shape)
+                and writes the image into it
+            read_outputs: A function which receives the views of the output tensors and returns the result,
+                the result must not reference the views (e.g. the boxes are copied by the decoder)
+
+        Returns:
+            The result of read_outputs
+        """
+        input_image = self.interpreter.tensor(self.input_index)()[0]
+        fill_input(input_image)
+        del input_image
+        t_begin = time.perf_counter()
+        self.interpreter.invoke()
+        self.inference_time = time.perf_counter() - t_begin  # Second
+        outputs = [self.interpreter.tensor(index)() for index in self.output_indices]
+        return read_outputs(*outputs)
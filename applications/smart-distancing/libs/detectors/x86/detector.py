@@ -27,3 +27,32 @@ class Detector:
         output = self.net.inference(resized_rgb_image)
         return output
 
+    @property
+    def async_requests(self):
+        # Number of images the network can run at once, see inference_async
+        return getattr(self.net, 'async_requests', 1)
+
+    def inference_async(self, resized_rgb_image):
+        """
+        Submit an image to the network without waiting for its result (openvino with [Detector] InferRequests > 1).
+
+        Returns:
+            output: A concurrent.futures.Future of the inference result of the image, see inference method
+        """
+        output = self.net.inference_async(resized_rgb_image)
+        self.fps = self.net.fps
+        return output
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        Run inference on a list of images and get Frames rate (fps)
+
+        Args:
+            resized_rgb_images: A list of numpy arrays with shape [height, width, channels]
+
+        Returns:
+            output: List of the inference results of the images, see inference method
+        """
+        output = self.net.inference_batch(resized_rgb_images)
+        self.fps = self.net.fps
+        return output
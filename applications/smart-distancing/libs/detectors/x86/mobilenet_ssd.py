@@ -6,6 +6,7 @@ import numpy as np
 import tensorflow as tf
 
 from libs.detectors.utils.fps_calculator import convert_infr_time_to_fps
+from libs.detectors.utils.output_decoder import OutputDecoder
 
 
 def load_model(model_name):
@@ -41,6 +42,8 @@ class Detector:
         self.fps = None
 
         self.detection_model = load_model('ssd_mobilenet_v2_coco_2018_03_29')
+        # Filters the boxes of the configured ClassID and MinScore
+        self.decoder = OutputDecoder.from_config(self.config)
 
     def inference(self, resized_rgb_image):
         """
@@ -50,26 +53,30 @@ class Detector:
             resized_rgb_image: uint8 numpy array with shape (img_height, img_width, channels)
 
         Returns:
-            result: a dictionary contains of [{"id": 0, "bbox": [x1, y1, x2, y2], "score":s%}, {...}, {...}, ...]
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
         """
-        input_image = np.expand_dims(resized_rgb_image, axis=0)
+        return self.inference_batch([resized_rgb_image])[0]
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        Run the model once for a batch of images. All of the images should have the same shape.
+
+        Args:
+            resized_rgb_images: list of uint8 numpy arrays with shape (img_height, img_width, channels)
+
+        Returns:
+            result: a list which contains the result of each image, see inference function
+        """
+        input_image = np.stack(resized_rgb_images)
         input_tensor = tf.convert_to_tensor(input_image)
         t_begin = time.perf_counter()
         output_dict = self.detection_model(input_tensor)
         inference_time = time.perf_counter() - t_begin  # Seconds
 
         # Calculate Frames rate (fps)
-        self.fps = convert_infr_time_to_fps(inference_time)
-
-        boxes = output_dict['detection_boxes']
-        labels = output_dict['detection_classes']
-        scores = output_dict['detection_scores']
-
-        class_id = int(self.config.get_section_dict('Detector')['ClassID'])
-        score_threshold = float(self.config.get_section_dict('Detector')['MinScore'])
-        result = []
-        for i in range(boxes.shape[1]):  # number of boxes
-            if labels[0, i] == class_id and scores[0, i] > score_threshold:
-                result.append({"id": str(class_id) + '-' + str(i), "bbox": boxes[0, i, :], "score": scores[0, i]})
+        self.fps = convert_infr_time_to_fps(inference_time / len(resized_rgb_images))
 
-        return result
+        boxes = output_dict['detection_boxes'].numpy()
+        labels = output_dict['detection_classes'].numpy()
+        scores = output_dict['detection_scores'].numpy()
+        return self.decoder.decode_ssd(boxes, labels, scores)
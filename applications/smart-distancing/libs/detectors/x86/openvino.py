@@ -1,19 +1,28 @@
+import queue
 import time
+from concurrent.futures import Future
 
 import numpy as np
 
 import cv2 as cv
 
 from libs.detectors.utils.fps_calculator import convert_infr_time_to_fps
+from libs.detectors.utils.output_decoder import OutputDecoder
 
 from openvino.inference_engine import IECore
 
+
 class Detector:
     """
     Perform object detection with the given model. The model is a quantized tflite
     file which if the detector can not find it at the path it will download it
     from neuralet repository automatically.
 
+    If [Detector] InferRequests is bigger than one (or Auto), the network is loaded with that many infer requests
+    and CPU throughput streams, and inference_async keeps several images in flight: each image is submitted to an
+    idle request and its Future is resolved by the completion callback of the request, so a pipeline that submits
+    frame N+1 before waiting for frame N keeps all of the CPU cores busy.
+
     :param config: Is a ConfigEngine instance which provides necessary parameters.
     """
 
@@ -32,7 +41,34 @@ class Detector:
             weights='{}/person-detection-retail-0013.bin'.format(model_path)
         )
         self.input_layer = next(iter(network.inputs))
-        self.detection_model = core.load_network(network=network, device_name='CPU')
+        detector_config = self.config.get_section_dict('Detector')
+        # Number of asynchronous infer requests, Auto lets the CPU plugin choose, 1 runs the synchronous infer
+        infer_requests = detector_config.get('InferRequests', '1')
+        if infer_requests == 'Auto' or int(infer_requests) > 1:
+            # Each request processes one image, the batches of several streams run on parallel requests instead
+            self.max_batch_size = 1
+            network.batch_size = 1
+            streams = 'CPU_THROUGHPUT_AUTO' if infer_requests == 'Auto' else infer_requests
+            # num_requests=0 creates the optimal number of requests for the streams
+            self.detection_model = core.load_network(
+                network=network, device_name='CPU', config={'CPU_THROUGHPUT_STREAMS': streams},
+                num_requests=0 if infer_requests == 'Auto' else int(infer_requests),
+            )
+        else:
+            # The network is loaded with a fixed batch size, smaller batches are padded with empty images
+            self.max_batch_size = int(detector_config.get('MaxBatchSize', 1))
+            network.batch_size = self.max_batch_size
+            self.detection_model = core.load_network(network=network, device_name='CPU')
+        self.async_requests = len(self.detection_model.requests) if infer_requests == 'Auto' else \
+            max(int(infer_requests), 1)
+        # (height, width) of the network input, [Detector] ImageSize should match it so no resize is needed
+        self.input_size = tuple(network.inputs[self.input_layer].shape[2:4])
+        # Ids of the requests which are not running, inference_async blocks until one of them is free
+        self._idle_requests = queue.Queue()
+        for request_id in range(self.async_requests):
+            self._idle_requests.put(request_id)
+        # Filters the boxes of the configured ClassID and MinScore
+        self.decoder = OutputDecoder.from_config(self.config, layout="DetectionOutput")
 
     def inference(self, resized_rgb_image):
         """
@@ -42,32 +78,97 @@ class Detector:
             resized_rgb_image: uint8 numpy array with shape (img_height, img_width, channels)
 
         Returns:
-            result: a dictionary contains of [{"id": 0, "bbox": [x1, y1, x2, y2], "score":s%}, {...}, {...}, ...]
+            result: a DetectionBatch of the detected objects, see libs/detectors/utils/output_decoder.py
         """
+        return self.inference_batch([resized_rgb_image])[0]
+
+    def _input_image(self, resized_rgb_image, out=None):
+        # Convert an image to the [3, height, width] network input, resizing it only if its size differs
+        if resized_rgb_image.shape[:2] != self.input_size:
+            resized_rgb_image = cv.resize(resized_rgb_image, (self.input_size[1], self.input_size[0]))
+        if out is None:
+            return np.ascontiguousarray(resized_rgb_image.transpose(2, 0, 1)[np.newaxis])
+        out[...] = resized_rgb_image.transpose(2, 0, 1)
+        return out
+
+    def inference_async(self, resized_rgb_image):
+        """
+        Submit an image to an idle infer request, blocks while all of the requests are running.
 
-        required_image_size = (544, 320)
-
-        input_image = cv.resize(resized_rgb_image, required_image_size)
-        input_image = input_image.transpose(2, 0, 1)
-        input_image = np.expand_dims(input_image, axis=0)
+        Args:
+            resized_rgb_image: uint8 numpy array with shape (img_height, img_width, channels)
 
+        Returns:
+            A concurrent.futures.Future whose result is the DetectionBatch of the image, see inference function
+        """
+        future = Future()
+        request_id = self._idle_requests.get()
+        request = self.detection_model.requests[request_id]
         t_begin = time.perf_counter()
-        output = self.detection_model.infer(
-            inputs={self.input_layer: input_image}
-        )['detection_out']
-        inference_time = time.perf_counter() - t_begin  # Seconds
 
-        # Calculate Frames rate (fps)
-        self.fps = convert_infr_time_to_fps(inference_time)
+        def completed(status, request_id):
+            # Runs on a thread of the inference engine
+            try:
+                if status != 0:
+                    raise RuntimeError('infer request failed with status %s' % status)
+                if hasattr(request, 'output_blobs'):
+                    output = request.output_blobs['detection_out'].buffer
+                else:
+                    # OpenVINO 2020
+                    output = request.outputs['detection_out']
+                # The decoder copies the detections, the request can be reused after this
+                result = self.decoder.decode_detection_output(output)[0]
+                # Estimated throughput when all of the requests are busy
+                self.fps = convert_infr_time_to_fps((time.perf_counter() - t_begin) / self.async_requests)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self._idle_requests.put(request_id)
+
+        try:
+            request.set_completion_callback(completed, request_id)
+            request.async_infer({self.input_layer: self._input_image(resized_rgb_image)})
+        except Exception:
+            self._idle_requests.put(request_id)
+            raise
+        return future
+
+    def inference_batch(self, resized_rgb_images):
+        """
+        Run the network on a list of images, one infer call per max_batch_size images. With several infer
+        requests the images run in parallel on different requests.
 
-        class_id = int(self.config.get_section_dict('Detector')['ClassID'])
-        score_threshold = float(self.config.get_section_dict('Detector')['MinScore'])
-        result = []
+        Args:
+            resized_rgb_images: list of uint8 numpy arrays with shape (img_height, img_width, channels)
 
-        for i, (_, label, score, x_min, y_min, x_max, y_max) in enumerate(output[0][0]):
-            box = [y_min, x_min, y_max, x_max]
-            if label == class_id and score > score_threshold:
-                result.append({"id": str(class_id) + '-' + str(i), "bbox": box, "score": score})
+        Returns:
+            result: a list which contains the result of each image, see inference function
+        """
+        if self.async_requests > 1:
+            futures = [self.inference_async(resized_rgb_image) for resized_rgb_image in resized_rgb_images]
+            return [future.result() for future in futures]
+        results = []
+        inference_time = 0
+        for batch_begin in range(0, len(resized_rgb_images), self.max_batch_size):
+            images = resized_rgb_images[batch_begin:batch_begin + self.max_batch_size]
+            if self.max_batch_size == 1:
+                input_image = self._input_image(images[0])
+            else:
+                input_image = np.zeros((self.max_batch_size, 3) + self.input_size, dtype=np.uint8)
+                for batch_index, resized_rgb_image in enumerate(images):
+                    self._input_image(resized_rgb_image, input_image[batch_index])
+
+            t_begin = time.perf_counter()
+            output = self.detection_model.infer(
+                inputs={self.input_layer: input_image}
+            )['detection_out']
+            inference_time += time.perf_counter() - t_begin  # Seconds
+
+            # The detections of the padding images are ignored
+            results.extend(self.decoder.decode_detection_output(output, len(images)))
 
-        return result
+        # Calculate Frames rate (fps)
+        self.fps = convert_infr_time_to_fps(inference_time / len(resized_rgb_images))
 
+        return results
@@ -0,0 +1,135 @@
+"""
+Vectorized estimation of the physical distances between detected people.
+
+Every person is assumed to be H = 170 cm tall, so a displacement of d pixels between two points of two boxes
+with heights h1 and h2 (pixels) is mapped to d * H * (1/h1 + 1/h2) / 2 centimeters. The functions compute the
+whole NxN distance matrix with array operations instead of calling a per-pair function N^2 times.
+"""
+import numpy as np
+
+PERSON_HEIGHT = 170  # Centimeters
+
+
+def points_distances(points, heights):
+    """
+    Calculate the estimated physical distance between each pair of points.
+
+    Args:
+        points: A numpy array of shape [N, 2], (x, y) pixel coordinates of one point of each box
+        heights: A numpy array of shape [N], the height of each box in pixels
+
+    Returns:
+        distances: a NxN float64 ndarray which i,j element is the estimated distance (cm) between
+        the i-th and j-th points
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    inverse_heights = 1.0 / np.asarray(heights, dtype=np.float64).reshape(-1)
+    displacements = points[:, np.newaxis, :] - points[np.newaxis, :, :]
+    pixel_distances = np.sqrt(np.sum(displacements ** 2, axis=2))
+    scales = PERSON_HEIGHT * (inverse_heights[:, np.newaxis] + inverse_heights[np.newaxis, :]) / 2
+    distances = pixel_distances * scales
+    np.fill_diagonal(distances, 0)
+    return distances
+
+
+def center_points_distances(centroids):
+    """
+    Estimate the distances between the center points of the boxes (CenterPointsDistance).
+
+    Args:
+        centroids: A numpy array of shape [N, 4], (cx, cy, w, h) of each box in pixels
+
+    Returns:
+        distances: a NxN float32 ndarray of the estimated distances in centimeters
+    """
+    centroids = np.asarray(centroids, dtype=np.float64).reshape(-1, 4)
+    return points_distances(centroids[:, 0:2], centroids[:, 3]).astype(np.float32)
+
+
+def four_corner_points_distances(boxes, heights):
+    """
+    Estimate the distances between the boxes as the minimum distance of their 4 corresponding corners
+    (FourCornerPointsDistance).
+
+    Args:
+        boxes: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+        heights: A numpy array of shape [N], the height of each box in pixels
+
+    Returns:
+        distances: a NxN float32 ndarray of the estimated distances in centimeters
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    distances = None
+    # (x, y) columns of the lower left, lower right, upper left and upper right corners
+    for x_column, y_column in ((0, 1), (2, 1), (0, 3), (2, 3)):
+        corner_distances = points_distances(boxes[:, [x_column, y_column]], heights)
+        distances = corner_distances if distances is None else np.minimum(distances, corner_distances)
+    return distances.astype(np.float32)
+
+
+def ground_distances(points):
+    """
+    Calculate the distances between the floor positions of a calibrated camera (see libs/ground_plane.py).
+
+    Args:
+        points: A numpy array of shape [N, 2], (x, y) floor positions in centimeters, NaN if unknown
+
+    Returns:
+        distances: a NxN float32 ndarray of the distances in centimeters, inf for the unknown positions
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    displacements = points[:, np.newaxis, :] - points[np.newaxis, :, :]
+    distances = np.sqrt(np.sum(displacements ** 2, axis=2))
+    distances[~np.isfinite(distances)] = np.inf
+    np.fill_diagonal(distances, 0)
+    return distances.astype(np.float32)
+
+
+def boxes_distances(boxes_a, boxes_b, dist_method='CenterPointsDistance'):
+    """
+    Estimate the distances between each box of boxes_a and each box of boxes_b, a rectangular block of the
+    matrix of center_points_distances or four_corner_points_distances.
+
+    Args:
+        boxes_a: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+        boxes_b: A numpy array of shape [M, 4]
+        dist_method: CenterPointsDistance or FourCornerPointsDistance
+
+    Returns:
+        distances: a NxM float32 ndarray of the estimated distances in centimeters
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    inverse_heights_a = 1.0 / (boxes_a[:, 3] - boxes_a[:, 1])
+    inverse_heights_b = 1.0 / (boxes_b[:, 3] - boxes_b[:, 1])
+    scales = PERSON_HEIGHT * (inverse_heights_a[:, np.newaxis] + inverse_heights_b[np.newaxis, :]) / 2
+    if dist_method == 'FourCornerPointsDistance':
+        corners = ((0, 1), (2, 1), (0, 3), (2, 3))
+    elif dist_method == 'CenterPointsDistance':
+        boxes_a = np.stack([(boxes_a[:, 0] + boxes_a[:, 2]) / 2, (boxes_a[:, 1] + boxes_a[:, 3]) / 2], axis=1)
+        boxes_b = np.stack([(boxes_b[:, 0] + boxes_b[:, 2]) / 2, (boxes_b[:, 1] + boxes_b[:, 3]) / 2], axis=1)
+        corners = ((0, 1),)
+    else:
+        raise ValueError('Not supported distance method named: ', dist_method)
+    distances = None
+    for x_column, y_column in corners:
+        displacements = boxes_a[:, np.newaxis, [x_column, y_column]] - boxes_b[np.newaxis, :, [x_column, y_column]]
+        corner_distances = np.sqrt(np.sum(displacements ** 2, axis=2)) * scales
+        distances = corner_distances if distances is None else np.minimum(distances, corner_distances)
+    return distances.astype(np.float32)
+
+
+def ground_points_distances(points_a, points_b):
+    """
+    Calculate the distances between each floor position of points_a ([N, 2], centimeters, NaN if unknown) and
+    each one of points_b ([M, 2]), a rectangular block of the matrix of ground_distances.
+
+    Returns:
+        distances: a NxM float32 ndarray of the distances in centimeters, inf for the unknown positions
+    """
+    points_a = np.asarray(points_a, dtype=np.float64).reshape(-1, 2)
+    points_b = np.asarray(points_b, dtype=np.float64).reshape(-1, 2)
+    displacements = points_a[:, np.newaxis, :] - points_b[np.newaxis, :, :]
+    distances = np.sqrt(np.sum(displacements ** 2, axis=2))
+    distances[~np.isfinite(distances)] = np.inf
+    return distances.astype(np.float32)
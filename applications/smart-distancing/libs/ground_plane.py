@@ -0,0 +1,103 @@
+"""
+Ground-plane calibration of a camera.
+
+The calibration is a homography between the image and the floor, estimated from four or more pairs of points: a
+point of the floor in the image (pixels of the frame resized to [App] Resolution) and its position on the floor
+(metres). At startup the homography is evaluated for every pixel of the frame into a dense lookup table, so the
+floor position of the feet of all of the people of a frame is a single array gather, without the 170 cm height
+assumption of libs/distances.py. The pixels above the horizon of the floor have no floor position (NaN).
+"""
+import cv2 as cv
+import numpy as np
+
+
+def parse_points(text):
+    """
+    Parse a list of points written as "x1,y1;x2,y2;..." into a float array of shape [N, 2].
+    """
+    points = [[float(value) for value in point.split(",")] for point in text.split(";") if point.strip()]
+    points = np.array(points, dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("points must be written as x1,y1;x2,y2;... : " + text)
+    return points
+
+
+class GroundPlane:
+    """
+    :param image_points: A float array of shape [N, 2] (N >= 4), pixel coordinates of points of the floor in the
+        frame resized to resolution.
+    :param ground_points: A float array of shape [N, 2], the positions of the same points on the floor in metres.
+    :param resolution: (width, height) of the frames, the size of the lookup table.
+    """
+
+    def __init__(self, image_points, ground_points, resolution):
+        image_points = np.asarray(image_points, dtype=np.float64).reshape(-1, 2)
+        ground_points = np.asarray(ground_points, dtype=np.float64).reshape(-1, 2)
+        if len(image_points) < 4 or len(image_points) != len(ground_points):
+            raise ValueError("the ground-plane calibration needs 4 or more pairs of image and ground points")
+        # Least squares fit with all of the points
+        self.homography, _ = cv.findHomography(image_points, ground_points, 0)
+        if self.homography is None or np.linalg.matrix_rank(self.homography) < 3:
+            raise ValueError("the ground-plane calibration points are degenerate (e.g. 3 of them are collinear)")
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.ground_points = ground_points
+        # (xmin, ymin, xmax, ymax) of the calibrated area of the floor, in metres
+        self.bounds = np.concatenate([ground_points.min(axis=0), ground_points.max(axis=0)])
+        # The sign of the homogeneous coordinate of the floor points, the other side is above the horizon
+        self._side = np.sign(np.median(self._project(image_points[:, 0], image_points[:, 1])[2]))
+        self.lookup_table = self._lookup_table()
+
+    def _project(self, x, y):
+        # Homogeneous floor coordinates of the pixels (x, y)
+        h = self.homography
+        return h[0, 0] * x + h[0, 1] * y + h[0, 2], h[1, 0] * x + h[1, 1] * y + h[1, 2], \
+            h[2, 0] * x + h[2, 1] * y + h[2, 2]
+
+    def _lookup_table(self):
+        # float32 array of shape [height, width, 2], the floor position (metres) of each pixel
+        width, height = self.resolution
+        x, y = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+        ground_x, ground_y, w = self._project(x, y)
+        visible = w * self._side > 1e-12
+        w = np.where(visible, w, 1.0)
+        lookup_table = np.stack([ground_x / w, ground_y / w], axis=2).astype(np.float32)
+        lookup_table[~visible] = np.nan
+        return lookup_table
+
+    def pixels_to_ground(self, points):
+        """
+        Args:
+            points: A numpy array of shape [N, 2], (x, y) pixel coordinates, clipped to the frame
+
+        Returns:
+            A float32 array of shape [N, 2] of the floor positions in metres (NaN above the horizon)
+        """
+        points = np.asarray(points).reshape(-1, 2)
+        width, height = self.resolution
+        columns = np.clip(np.rint(points[:, 0]).astype(np.int64), 0, width - 1)
+        rows = np.clip(np.rint(points[:, 1]).astype(np.int64), 0, height - 1)
+        return self.lookup_table[rows, columns]
+
+    def ground_positions(self, boxes):
+        """
+        Args:
+            boxes: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+
+        Returns:
+            A float32 array of shape [N, 2], the floor position (metres) of the feet of each box, the middle of
+            its bottom edge
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        return self.pixels_to_ground(np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1))
+
+
+def ground_plane_from_config(options, resolution):
+    """
+    Returns the GroundPlane of a camera whose config section (options, a dictionary) has
+    CalibrationImagePoints and CalibrationGroundPoints, or None if the camera is not calibrated.
+    """
+    image_points = options.get("CalibrationImagePoints", "").strip()
+    ground_points = options.get("CalibrationGroundPoints", "").strip()
+    if not image_points or not ground_points:
+        return None
+    return GroundPlane(parse_points(image_points), parse_points(ground_points), resolution)
@@ -0,0 +1,197 @@
+"""
+Distance engine which keeps the violating pairs of the tracked people across frames.
+
+In a fixed camera most people barely move from a frame to the next, so instead of rebuilding the NxN matrix every
+frame, the violating pairs are kept as a set of pairs of slots, one slot per stable track id of the tracker. Each
+frame the pairs of the tracks that disappeared, appeared or moved more than `tolerance` centimeters since their
+row was computed are dropped, and only the rows of the tracks that appeared or moved are recomputed against all of
+the tracks of the frame to add their new violating pairs; the slots of the tracks that disappeared are reused. An
+update costs O(changed x N) distances and O(violating pairs) bookkeeping: no capacity-sized matrix is stored, so
+the frames in which few people move are much cheaper than the full matrix, and a frame in which everybody moved
+costs about as much as the full matrix.
+
+The motion of a box is converted to centimeters with the same model as the distances (a displacement of d pixels of
+a box of height h is d * 170 / h cm, or the motion of its feet on the floor of a calibrated camera), so the
+tolerance also absorbs the jitter of the detected boxes of people standing still. With tolerance = 0 the result is
+the same as thresholding the full matrix; a larger tolerance trades a bounded error (the distance of a pair can be
+off by up to twice the tolerance) for fewer recomputed rows.
+"""
+import numpy as np
+
+from libs.distances import PERSON_HEIGHT, boxes_distances, ground_points_distances
+from libs.spatial_hash import SparseDistances
+
+
+class IncrementalDistances:
+    """
+    :param dist_threshold: The distance threshold in centimeters.
+    :param dist_method: CenterPointsDistance or FourCornerPointsDistance, ignored if ground_plane is given.
+    :param tolerance: Largest motion (centimeters) of a track whose row is not recomputed.
+    :param ground_plane: A GroundPlane of a calibrated camera (see libs/ground_plane.py), or None.
+    :param capacity: Initial number of slots, the slot arrays grow when more tracks are alive.
+    """
+
+    def __init__(self, dist_threshold, dist_method='CenterPointsDistance', tolerance=10.0, ground_plane=None,
+                 capacity=64):
+        self.dist_threshold = float(dist_threshold)
+        self.dist_method = dist_method
+        self.tolerance = float(tolerance)
+        self.ground_plane = ground_plane
+        self.slot_ids = np.full(0, -1, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        # The pixel boxes with which the row of each slot was computed
+        self.boxes = np.zeros((0, 4))
+        # The violating pairs of slots (first < second) and their distances
+        self.pair_slots = np.empty((0, 2), dtype=np.int64)
+        self.pair_distances = np.empty(0, dtype=np.float32)
+        self._grow(capacity)
+        # Work counters, see report()
+        self.frames = 0
+        self.rows = 0
+        self.recomputed_rows = 0
+        self.full_pairs = 0
+        self.computed_pairs = 0
+
+    def _grow(self, capacity):
+        # Resize the slot arrays to hold at least capacity slots (doubling, so growing is amortized)
+        old_capacity = len(self.active)
+        if capacity <= old_capacity:
+            return
+        grown = max(capacity, 2 * old_capacity) - old_capacity
+        self.slot_ids = np.concatenate([self.slot_ids, np.full(grown, -1, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(grown, dtype=bool)])
+        self.boxes = np.concatenate([self.boxes, np.zeros((grown, 4))])
+
+    def _block(self, boxes_a, boxes_b):
+        # [A, B] float32 distances (cm) between two sets of pixel boxes
+        if self.ground_plane is not None:
+            return ground_points_distances(
+                self.ground_plane.ground_positions(boxes_a) * 100, self.ground_plane.ground_positions(boxes_b) * 100
+            )
+        return boxes_distances(boxes_a, boxes_b, self.dist_method)
+
+    def _motions(self, old_boxes, boxes):
+        # Estimated motion (cm) of each box since its row was computed, inf if unknown
+        if self.ground_plane is not None:
+            displacements = self.ground_plane.ground_positions(boxes) - self.ground_plane.ground_positions(old_boxes)
+            motions = np.hypot(displacements[:, 0], displacements[:, 1]) * 100
+        else:
+            motions = np.abs(boxes - old_boxes).max(axis=1) * PERSON_HEIGHT / (boxes[:, 3] - boxes[:, 1])
+        return np.where(np.isfinite(motions), motions, np.inf)
+
+    def _match(self, track_ids):
+        # Slot of each track id, -1 for the new tracks; untracked objects (negative or duplicated ids) are new
+        slots = np.full(len(track_ids), -1, dtype=np.int64)
+        active_slots = np.flatnonzero(self.active & (self.slot_ids >= 0))
+        if len(active_slots) == 0 or len(track_ids) == 0:
+            return slots
+        active_ids = self.slot_ids[active_slots]
+        order = np.argsort(active_ids)
+        sorted_ids = active_ids[order]
+        positions = np.minimum(np.searchsorted(sorted_ids, track_ids), len(sorted_ids) - 1)
+        matched = (sorted_ids[positions] == track_ids) & (track_ids >= 0)
+        _, first = np.unique(track_ids, return_index=True)
+        duplicated = np.ones(len(track_ids), dtype=bool)
+        duplicated[first] = False
+        matched &= ~duplicated
+        slots[matched] = active_slots[order[positions[matched]]]
+        return slots
+
+    def update(self, track_ids, boxes):
+        """
+        Update the distances with the objects of a new frame.
+
+        Args:
+            track_ids: A numpy array of shape [N], the stable track id of each object (negative if not tracked)
+            boxes: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+
+        Returns:
+            A SparseDistances instance which contains the violating pairs, indexed like the objects of the frame
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64).reshape(-1)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        num_objects = len(track_ids)
+        slots = self._match(track_ids)
+        matched = slots >= 0
+        # The slots whose pairs are dropped: the tracks that disappeared and the rows that are recomputed
+        stale = self.active.copy()
+        stale[slots[matched]] = False
+        self.active &= ~stale
+        self.slot_ids[stale] = -1
+
+        moved = matched.copy()
+        moved[matched] = self._motions(self.boxes[slots[matched]], boxes[matched]) > self.tolerance
+        new = ~matched
+        num_new = int(new.sum())
+        if num_new > 0:
+            free = np.flatnonzero(~self.active)
+            if len(free) < num_new:
+                self._grow(len(self.active) + num_new - len(free))
+                stale = np.concatenate([stale, np.zeros(len(self.active) - len(stale), dtype=bool)])
+                free = np.flatnonzero(~self.active)
+            slots[new] = free[:num_new]
+            self.active[slots[new]] = True
+            self.slot_ids[slots[new]] = np.where(track_ids[new] >= 0, track_ids[new], -1)
+
+        changed = np.flatnonzero(new | moved)
+        stale[slots[changed]] = True
+        kept = ~(stale[self.pair_slots[:, 0]] | stale[self.pair_slots[:, 1]])
+        self.pair_slots = self.pair_slots[kept]
+        self.pair_distances = self.pair_distances[kept]
+        if len(changed) > 0:
+            self._recompute(changed, slots, boxes)
+
+        num_changed = len(changed)
+        self.frames += 1
+        self.rows += num_objects
+        self.recomputed_rows += num_changed
+        self.full_pairs += num_objects * (num_objects - 1) // 2
+        self.computed_pairs += num_changed * (num_objects - num_changed) + num_changed * (num_changed - 1) // 2
+        return self._violating_pairs(slots)
+
+    def _recompute(self, changed, slots, boxes):
+        # Add the violating pairs of the rows of the changed objects against all of the objects of the frame
+        self.boxes[slots[changed]] = boxes[changed]
+        block = self._block(boxes[changed], boxes)
+        rows, columns = np.nonzero(block < self.dist_threshold)
+        distances = block[rows, columns]
+        first = changed[rows]
+        # A pair of two changed objects is in both of their rows, it is only added from the row of the first one
+        is_changed = np.zeros(len(slots), dtype=bool)
+        is_changed[changed] = True
+        added = (first != columns) & ~(is_changed[columns] & (columns < first))
+        first_slots = slots[first[added]]
+        second_slots = slots[columns[added]]
+        pair_slots = np.stack([np.minimum(first_slots, second_slots), np.maximum(first_slots, second_slots)], axis=1)
+        self.pair_slots = np.concatenate([self.pair_slots, pair_slots])
+        self.pair_distances = np.concatenate([self.pair_distances, distances[added].astype(np.float32)])
+
+    def _violating_pairs(self, slots):
+        # The violating (i, j), i < j, pairs of the frame, in the order of np.argwhere on the upper triangle
+        objects = np.empty(len(self.active), dtype=np.int64)
+        objects[slots] = np.arange(len(slots))
+        first = objects[self.pair_slots[:, 0]]
+        second = objects[self.pair_slots[:, 1]]
+        pairs = np.stack([np.minimum(first, second), np.maximum(first, second)], axis=1)
+        order = np.argsort(pairs[:, 0] * len(slots) + pairs[:, 1], kind="stable")
+        return SparseDistances(len(slots), pairs[order], self.pair_distances[order])
+
+    def report(self):
+        """
+        Returns a dictionary of the work done since the start:
+            "frames": number of updates
+            "rows": number of objects of all of the frames
+            "recomputed_rows": number of rows which were recomputed
+            "full_pairs": number of pairs a full recomputation of every frame would calculate
+            "computed_pairs": number of pairs which were calculated
+            "skipped_fraction": fraction of full_pairs which was not calculated
+        """
+        skipped = 1 - self.computed_pairs / self.full_pairs if self.full_pairs > 0 else 0.0
+        return {
+            "frames": self.frames,
+            "rows": self.rows,
+            "recomputed_rows": self.recomputed_rows,
+            "full_pairs": self.full_pairs,
+            "computed_pairs": self.computed_pairs,
+            "skipped_fraction": skipped,
+        }
@@ -0,0 +1,187 @@
+"""
+Regions of the frames which are passed to the detector.
+
+By default the whole frame is squashed to [Detector] ImageSize. A camera can restrict the detector to a polygon
+region of interest (ROIPoints, e.g. the floor without the sky and the walls): the detector then runs on the
+bounding rectangle of the polygon, cropped from the captured frame at its full resolution, and the boxes whose
+feet are outside of the polygon are dropped. The rectangle (or the whole frame) can also be split into a grid of
+overlapping tiles (InferenceTiles, TileOverlap) which are resized to ImageSize one by one, so a person covers
+more pixels of the detector input: the distant pedestrians of a 1080p or 4K camera, which vanish when the frame
+is squashed to 300x300, stay detectable at the cost of one inference per tile.
+
+The boxes of the regions are mapped back to the frame and merged with a cross-tile NMS. A person who crosses the
+border of two tiles is detected in both of them, partly in one, so the IoU of the two boxes can be small; two
+boxes of different tiles are duplicates if their intersection covers more than TileMergeThreshold of the
+smaller box, and the most confident one is kept. A person taller than a tile is only seen in pieces by the tiles,
+which do not cover each other, so by default (TileFullRegion) the detector also runs once on the whole region:
+the close people are detected in one piece there, and their pieces are covered by that box and suppressed.
+"""
+import cv2 as cv
+import numpy as np
+
+from libs.detections import DetectionBatch
+from libs.ground_plane import parse_points
+from libs.nms import intersections_and_area_sums
+
+
+def cross_region_suppression(boxes, scores, region_ids, threshold):
+    """
+    Greedy suppression of the boxes which are detected in several regions: a box is removed if a more confident
+    box of another region covers more than threshold of the smaller box of the two.
+
+    Args:
+        boxes: a float array of shape [N, 4], the normalized (xmin, ymin, xmax, ymax) of the boxes in the frame
+        scores: a float array of shape [N]
+        region_ids: an int array of shape [N], the region each box was detected in
+        threshold: minimum fraction of the smaller box covered by the intersection of two duplicated boxes
+
+    Returns:
+        The sorted indices of the kept boxes
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    boxes, region_ids = boxes[order], np.asarray(region_ids)[order]
+    intersections, _ = intersections_and_area_sums(boxes, boxes)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    covered = intersections > threshold * np.minimum(areas[:, None], areas[None, :])
+    suppress = np.triu(covered & (region_ids[:, None] != region_ids[None, :]), 1)
+    removed = np.zeros(len(boxes), dtype=bool)
+    for i in np.flatnonzero(suppress.any(axis=1)):
+        if not removed[i]:
+            removed |= suppress[i]
+    return np.sort(order[~removed])
+
+
+class InferenceRegions:
+    """
+    :param resolution: (width, height) of the frames the ROI points are given in ([App] Resolution).
+    :param roi_points: A float array of shape [N, 2] (N >= 3), the polygon of the region of interest in pixels
+        at resolution, or None for the whole frame.
+    :param tiles: (columns, rows) of the grid of tiles which cover the bounding rectangle of the polygon.
+    :param overlap: Overlap of two neighbouring tiles, as a fraction of the size of a tile.
+    :param merge_threshold: See cross_region_suppression.
+    :param full_region: If True and there are several tiles, the whole bounding rectangle is an extra region.
+    """
+
+    def __init__(self, resolution, roi_points=None, tiles=(1, 1), overlap=0.2, merge_threshold=0.6,
+                 full_region=True):
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        self.tiles = (max(int(tiles[0]), 1), max(int(tiles[1]), 1))
+        self.overlap = float(overlap)
+        if not 0 <= self.overlap < 1:
+            raise ValueError("the tile overlap must be in [0, 1): " + str(overlap))
+        self.merge_threshold = float(merge_threshold)
+        width, height = self.resolution
+        self.mask = None
+        bounds = np.array([0, 0, 1, 1], dtype=np.float64)
+        if roi_points is not None:
+            roi_points = np.asarray(roi_points, dtype=np.float64).reshape(-1, 2)
+            if len(roi_points) < 3:
+                raise ValueError("the region of interest needs 3 or more points")
+            # Whether each pixel (at resolution) is inside of the polygon
+            mask = np.zeros((height, width), dtype=np.uint8)
+            cv.fillPoly(mask, [np.rint(roi_points).astype(np.int32)], 1)
+            self.mask = mask.astype(bool)
+            scale = np.array([width, height, width, height], dtype=np.float64)
+            bounds = np.concatenate([roi_points.min(axis=0), roi_points.max(axis=0) + 1]) / scale
+            bounds = np.clip(bounds, 0, 1)
+            if bounds[2] <= bounds[0] or bounds[3] <= bounds[1]:
+                raise ValueError("the region of interest is outside of the frame")
+        # (xmin, ymin, xmax, ymax) of each region, normalized, shape [columns * rows (+ 1), 4]
+        self.rects = self._tiles(bounds)
+        if full_region and len(self.rects) > 1:
+            self.rects = np.concatenate([self.rects, bounds[None]])
+
+    def _tiles(self, bounds):
+        # The grid of tiles of the same size which cover bounds, neighbours overlap by a fraction of a tile
+        x_min, y_min, x_max, y_max = bounds
+        columns, rows = self.tiles
+        tile_width = (x_max - x_min) / (columns - (columns - 1) * self.overlap)
+        tile_height = (y_max - y_min) / (rows - (rows - 1) * self.overlap)
+        rects = []
+        for row in range(rows):
+            y = y_min + row * tile_height * (1 - self.overlap)
+            for column in range(columns):
+                x = x_min + column * tile_width * (1 - self.overlap)
+                rects.append([x, y, min(x + tile_width, x_max), min(y + tile_height, y_max)])
+        return np.array(rects, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def crops(self, cv_image):
+        """
+        Returns a list of views of cv_image (no copy), one for each region. The crops are taken from the frame
+        at its captured resolution, so the tiles keep the details that the display resolution loses.
+        """
+        height, width = cv_image.shape[:2]
+        pixels = np.rint(self.rects * np.array([width, height, width, height])).astype(np.int64)
+        return [cv_image[y_min:max(y_max, y_min + 1), x_min:max(x_max, x_min + 1)]
+                for x_min, y_min, x_max, y_max in pixels]
+
+    def merge(self, region_outputs):
+        """
+        Map the detections of the regions to the frame and merge them.
+
+        Args:
+            region_outputs: A list of the detector outputs of the regions (DetectionBatch instances), in the
+                order of rects, with boxes normalized to their region
+
+        Returns:
+            A DetectionBatch of the detections of the frame, the boxes are normalized to the frame
+        """
+        batches, region_ids = [], []
+        for region_id, (rect, output) in enumerate(zip(self.rects, region_outputs)):
+            batch = output if isinstance(output, DetectionBatch) else DetectionBatch.from_detector_output(output)
+            batch = batch.copy()
+            size = np.array([rect[2] - rect[0], rect[3] - rect[1]] * 2)
+            batch.data["bbox"] = batch.boxes * size + rect[[0, 1, 0, 1]]
+            batches.append(batch)
+            region_ids.append(np.full(len(batch), region_id))
+        merged = DetectionBatch.concatenate(batches)
+        region_ids = np.concatenate(region_ids) if len(region_ids) > 0 else np.empty(0, dtype=np.int64)
+        if self.mask is not None:
+            inside = self.inside(merged.boxes)
+            merged, region_ids = merged[inside], region_ids[inside]
+        if len(self.rects) > 1:
+            merged = merged[cross_region_suppression(merged.boxes, merged.scores, region_ids, self.merge_threshold)]
+        return merged
+
+    def inside(self, boxes):
+        """
+        Returns a boolean array of shape [N], whether the feet (the middle of the bottom edge) of each of the
+        normalized boxes ([N, 4]) are inside of the region of interest.
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        if self.mask is None:
+            return np.ones(len(boxes), dtype=bool)
+        width, height = self.resolution
+        columns = np.clip(np.rint((boxes[:, 0] + boxes[:, 2]) / 2 * width).astype(np.int64), 0, width - 1)
+        rows = np.clip(np.rint(boxes[:, 3] * height).astype(np.int64), 0, height - 1)
+        return self.mask[rows, columns]
+
+
+def inference_regions_from_config(options, defaults, resolution):
+    """
+    Returns the InferenceRegions of a camera, or None if the detector runs on the whole frame.
+
+    Args:
+        options: The config section of the camera (a dictionary), with the optional ROIPoints, InferenceTiles,
+            TileOverlap, TileMergeThreshold and TileFullRegion keys
+        defaults: The section of the keys which are not set in options ([App])
+        resolution: (width, height) of the frames the ROI points are given in
+    """
+    def get(key, default):
+        return options.get(key, defaults.get(key, default)).strip() or default
+
+    roi_points = get("ROIPoints", "")
+    tiles = tuple(int(i) for i in get("InferenceTiles", "1,1").split(","))
+    if not roi_points and tiles == (1, 1):
+        return None
+    return InferenceRegions(
+        resolution, parse_points(roi_points) if roi_points else None, tiles,
+        overlap=float(get("TileOverlap", "0.2")), merge_threshold=float(get("TileMergeThreshold", "0.6")),
+        full_region=get("TileFullRegion", "True").lower() == "true",
+    )
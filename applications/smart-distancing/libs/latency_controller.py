@@ -0,0 +1,203 @@
+import time
+
+import numpy as np
+
+
+class LatencyController:
+    """
+    Hold the end-to-end latency of a camera under a target by trading the display resolution, the detection
+    stride and the JPEG quality of the ui frames.
+
+    The latency (capture to render) and the queue depths of the pipeline are collected over windows of
+    LatencyControlInterval seconds. At the end of a window the pipeline is overloaded if the mean latency is
+    more than LatencyHysteresis above TargetLatency or if frames were dropped; one knob is then degraded by one
+    step, in the order of KNOBS: the detection stride (the tracker extrapolates the skipped frames), the display
+    resolution (the resize, the drawing and the encoding scale with the pixels) and the JPEG quality (the ui
+    encodes the frames under the lock of the render stage). If the mean latency is more than LatencyHysteresis
+    below the target, no frame was dropped and the queues were empty, the last degraded knob is restored by one
+    step. A single step per window lets the effect of an adjustment be measured before the next one, and the
+    hysteresis keeps the controller from oscillating around the target. A restored knob that overloads the
+    pipeline again in the next window is degraded back, and the number of calm windows needed before the next
+    restore is doubled (up to MAX_RESTORE_WINDOWS), so the controller does not bounce between two settings when
+    the load sits between them; it is halved again after each restore which holds. Every adjustment is printed.
+
+    The knobs stay within their configured bounds: the stride between [Detector] MinDetectionStride and
+    MaxDetectionStride, the resolution between [App] MinResolution and Resolution, and the JPEG quality between
+    [App] MinJpegQuality and JpegQuality. TargetLatency: 0 disables the controller.
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    :param name: Name of the camera in the log messages.
+    """
+
+    # The knobs in the order they are degraded, they are restored in the reverse order
+    KNOBS = ("detection_stride", "resolution", "jpeg_quality")
+    # The display resolution is scaled by this factor at each step
+    RESOLUTION_STEP = 0.8
+    JPEG_QUALITY_STEP = 10
+    MAX_RESTORE_WINDOWS = 32
+
+    def __init__(self, config, name=None):
+        app_config = config.get_section_dict('App')
+        detector_config = config.get_section_dict('Detector')
+        self.name = name
+        self.target_latency = float(app_config.get('TargetLatency', 0)) / 1000  # Seconds
+        self.hysteresis = float(app_config.get('LatencyHysteresis', 0.2))
+        self.interval = float(app_config.get('LatencyControlInterval', 2))  # Seconds
+        resolution = tuple(int(i) for i in app_config['Resolution'].split(','))
+        min_resolution = app_config.get('MinResolution', '').strip() or app_config['Resolution']
+        min_resolution = tuple(min(int(i), j) for i, j in zip(min_resolution.split(','), resolution))
+        max_jpeg_quality = int(app_config.get('JpegQuality', 95))
+        min_jpeg_quality = min(int(app_config.get('MinJpegQuality', max_jpeg_quality)), max_jpeg_quality)
+        min_stride = max(int(detector_config.get('MinDetectionStride', 1)), 1)
+        max_stride = max(int(detector_config.get('MaxDetectionStride', 1)), min_stride)
+        # The settings of each knob, from the best to the cheapest one
+        self.steps = {
+            "detection_stride": list(range(min_stride, max_stride + 1)),
+            "resolution": self._resolution_steps(resolution, min_resolution),
+            "jpeg_quality": list(range(max_jpeg_quality, min_jpeg_quality, -self.JPEG_QUALITY_STEP)) + [
+                min_jpeg_quality],
+        }
+        # Index of the current setting of each knob in steps
+        self.levels = {knob: 0 for knob in self.KNOBS}
+        self.adjustments = 0
+        self.latency = None  # Mean latency of the last window (seconds)
+        self._saturated = False
+        # Number of consecutive windows below the target, and the number needed to restore a knob
+        self._calm_windows = 0
+        self._restore_windows = 1
+        # Whether the last window restored a knob
+        self._restored = False
+        self._window_start = None
+        self._latency_sum = 0.0
+        self._queue_depth_sum = 0
+        self._frames = 0
+        self._dropped_frames = None
+
+    @property
+    def enabled(self):
+        return self.target_latency > 0
+
+    def _resolution_steps(self, resolution, min_resolution):
+        # The resolutions from resolution down to min_resolution, scaled by RESOLUTION_STEP (even sizes)
+        steps = [resolution]
+        scale = 1.0
+        while steps[-1] != min_resolution:
+            scale *= self.RESOLUTION_STEP
+            step = tuple(max(int(np.round(size * scale / 2)) * 2, min_size)
+                         for size, min_size in zip(resolution, min_resolution))
+            if step != steps[-1]:
+                steps.append(step)
+        return steps
+
+    @property
+    def detection_stride(self):
+        # Lower bound of the detection stride, see DetectionStrideController.stride_floor
+        return self.steps["detection_stride"][self.levels["detection_stride"]]
+
+    @property
+    def resolution(self):
+        # (width, height) of the display frames
+        return self.steps["resolution"][self.levels["resolution"]]
+
+    @property
+    def jpeg_quality(self):
+        return self.steps["jpeg_quality"][self.levels["jpeg_quality"]]
+
+    def update(self, latency, queue_depth, dropped_frames, now=None):
+        """
+        Register a processed frame and, at the end of a window, adjust one knob if the latency is off target.
+
+        Args:
+            latency: end-to-end latency of the frame (seconds)
+            queue_depth: number of frames waiting in the queues of the pipeline
+            dropped_frames: number of frames dropped by the pipeline since the start of the video
+            now: time.perf_counter() value, defaults to the current time
+
+        Returns:
+            The name of the adjusted knob (see KNOBS), or None
+        """
+        now = time.perf_counter() if now is None else now
+        if self._window_start is None:
+            self._start_window(now, dropped_frames)
+        self._latency_sum += latency
+        self._queue_depth_sum += queue_depth
+        self._frames += 1
+        if now - self._window_start < self.interval:
+            return None
+        self.latency = self._latency_sum / self._frames
+        queue_depth = self._queue_depth_sum / self._frames
+        dropped = dropped_frames - self._dropped_frames
+        self._start_window(now, dropped_frames)
+        reason = "latency %.0f ms, target %.0f ms, queue depth %.1f, %d dropped frames" % (
+            self.latency * 1000, self.target_latency * 1000, queue_depth, dropped
+        )
+        restored, self._restored = self._restored, False
+        if self.latency > self.target_latency * (1 + self.hysteresis) or dropped > 0:
+            self._calm_windows = 0
+            if restored:
+                # The last restore overloaded the pipeline, wait longer before the next one
+                self._restore_windows = min(self._restore_windows * 2, self.MAX_RESTORE_WINDOWS)
+            return self._adjust(self.KNOBS, 1, reason)
+        if restored:
+            self._restore_windows = max(self._restore_windows // 2, 1)
+        if self.latency < self.target_latency * (1 - self.hysteresis) and queue_depth < 1:
+            self._calm_windows += 1
+            if self._calm_windows >= self._restore_windows:
+                self._calm_windows = 0
+                knob = self._adjust(self.KNOBS[::-1], -1, reason)
+                self._restored = knob is not None
+                return knob
+        else:
+            self._calm_windows = 0
+        return None
+
+    def _start_window(self, now, dropped_frames):
+        self._window_start = now
+        self._latency_sum = 0.0
+        self._queue_depth_sum = 0
+        self._frames = 0
+        self._dropped_frames = dropped_frames
+
+    def _adjust(self, knobs, direction, reason):
+        # Move the first knob of knobs which is not at its bound by one step (direction 1: cheaper, -1: better)
+        for knob in knobs:
+            level = self.levels[knob] + direction
+            if 0 <= level < len(self.steps[knob]):
+                old_value = self._format(knob)
+                self.levels[knob] = level
+                self.adjustments += 1
+                self._saturated = False
+                print('latency controller%s: %s, %s %s -> %s' % (
+                    ' (' + self.name + ')' if self.name else '', reason, knob.replace('_', ' '), old_value,
+                    self._format(knob)))
+                return knob
+        if direction > 0 and not self._saturated:
+            # Only printed once, until a knob is restored
+            self._saturated = True
+            print('latency controller%s: %s, all of the knobs are at their bounds' % (
+                ' (' + self.name + ')' if self.name else '', reason))
+        return None
+
+    def _format(self, knob):
+        value = self.steps[knob][self.levels[knob]]
+        if knob == "resolution":
+            return "%dx%d" % value
+        return str(value)
+
+    def report(self):
+        """
+        Returns a dictionary of the state of the controller:
+            "target_ms": the target latency
+            "latency_ms": the mean latency of the last window, None before the first window ended
+            "detection_stride", "width", "height", "jpeg_quality": the current settings
+            "adjustments": number of adjustments since the start
+        """
+        return {
+            "target_ms": self.target_latency * 1000,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "detection_stride": self.detection_stride,
+            "width": self.resolution[0],
+            "height": self.resolution[1],
+            "jpeg_quality": self.jpeg_quality,
+            "adjustments": self.adjustments,
+        }
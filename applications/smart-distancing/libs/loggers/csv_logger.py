@@ -2,6 +2,7 @@ import csv
 import os
 from datetime import date
 from tools.objects_post_process import extract_violating_objects
+from libs.detections import DetectionBatch
 
 import numpy as np
 
@@ -83,9 +84,11 @@ class Logger:
         Each row of the object log file consist of a detected object (person) information such as
         object (person) ids, bounding box coordinates and frame number.
 
-        Args: objects_list: A list of dictionary where each dictionary stores information of an object (person) in a
-        frame. frame_number: current frame number file_path: log file path
+        Args: objects_list: A DetectionBatch or a list of dictionary where each dictionary stores information of an
+        object (person) in a frame. frame_number: current frame number file_path: log file path
         """
+        if isinstance(objects_list, DetectionBatch):
+            objects_list = objects_list.to_dicts()
         if len(objects_list) != 0:
             object_dict = list(map(lambda x: prepare_object(x, frame_number), objects_list))
 
@@ -1,6 +1,6 @@
 import csv
 import os
-from datetime import date, datetime
+from datetime import datetime
 from tools.environment_score import mx_environment_scoring_consider_crowd
 from tools.objects_post_process import extract_violating_objects
 
@@ -15,42 +15,49 @@ class Logger:
 
     :param config: A ConfigEngine object which store all of the config parameters. Access to any parameter
         is possible by calling get_section_dict method.
+    :param log_directory: The parent directory of the log files, defaults to [Logger] LogDirectory.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, log_directory=None):
         self.config = config
         # The parent directory that stores all log file.
-        self.log_directory = config.get_section_dict("Logger")["LogDirectory"]
+        if log_directory is None:
+            log_directory = config.get_section_dict("Logger")["LogDirectory"]
+        self.log_directory = log_directory
         # A directory inside the log_directory that stores object log files.
         self.objects_log_directory = os.path.join(self.log_directory, "objects_log")
         self.dist_threshold = config.get_section_dict("PostProcessor")["DistThreshold"]
 
         if not os.path.exists(self.log_directory):
-            os.mkdir(self.log_directory)
+            os.makedirs(self.log_directory)
 
         if not os.path.exists(self.objects_log_directory):
             os.mkdir(self.objects_log_directory)
 
-    def update(self, objects_list, distances):
+    def update(self, objects_list, distances, timestamp=None):
         """Write the object and violated distances information of a frame into log files.
 
         Args:
-            objects_list: List of dictionary where each dictionary stores information of an object (person) in a frame.
+            objects_list: A DetectionBatch of the objects (people) of a frame.
             distances: A 2-d numpy array that stores distance between each pair of objects.
+            timestamp: The datetime of the frame, defaults to the current time.
         """
-        file_name = str(date.today())
+        if timestamp is None:
+            timestamp = datetime.now()
+        file_name = str(timestamp.date())
         objects_log_file_path = os.path.join(self.objects_log_directory, file_name + ".csv")
-        self.log_objects(objects_list, distances, objects_log_file_path)
+        self.log_objects(objects_list, distances, objects_log_file_path, timestamp)
 
-    def log_objects(self, objects_list, distances, file_path):
+    def log_objects(self, objects_list, distances, file_path, timestamp=None):
         """Write objects information of a frame into the object log file.
         Each row of the object log file consist of a detected object (person) information such as
         object (person) ids, bounding box coordinates and frame number.
 
         Args:
-            objects_list: A list of dictionary where each dictionary stores information of an object (person) in a frame.
+            objects_list: A DetectionBatch of the objects (people) of a frame.
             distances: A 2-d numpy array that stores distance between each pair of objects.
             file_path: The path for storing log files
+            timestamp: The datetime of the frame, defaults to the current time.
 
         """
 
@@ -62,8 +69,9 @@ class Logger:
         # Get environment score
         environment_score = mx_environment_scoring_consider_crowd(no_detected_objects, no_violating_objects)
         # Get timeline which is used for as Timestamp
-        now = datetime.now()
-        current_time = now.strftime("%Y-%m-%d %H:%M:%S")
+        if timestamp is None:
+            timestamp = datetime.now()
+        current_time = timestamp.strftime("%Y-%m-%d %H:%M:%S")
         file_exists = os.path.isfile(file_path)
         with open(file_path, "a") as csvfile:
             headers = ["Timestamp", "DetectedObjects", "ViolatingObjects", "EnvironmentScore"]
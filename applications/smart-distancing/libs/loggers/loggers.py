@@ -1,4 +1,6 @@
+import os
 import time
+from datetime import datetime
 
 
 class Logger:
@@ -9,17 +11,24 @@ class Logger:
 
         :param config: a ConfigEngine object which store all of the config parameters. Access  to any parameter
         is possible by calling get_section_dict method.
+        :param source_name: name of the video source (camera). If it is given the logs are stored in a
+        sub-directory of LogDirectory with the same name, so each camera of a multi-camera config has its own logs.
+        :param log_directory: the directory of the logs, overrides LogDirectory and source_name.
     """
 
-    def __init__(self, config):
+    def __init__(self, config, source_name=None, log_directory=None):
         """build the logger and initialize the frame number and set attributes"""
         self.config = config
+        if log_directory is None:
+            log_directory = self.config.get_section_dict("Logger")["LogDirectory"]
+            if source_name is not None:
+                log_directory = os.path.join(log_directory, source_name)
         # Logger name, at this time only csv_logger is supported. You can implement your own logger
         # by following csv_logger implementation as an example.
         self.name = self.config.get_section_dict("Logger")["Name"]
         if self.name == "csv_logger":
             from . import csv_processed_logger
-            self.logger = csv_processed_logger.Logger(self.config)
+            self.logger = csv_processed_logger.Logger(self.config, log_directory)
 
             # For Logger instance from loggers/csv_logger
             # region csv_logger
@@ -30,23 +39,28 @@ class Logger:
         # Specifies how often the logger should log information. For example with time_interval of 0.5
         # the logger log the information every 0.5 seconds.
         self.time_interval = float(self.config.get_section_dict("Logger")["TimeInterval"])  # Seconds
-        self.submited_time = 0
+        self.submited_time = None
         # self.frame_number = 0  # For Logger instance from loggers/csv_logger
 
-    def update(self, objects_list, distances):
+    def update(self, objects_list, distances, timestamp=None):
         """call the update method of the logger.
 
         based on frame_number, fps and time interval, it decides whether to call the
         logger's update method to store the data or not.
 
         Args:
-            objects_list: a list of dictionary where each dictionary stores information of an object (person) in a frame.
+            objects_list: a DetectionBatch of the objects (people) of a frame.
             distances: a 2-d numpy array that stores distance between each pair of objects.
+            timestamp: a datetime of the frame, e.g. computed from the frame position of a recorded video.
+            If it is None the current time is used.
         """
-
-        if time.time() - self.submited_time > self.time_interval:
-            self.logger.update(objects_list, distances)
-            self.submited_time = time.time()
+        if timestamp is None:
+            current_time = time.time()
+        else:
+            current_time = (timestamp - datetime(1970, 1, 1)).total_seconds()
+        if self.submited_time is None or current_time - self.submited_time > self.time_interval:
+            self.logger.update(objects_list, distances, timestamp)
+            self.submited_time = current_time
             # For Logger instance from loggers/csv_logger
             # region
             # self.logger.update(self.frame_number, objects_list, distances)
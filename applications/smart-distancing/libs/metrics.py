@@ -0,0 +1,208 @@
+"""
+Per-stage latency metrics of the video pipeline.
+
+Every stage of the processing of a frame (capture, resize/convert, inference, NMS, tracking, distance calculation,
+logging, drawing and JPEG encoding) records its duration in a fixed-bucket histogram. Recording a sample is a
+binary search and two additions, so the histograms can stay enabled on the devices. The histograms, queue depths
+and dropped-frame counters of all of the cameras are exported in the Prometheus text format by format_prometheus.
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+# Upper bounds (seconds) of the histogram buckets, from 0.5 ms to 2.5 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+STAGES = ("capture", "preprocess", "inference", "nms", "tracking", "distance", "logging", "drawing", "jpeg_encode")
+
+
+class LatencyHistogram:
+    """
+    A cumulative histogram of durations with fixed buckets, like a Prometheus histogram.
+
+    :param buckets: Sorted upper bounds of the buckets in seconds. A +Inf bucket is always added.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(float(b) for b in buckets)
+        # counts[i] is the number of samples in (buckets[i - 1], buckets[i]], the last one is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            cumulative_counts: a list of (upper bound, number of samples <= upper bound), the last
+            upper bound is float("inf")
+            sum: sum of the samples in seconds
+            count: number of samples
+        """
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative_counts = []
+        cumulative = 0
+        for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            cumulative_counts.append((upper_bound, cumulative))
+        return cumulative_counts, total, count
+
+
+class _StageTimer:
+    # Context manager that records the duration of a block into a histogram
+    __slots__ = ("histogram", "t_begin")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.t_begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.t_begin)
+
+
+class StageMetrics:
+    """
+    The latency histograms of the stages of a video source.
+
+    :param stages: Names of the stages, see STAGES.
+    :param buckets: Upper bounds of the histogram buckets in seconds.
+    """
+
+    def __init__(self, stages=STAGES, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = OrderedDict((stage, LatencyHistogram(buckets)) for stage in stages)
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, LatencyHistogram(self.buckets))
+        return histogram
+
+    def observe(self, stage, seconds):
+        self._histogram(stage).observe(seconds)
+
+    def time(self, stage):
+        """
+        Returns a context manager which records the duration of its block, e.g.
+            with metrics.time("inference"):
+                detector.inference(image)
+        """
+        return _StageTimer(self._histogram(stage))
+
+
+def _format_labels(labels):
+    escaped = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append('%s="%s"' % (key, value))
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_prometheus(sources, prefix="smart_distancing"):
+    """
+    Format the metrics of the video sources in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        sources: a list of dictionaries, one for each video source, with the keys
+            "camera": name of the source, used as the camera label
+            "metrics": a StageMetrics instance
+            "queue_depths": a dictionary of {stage name: number of frames waiting before the stage}
+            "dropped_frames": a dictionary of {stage name: number of frames dropped before the stage}
+            "frames": number of frames which were processed completely
+            "fps": (optional) frame rate of the detector
+            "distance_work": (optional) the work report of the Incremental distance engine
+            "gated_inferences": (optional) the report of the motion gate, see libs/motion_gate.py
+            "latency_control": (optional) the report of the latency controller, see libs/latency_controller.py
+        prefix: prefix of the metric names
+
+    Returns:
+        The metrics as a string
+    """
+    lines = []
+
+    def add_family(name, metric_type, description, samples):
+        lines.append("# HELP %s_%s %s" % (prefix, name, description))
+        lines.append("# TYPE %s_%s %s" % (prefix, name, metric_type))
+        for suffix, labels, value in samples:
+            lines.append("%s_%s%s%s %s" % (prefix, name, suffix, _format_labels(labels), _format_value(value)))
+
+    latency_samples = []
+    for source in sources:
+        for stage, histogram in source["metrics"].histograms.items():
+            labels = OrderedDict([("camera", source["camera"]), ("stage", stage)])
+            cumulative_counts, total, count = histogram.snapshot()
+            for upper_bound, cumulative in cumulative_counts:
+                bucket_labels = OrderedDict(labels)
+                bucket_labels["le"] = _format_value(upper_bound)
+                latency_samples.append(("_bucket", bucket_labels, cumulative))
+            latency_samples.append(("_sum", labels, total))
+            latency_samples.append(("_count", labels, count))
+    add_family("stage_latency_seconds", "histogram", "Processing time of the pipeline stages.", latency_samples)
+
+    add_family("queue_depth", "gauge", "Number of frames waiting in the queue before a pipeline stage.", [
+        ("", OrderedDict([("camera", source["camera"]), ("stage", stage)]), depth)
+        for source in sources for stage, depth in source["queue_depths"].items()
+    ])
+    add_family("dropped_frames_total", "counter", "Number of frames dropped before a pipeline stage.", [
+        ("", OrderedDict([("camera", source["camera"]), ("stage", stage)]), dropped)
+        for source in sources for stage, dropped in source["dropped_frames"].items()
+    ])
+    add_family("processed_frames_total", "counter", "Number of frames which were processed completely.", [
+        ("", OrderedDict([("camera", source["camera"])]), source["frames"]) for source in sources
+    ])
+    add_family("detector_fps", "gauge", "Frame rate of the detector's inference.", [
+        ("", OrderedDict([("camera", source["camera"])]), source["fps"])
+        for source in sources if source.get("fps") is not None
+    ])
+    distance_samples = []
+    for source in sources:
+        work = source.get("distance_work")
+        if work is not None:
+            computed, skipped = work["computed_pairs"], work["full_pairs"] - work["computed_pairs"]
+            distance_samples.append(("", OrderedDict([("camera", source["camera"]), ("work", "computed")]), computed))
+            distance_samples.append(("", OrderedDict([("camera", source["camera"]), ("work", "skipped")]), skipped))
+    add_family("distance_pairs_total", "counter",
+               "Number of pairs which the incremental distance engine computed or skipped.", distance_samples)
+    gate_samples = []
+    for source in sources:
+        gate = source.get("gated_inferences")
+        if gate is not None:
+            ran, skipped = gate["frames"] - gate["skipped"], gate["skipped"]
+            gate_samples.append(("", OrderedDict([("camera", source["camera"]), ("decision", "run")]), ran))
+            gate_samples.append(("", OrderedDict([("camera", source["camera"]), ("decision", "skipped")]), skipped))
+    add_family("gated_inferences_total", "counter",
+               "Number of inferences which the motion gate ran or skipped because the frame did not change.",
+               gate_samples)
+    setting_samples, adjustment_samples = [], []
+    for source in sources:
+        control = source.get("latency_control")
+        if control is not None:
+            for setting in ("detection_stride", "width", "height", "jpeg_quality"):
+                labels = OrderedDict([("camera", source["camera"]), ("setting", setting)])
+                setting_samples.append(("", labels, control[setting]))
+            adjustment_samples.append(("", OrderedDict([("camera", source["camera"])]), control["adjustments"]))
+    add_family("latency_control_setting", "gauge",
+               "Current settings of the latency controller (detection stride, display size and JPEG quality).",
+               setting_samples)
+    add_family("latency_control_adjustments_total", "counter",
+               "Number of adjustments which the latency controller made to hold the target latency.",
+               adjustment_samples)
+    return "\n".join(lines) + "\n"
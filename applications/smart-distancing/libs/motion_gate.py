@@ -0,0 +1,84 @@
+import cv2 as cv
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decide whether a frame changed since the last frame passed to the detector, so the detector is not run on
+    the frames of an empty or static scene.
+
+    The display frame is downscaled (area averaging also removes most of the sensor noise), converted to gray
+    and compared with the downscaled frame of the last inference. The frame is divided into a grid of tiles; a
+    tile changed if more than MotionGateTileFraction of its pixels differ by more than MotionGatePixelThreshold
+    gray levels. If no tile changed nothing moved since the last inference, and its detections are reused.
+    The reference frame is only replaced when the detector runs, so slow motions accumulate until they are
+    detected, and the detector runs at least once every MotionGateMaxSkip + 1 frames (0 disables the gate).
+
+    :param config: Is a ConfigEngine instance which provides necessary parameters.
+    """
+
+    # Side (pixels) of a tile in the downscaled frame
+    CELL_SIZE = 16
+
+    def __init__(self, config):
+        detector_config = config.get_section_dict('Detector')
+        self.max_skip = max(int(detector_config.get('MotionGateMaxSkip', 0)), 0)
+        self.tiles = tuple(int(i) for i in detector_config.get('MotionGateTiles', '8,6').split(','))  # (x, y)
+        self.pixel_threshold = int(detector_config.get('MotionGatePixelThreshold', 25))
+        self.tile_fraction = float(detector_config.get('MotionGateTileFraction', 0.02))
+        columns, rows = self.tiles
+        self._size = (columns * self.CELL_SIZE, rows * self.CELL_SIZE)
+        self._small = np.empty((self._size[1], self._size[0], 3), dtype=np.uint8)
+        self._gray = np.empty((self._size[1], self._size[0]), dtype=np.uint8)
+        self._reference = np.empty_like(self._gray)
+        self._diff = np.empty_like(self._gray)
+        self._has_reference = False
+        self.frames = 0
+        self.skipped = 0
+        self._skipped_in_a_row = 0
+
+    @property
+    def enabled(self):
+        return self.max_skip > 0
+
+    def should_detect(self, display_frame):
+        """
+        Returns True if the frame should be passed to the detector, False if it did not change since the last
+        frame passed to the detector. Should be called once for each frame the detector would otherwise run on.
+
+        Args:
+            display_frame: uint8 BGR numpy array with shape (height, width, 3)
+        """
+        self.frames += 1
+        cv.resize(display_frame, self._size, dst=self._small, interpolation=cv.INTER_AREA)
+        cv.cvtColor(self._small, cv.COLOR_BGR2GRAY, dst=self._gray)
+        if self._has_reference and self._skipped_in_a_row < self.max_skip:
+            cv.absdiff(self._gray, self._reference, dst=self._diff)
+            columns, rows = self.tiles
+            changed_pixels = (self._diff > self.pixel_threshold).reshape(
+                rows, self.CELL_SIZE, columns, self.CELL_SIZE
+            )
+            # Tiles which changed since the reference frame, [rows, columns]
+            changed_tiles = changed_pixels.mean(axis=(1, 3)) > self.tile_fraction
+            if not changed_tiles.any():
+                self.skipped += 1
+                self._skipped_in_a_row += 1
+                return False
+        # The detector runs on this frame, it is the reference of the next ones
+        self._gray, self._reference = self._reference, self._gray
+        self._has_reference = True
+        self._skipped_in_a_row = 0
+        return True
+
+    def report(self):
+        """
+        Returns a dictionary of the decisions since the start:
+            "frames": number of frames the detector would have run on
+            "skipped": number of inferences which were skipped because nothing changed
+            "skipped_fraction": skipped / frames
+        """
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skipped_fraction": self.skipped / self.frames if self.frames > 0 else 0.0,
+        }
@@ -0,0 +1,162 @@
+"""
+Non-maximum suppression of the duplicated boxes of a frame.
+
+The boxes are sorted once (by score, or by the bottom edge of the box for detectors without meaningful scores)
+and the greedy pass runs over blocks of block_size rows: the overlaps of the boxes of a block which are still
+kept with the later boxes are computed with numpy, the block is consumed (its kept boxes remove the boxes they
+overlap) and only then the next block is computed, so a frame of N boxes needs O(block_size * N) memory and the
+removed boxes are never compared again. The boxes are normalized
+(xmin, ymin, xmax, ymax) coordinates, so no +1 pixel padding is added to the widths and heights.
+
+Soft-NMS (Bodla et al., 2017) decays the scores of the overlapping boxes with a Gaussian of their IoU instead of
+removing them, and drops the boxes whose score falls below a threshold. A removed box is not known until the
+scores of all of the boxes before it decayed, so soft-NMS builds the [N, N] IoU matrix (in blocks of rows) and
+keeps the [K, K] decay matrix of the K boxes which overlap another box.
+"""
+import numpy as np
+
+ORDERS = ("Score", "Bottom")
+
+
+def intersections_and_area_sums(boxes_a, boxes_b):
+    """
+    Returns the [N, M] intersection areas and sums of the areas of each box of boxes_a ([N, 4]) with each box
+    of boxes_b ([M, 4]), so IoU > t can be tested as intersection * (1 + t) > t * area_sum without a division.
+    """
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersections = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    areas_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return intersections, areas_a[:, None] + areas_b[None, :]
+
+
+def pairwise_iou(boxes_a, boxes_b):
+    """
+    Returns the [N, M] matrix of the IoU of each box of boxes_a ([N, 4]) with each box of boxes_b ([M, 4]).
+    """
+    intersections, area_sums = intersections_and_area_sums(boxes_a, boxes_b)
+    unions = area_sums - intersections
+    return np.divide(intersections, unions, out=np.zeros_like(intersections), where=unions > 0)
+
+
+def iou_matrix(boxes, class_ids=None, block_size=256):
+    """
+    Compute the symmetric [N, N] IoU matrix of boxes block by block. If class_ids is given, the IoU of two
+    boxes of different classes is 0.
+    """
+    n = len(boxes)
+    ious = np.empty((n, n), dtype=boxes.dtype)
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        ious[start:end] = pairwise_iou(boxes[start:end], boxes)
+        if class_ids is not None:
+            ious[start:end] *= class_ids[start:end, None] == class_ids[None, :]
+    return ious
+
+
+def suppression_block(boxes, rows, start, iou_threshold, class_ids=None):
+    """
+    Compute the [len(rows), N - start] boolean matrix of the pairs (rows[k], start + j) whose IoU is larger than
+    iou_threshold and whose row comes first (rows[k] < start + j), the rows being indices >= start. IoU > t is
+    tested as intersection * (1 + t) > t * (area_i + area_j), which needs no division.
+    """
+    intersections, area_sums = intersections_and_area_sums(boxes[rows], boxes[start:])
+    block = intersections * (1 + iou_threshold) > iou_threshold * area_sums
+    if class_ids is not None:
+        block &= class_ids[rows, None] == class_ids[None, start:]
+    block &= rows[:, None] < np.arange(start, len(boxes))[None, :]
+    return block
+
+
+def _sort_order(boxes, scores, order):
+    # Indices of the boxes from the first to keep to the last
+    if order == "Score":
+        if scores is None:
+            return np.arange(len(boxes))
+        return np.argsort(-scores, kind="stable")
+    if order == "Bottom":
+        # The boxes closest to the camera first, like the original NMS of the repo
+        return np.argsort(-boxes[:, 3], kind="stable")
+    raise ValueError("unknown NMS order: " + str(order))
+
+
+def non_max_suppression(boxes, scores=None, iou_threshold=0.5, class_ids=None, order="Score", block_size=256):
+    """
+    Greedy non-maximum suppression: a box is removed if its IoU with a box kept before it is larger than
+    iou_threshold.
+
+    Args:
+        boxes: a float array of shape [N, 4], the normalized (xmin, ymin, xmax, ymax) of the boxes
+        scores: a float array of shape [N], required by the "Score" order
+        iou_threshold: minimum IoU of two duplicated boxes
+        class_ids: if given, only the boxes of the same class suppress each other (class-aware NMS)
+        order: "Score" keeps the most confident boxes first, "Bottom" the boxes with the lowest bottom edge
+        block_size: number of boxes whose overlaps are computed at once
+
+    Returns:
+        The sorted indices of the kept boxes
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    sorted_indices = _sort_order(boxes, None if scores is None else np.asarray(scores), order)
+    sorted_classes = None if class_ids is None else np.asarray(class_ids)[sorted_indices]
+    sorted_boxes = boxes[sorted_indices]
+    n = len(boxes)
+    removed = np.zeros(n, dtype=bool)
+    for start in range(0, n, block_size):
+        # The boxes of the block removed by the earlier blocks cannot remove anything
+        rows = start + np.flatnonzero(~removed[start:start + block_size])
+        if len(rows) == 0:
+            continue
+        suppress = suppression_block(sorted_boxes, rows, start, iou_threshold, sorted_classes)
+        # Only the boxes which overlap a later box can remove anything, in a crowd most boxes do not
+        for k in np.flatnonzero(suppress.any(axis=1)):
+            if not removed[rows[k]]:
+                removed[start:] |= suppress[k]
+    return np.sort(sorted_indices[~removed])
+
+
+def soft_non_max_suppression(boxes, scores, sigma=0.5, min_score=0.001, class_ids=None, block_size=256):
+    """
+    Gaussian soft-NMS: the most confident remaining box is kept and the scores of the other boxes are
+    multiplied by exp(-IoU^2 / sigma), until the remaining scores are below min_score.
+
+    Args:
+        boxes: a float array of shape [N, 4], the normalized (xmin, ymin, xmax, ymax) of the boxes
+        scores: a float array of shape [N]
+        sigma: width of the Gaussian decay, smaller values suppress more
+        min_score: boxes whose decayed score is below this are removed
+        class_ids: if given, only the boxes of the same class decay each other's scores
+        block_size: number of rows of the IoU matrix that are computed at once
+
+    Returns:
+        keep: the sorted indices of the kept boxes
+        kept_scores: the decayed scores of the kept boxes
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.array(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64), scores
+    ious = iou_matrix(boxes, None if class_ids is None else np.asarray(class_ids), block_size)
+    np.fill_diagonal(ious, 0)
+    # The scores of the boxes which do not overlap any box never decay, only the others need the greedy loop
+    overlapping = np.flatnonzero(ious.any(axis=1))
+    decay = np.exp(-(ious[np.ix_(overlapping, overlapping)] ** 2) / sigma)
+    overlapping_scores = scores[overlapping]
+    remaining = overlapping_scores >= min_score
+    candidate_scores = np.where(remaining, overlapping_scores, -np.inf)
+    for _ in range(len(overlapping)):
+        i = np.argmax(candidate_scores)
+        if candidate_scores[i] < min_score:
+            break
+        remaining[i] = False
+        candidate_scores[i] = -np.inf
+        np.multiply(overlapping_scores, decay[i], out=overlapping_scores, where=remaining)
+        np.multiply(candidate_scores, decay[i], out=candidate_scores, where=remaining)
+    scores[overlapping] = overlapping_scores
+    keep = np.flatnonzero(scores >= min_score)
+    return keep, scores[keep]
@@ -0,0 +1,310 @@
+"""
+Headless analysis of recorded videos.
+
+The videos of the configured sources are split into segments of segment_length seconds and the segments are
+processed by a pool of worker processes, each one with its own detector, tracker and logger. Nothing is drawn
+or served and the queues of the pipeline block instead of dropping frames, so every frame is processed as fast
+as the hardware allows. When all of the segments are done their logs are merged in order into the log directory
+of the source.
+
+The timestamps of the logs are computed from the position of the frame in the video (start_time + frame index /
+fps) instead of the wall-clock time, so the logs do not depend on how fast the video was processed. Unless it is
+given, the start time of a video is estimated from the modification time of the file (the end of the recording)
+minus the duration of the video.
+
+If [Detector] RecordPath is set the detector outputs of the segments are recorded and merged into one recording.
+With the Replay device the video is not decoded at all: the recorded detector outputs are post-processed and
+logged directly, which is how the post-processing parameters can be tuned quickly on a recorded video.
+"""
+import multiprocessing
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import cv2 as cv
+
+from libs.config_engine import ConfigEngine
+from libs.core import Distancing
+from libs.loggers.loggers import Logger
+from libs.recording import DetectionRecorder, merge_recordings, read_recording, recording_path
+
+
+def split_segments(frame_count, segment_frames):
+    """
+    Split a video into consecutive segments.
+
+    Args:
+        frame_count: number of frames of the video, 0 if it is unknown
+        segment_frames: number of frames of each segment
+
+    Returns:
+        A list of (start_frame, end_frame) tuples, end_frame is exclusive and None means the end of the video.
+    """
+    if frame_count <= 0:
+        return [(0, None)]
+    segment_frames = max(int(segment_frames), 1)
+    return [(start, min(start + segment_frames, frame_count)) for start in range(0, frame_count, segment_frames)]
+
+
+def process_segment(task):
+    """
+    Process and log the frames of a segment of a video. It runs in a worker process.
+
+    The tracker is warmed up on the warmup_frames frames before the segment, which are not logged, so the
+    objects at the beginning of the segment are tracked like in the middle of the video.
+
+    Args:
+        task: a dictionary with the "config_path", "source", "start_frame", "end_frame", "warmup_frames",
+        "fps", "start_time", "log_directory", "record_path" and "replay_path" of the segment
+
+    Returns:
+        A dictionary with the number of processed "frames" and the processing time ("seconds") of the segment,
+        and the report of the motion gate ("gated_inferences", None if it is disabled)
+    """
+    t_begin = time.perf_counter()
+    config = ConfigEngine(task["config_path"])
+    engine = Distancing(config, source=task["source"])
+    engine.logger = Logger(config, log_directory=task["log_directory"])
+    start_frame, end_frame, fps = task["start_frame"], task["end_frame"], task["fps"]
+    first_frame = max(start_frame - task["warmup_frames"], 0)
+    logged_frames = [0]
+
+    def log(frame_index, objects, distances):
+        if frame_index < start_frame:
+            return
+        timestamp = task["start_time"] + timedelta(seconds=frame_index / fps)
+        with engine.metrics.time("logging"):
+            engine.logger.update(objects, distances, timestamp)
+        logged_frames[0] += 1
+
+    if task["replay_path"]:
+        # Post-process the recorded detector outputs, the frames which reused the result of the frame before
+        # them (motion gate) reuse it again and the frames which were not passed to the detector during the
+        # recording are extrapolated by the tracker like they were then
+        _, frame_count, recorded_frames = read_recording(task["replay_path"])
+        if end_frame is None:
+            end_frame = frame_count
+        # The warm-up starts at a detection, the frames which reuse or extrapolate a result need one before them
+        detected_frames = [i for i, detections in recorded_frames.items() if detections is not None and i <= first_frame]
+        if len(detected_frames) > 0:
+            first_frame = max(detected_frames)
+        last_result = None
+        for frame_index in range(first_frame, end_frame):
+            detections = recorded_frames.get(frame_index)
+            if detections is not None:
+                last_result = engine.postprocess(detections, frame_index / fps)
+            elif frame_index not in recorded_frames or last_result is None:
+                last_result = engine.extrapolate(frame_index / fps)
+            log(frame_index, *last_result)
+        return {"frames": logged_frames[0], "seconds": time.perf_counter() - t_begin}
+
+    input_cap = cv.VideoCapture(task["source"]["VideoPath"])
+    if not input_cap.isOpened():
+        raise RuntimeError("failed to load video " + task["source"]["VideoPath"])
+    if first_frame > 0:
+        input_cap.set(cv.CAP_PROP_POS_FRAMES, first_frame)
+
+    frames_read = [first_frame]
+
+    def read_frames():
+        while end_frame is None or frames_read[0] < end_frame:
+            ret, cv_image = input_cap.read()
+            if not ret:
+                break
+            yield {"cv_image": cv_image, "capture_time": time.perf_counter(), "frame_index": frames_read[0],
+                   "timestamp": frames_read[0] / fps}
+            frames_read[0] += 1
+
+    def log_stage(frame):
+        log(frame["frame_index"], frame["objects"], frame["distances"])
+
+    if task["record_path"]:
+        engine.recorder = DetectionRecorder(task["record_path"], fps)
+    try:
+        engine.build_pipeline(read_frames(), log_stage, drop_oldest=False).run()
+    finally:
+        input_cap.release()
+        if engine.recorder is not None:
+            engine.recorder.close(frames_read[0])
+    return {"frames": logged_frames[0], "seconds": time.perf_counter() - t_begin,
+            "gated_inferences": engine.gated_inferences()}
+
+
+def merge_logs(segment_directories, log_directory):
+    """
+    Append the objects logs of the segments, in the given order, to the objects logs of log_directory
+    and remove the segment directories.
+    """
+    objects_log_directory = os.path.join(log_directory, "objects_log")
+    if not os.path.exists(objects_log_directory):
+        os.makedirs(objects_log_directory)
+    for segment_directory in segment_directories:
+        segment_log_directory = os.path.join(segment_directory, "objects_log")
+        if os.path.isdir(segment_log_directory):
+            # One file per day, the names are the dates so sorting them keeps the order
+            for file_name in sorted(os.listdir(segment_log_directory)):
+                with open(os.path.join(segment_log_directory, file_name)) as segment_file:
+                    lines = segment_file.readlines()
+                file_path = os.path.join(objects_log_directory, file_name)
+                file_exists = os.path.isfile(file_path)
+                with open(file_path, "a") as log_file:
+                    # Skip the header if the file already has one
+                    log_file.writelines(lines[1:] if file_exists else lines)
+        shutil.rmtree(segment_directory, ignore_errors=True)
+
+
+class OfflineAnalyzer:
+    """
+    Analyze the recorded videos of the config's sources without the ui, see the module docstring.
+
+    :param config_path: the path of the config file, each worker process loads it again.
+    :param workers: number of worker processes. Each one loads its own detector, so the device must be able
+        to run several models at the same time (e.g. the x86 CPU detectors).
+    :param segment_length: length of the segments in seconds.
+    :param start_time: datetime of the first frame of the videos. If it is None the start time of each video
+        is estimated from the modification time of its file, see _start_time.
+    :param warmup_frames: number of frames before each segment that are processed to warm up the tracker.
+    """
+
+    def __init__(self, config_path, workers=1, segment_length=300, start_time=None, warmup_frames=10):
+        self.config_path = config_path
+        self.config = ConfigEngine(config_path)
+        self.workers = max(int(workers), 1)
+        self.segment_length = float(segment_length)
+        self.start_time = start_time
+        self.warmup_frames = max(int(warmup_frames), 0)
+
+    def _source_name(self, source):
+        # Same layout of the logs and recordings as the live mode, see Distancing
+        if len(self.config.get_video_sources()) > 1:
+            return source["Name"]
+        return None
+
+    def _log_directory(self, source):
+        log_directory = self.config.get_section_dict("Logger")["LogDirectory"]
+        if self._source_name(source) is not None:
+            log_directory = os.path.join(log_directory, self._source_name(source))
+        return log_directory
+
+    def _video_info(self, source):
+        # Returns the (fps, number of frames) of a source, or None if it can not be opened
+        detector_config = self.config.get_section_dict("Detector")
+        if detector_config["Device"] == "Replay":
+            fps, frame_count, _ = read_recording(
+                recording_path(detector_config["ReplayPath"], self._source_name(source)))
+            return fps, frame_count
+        input_cap = cv.VideoCapture(source["VideoPath"])
+        if not input_cap.isOpened():
+            print('failed to load video ', source["VideoPath"])
+            return None
+        fps = input_cap.get(cv.CAP_PROP_FPS)
+        frame_count = int(input_cap.get(cv.CAP_PROP_FRAME_COUNT))
+        input_cap.release()
+        return fps, frame_count
+
+    def _start_time(self, source, fps, frame_count, replay_path):
+        # The datetime of the first frame of a source: start_time if it is set, otherwise the modification time
+        # of the video file (or of the recording for the Replay device), when the recording ended, minus the
+        # duration of the video
+        if self.start_time is not None:
+            return self.start_time
+        path = source["VideoPath"]
+        if not os.path.isfile(path) and replay_path:
+            path = replay_path
+        if not os.path.isfile(path):
+            print('the start time of ', source["VideoPath"], ' is unknown, using the current time (set --start_time)')
+            return datetime.now().replace(microsecond=0)
+        end_time = datetime.fromtimestamp(os.path.getmtime(path))
+        start_time = (end_time - timedelta(seconds=max(frame_count, 0) / fps)).replace(microsecond=0)
+        print('start time of ', source["VideoPath"], ': ', start_time,
+              ' (estimated from the modification time of ', path, ', set --start_time to override)')
+        return start_time
+
+    def build_tasks(self):
+        """
+        Returns a list of the segment tasks of all of the sources, see process_segment.
+        """
+        tasks = []
+        detector_config = self.config.get_section_dict("Detector")
+        for source in self.config.get_video_sources():
+            video_info = self._video_info(source)
+            if video_info is None:
+                continue
+            fps, frame_count = video_info
+            if not fps > 0:
+                print('unknown frame rate of ', source["VideoPath"], ', assuming 30 fps')
+                fps = 30.0
+            log_directory = self._log_directory(source)
+            record_path = detector_config.get("RecordPath", "")
+            if record_path and detector_config["Device"] != "Replay":
+                record_path = recording_path(record_path, self._source_name(source))
+            else:
+                record_path = ""
+            replay_path = ""
+            if detector_config["Device"] == "Replay":
+                replay_path = recording_path(detector_config["ReplayPath"], self._source_name(source))
+            start_time = self._start_time(source, fps, frame_count, replay_path)
+            segments = split_segments(frame_count, round(self.segment_length * fps))
+            for i, (start_frame, end_frame) in enumerate(segments):
+                segment_directory = os.path.join(log_directory, "segments", "%05d" % i)
+                tasks.append({
+                    "config_path": self.config_path,
+                    "source": source,
+                    "start_frame": start_frame,
+                    "end_frame": end_frame,
+                    "warmup_frames": self.warmup_frames,
+                    "fps": fps,
+                    "start_time": start_time,
+                    "log_directory": segment_directory,
+                    "merged_log_directory": log_directory,
+                    "record_path": os.path.join(segment_directory, "detections.rec") if record_path else "",
+                    "merged_record_path": record_path,
+                    "replay_path": replay_path,
+                })
+        return tasks
+
+    def run(self):
+        """
+        Process all of the segments and merge their logs.
+
+        Returns:
+            A list of the results of the segments, see process_segment.
+        """
+        tasks = self.build_tasks()
+        print('processing %d segments with %d workers' % (len(tasks), self.workers))
+        t_begin = time.perf_counter()
+        if self.workers > 1 and len(tasks) > 1:
+            # Spawned workers do not inherit the threads and the device handles of this process
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(min(self.workers, len(tasks))) as pool:
+                results = pool.map(process_segment, tasks, chunksize=1)
+        else:
+            results = [process_segment(task) for task in tasks]
+
+        recordings = {}
+        for task in tasks:
+            if task["record_path"]:
+                recordings.setdefault(task["merged_record_path"], []).append(
+                    (task["record_path"], task["start_frame"]))
+        for record_path, segments in recordings.items():
+            merge_recordings(segments, record_path)
+            print('recorded the detector outputs to ', record_path)
+
+        segment_directories = {}
+        for task in tasks:
+            segment_directories.setdefault(task["merged_log_directory"], []).append(task["log_directory"])
+        for log_directory, directories in segment_directories.items():
+            merge_logs(directories, log_directory)
+            shutil.rmtree(os.path.join(log_directory, "segments"), ignore_errors=True)
+
+        elapsed = time.perf_counter() - t_begin
+        frames = sum(result["frames"] for result in results)
+        print('processed %d frames in %.1f seconds (%.1f fps)' % (frames, elapsed, frames / max(elapsed, 1e-9)))
+        gates = [result["gated_inferences"] for result in results if result.get("gated_inferences") is not None]
+        if len(gates) > 0:
+            gated_frames = sum(gate["frames"] for gate in gates)
+            skipped = sum(gate["skipped"] for gate in gates)
+            print('the motion gate skipped %d of %d inferences (%.1f%%)' % (
+                skipped, gated_frames, 100 * skipped / max(gated_frames, 1)))
+        return results
@@ -0,0 +1,246 @@
+"""
+A small threaded pipeline used for processing video frames.
+
+The pipeline is a chain of stages (e.g. capture -> preprocessing -> inference -> post-processing -> rendering).
+Every stage runs on its own thread and stages are connected by bounded queues, so while the accelerator runs
+inference on frame N the CPU can decode frame N+1 and draw frame N-1. The end-to-end throughput is then limited
+by the slowest stage instead of the sum of all of them.
+"""
+import collections
+import threading
+
+
+class FrameQueue:
+    """
+    A bounded FIFO queue that connects two stages of the pipeline.
+
+    When the queue is full, putting a new item either blocks the producer until the consumer catches up or
+    evicts the oldest waiting item, depending on the drop policy. Dropping the oldest item keeps the latency
+    of live streams bounded; blocking is the right choice when every frame must be processed (e.g. video files).
+
+    :param maxsize: Maximum number of items waiting in the queue.
+    :param drop_oldest: If True, putting into a full queue drops the oldest item instead of blocking.
+    """
+
+    def __init__(self, maxsize=2, drop_oldest=True):
+        self.maxsize = max(int(maxsize), 1)
+        self.drop_oldest = drop_oldest
+        # Number of items which were evicted by the drop-oldest policy
+        self.dropped = 0
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+    def put(self, item):
+        """
+        Append an item to the queue.
+
+        Args:
+            item: Any object except None (None is reserved for signaling the end of the stream).
+
+        Returns:
+            False if the queue is closed and the item was discarded, otherwise True.
+        """
+        with self._not_full:
+            while len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_oldest:
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                self._not_full.wait()
+            if self._closed:
+                return False
+            self._items.append(item)
+            self._not_empty.notify()
+            return True
+
+    def get(self):
+        """
+        Remove and return the oldest item of the queue. Blocks until an item is available.
+
+        Returns:
+            The oldest item or None when the queue is closed and all of its items are consumed.
+        """
+        with self._not_empty:
+            while not self._items and not self._closed:
+                self._not_empty.wait()
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def close(self, discard=False):
+        """
+        Close the queue. Consumers still receive the remaining items unless discard is True.
+        """
+        with self._lock:
+            self._closed = True
+            if discard:
+                self._items.clear()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def qsize(self):
+        with self._lock:
+            return len(self._items)
+
+
+class Stage(threading.Thread):
+    """
+    A pipeline stage which applies a function to every item of its input queue and pushes the result
+    to its output queue. If the function returns None the item is dropped.
+
+    When the input queue is exhausted the stage closes its output queue, so the end of the stream
+    propagates through the whole pipeline.
+
+    :param name: Name of the stage, used for the thread name and in reports.
+    :param func: A callable that receives an item and returns the processed item (or None).
+    :param input_queue: FrameQueue that the stage consumes.
+    :param output_queue: FrameQueue that the stage produces into, None for the last stage.
+    :param pipeline: The Pipeline instance that owns the stage, used for reporting errors.
+    """
+
+    def __init__(self, name, func, input_queue, output_queue, pipeline):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.pipeline = pipeline
+        self.processed = 0
+
+    def run(self):
+        try:
+            while True:
+                item = self.input_queue.get()
+                if item is None:
+                    break
+                result = self.func(item)
+                self.processed += 1
+                if result is not None and self.output_queue is not None:
+                    self.output_queue.put(result)
+        except Exception as e:
+            self.pipeline.fail(self.name, e)
+        finally:
+            if self.output_queue is not None:
+                self.output_queue.close()
+
+
+class Pipeline:
+    """
+    Run a source and a chain of stages concurrently, each one on its own thread.
+
+    :param source: An iterable which produces the items of the pipeline (e.g. decoded frames). It is consumed
+        on a separate "capture" thread.
+    :param stages: A list of (name, func) tuples. func receives the output of the previous stage.
+    :param queue_size: Capacity of the queues between the stages, or a list of the capacity of the input queue
+        of each stage.
+    :param drop_oldest: Queue policy, see FrameQueue.
+    """
+
+    def __init__(self, source, stages, queue_size=2, drop_oldest=True):
+        self.source = source
+        queue_sizes = queue_size if isinstance(queue_size, (list, tuple)) else [queue_size] * len(stages)
+        self.queues = [FrameQueue(size, drop_oldest) for size in queue_sizes]
+        self.stages = []
+        for i, (name, func) in enumerate(stages):
+            output_queue = self.queues[i + 1] if i + 1 < len(stages) else None
+            self.stages.append(Stage(name, func, self.queues[i], output_queue, self))
+        self._running = False
+        self._error = None
+
+    def _capture(self):
+        try:
+            for item in self.source:
+                if not self._running:
+                    break
+                self.queues[0].put(item)
+        except Exception as e:
+            self.fail("capture", e)
+        finally:
+            self.queues[0].close()
+
+    def fail(self, stage_name, error):
+        # Keep the first error and stop the whole pipeline
+        if self._error is None:
+            self._error = (stage_name, error)
+        self.stop()
+
+    def run(self):
+        """
+        Start all of the stages and block until the source is exhausted and every item is processed
+        or stop() is called. Errors raised inside the stages are re-raised here.
+        """
+        self._running = True
+        capture_thread = threading.Thread(target=self._capture, name="capture", daemon=True)
+        for stage in self.stages:
+            stage.start()
+        capture_thread.start()
+        capture_thread.join()
+        for stage in self.stages:
+            stage.join()
+        self._running = False
+        if self._error is not None:
+            stage_name, error = self._error
+            raise RuntimeError("pipeline stage '%s' failed" % stage_name) from error
+
+    def stop(self):
+        """
+        Stop the pipeline as soon as possible, the frames which are waiting in the queues are discarded.
+        """
+        self._running = False
+        for frame_queue in self.queues:
+            frame_queue.close(discard=True)
+
+    def dropped_frames(self):
+        # Returns a dictionary of {stage name: number of items dropped before the stage}
+        return {stage.name: stage.input_queue.dropped for stage in self.stages}
+
+
+class StreamStats:
+    """
+    Keep track of the throughput and the end-to-end latency of a video stream.
+
+    Both values are exponential moving averages so the report follows the recent state of the stream.
+
+    :param smoothing: Weight of the newest sample in the moving averages.
+    """
+
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.frames = 0
+        self.fps = None
+        self.latency = None  # Seconds
+        self._last_time = None
+        self._lock = threading.Lock()
+
+    def _average(self, average, sample):
+        if average is None:
+            return sample
+        return (1 - self.smoothing) * average + self.smoothing * sample
+
+    def update(self, capture_time, done_time):
+        """
+        Register a processed frame.
+
+        Args:
+            capture_time: time.perf_counter() value when the frame was captured
+            done_time: time.perf_counter() value when the processing of the frame was finished
+        """
+        with self._lock:
+            self.frames += 1
+            self.latency = self._average(self.latency, done_time - capture_time)
+            if self._last_time is not None and done_time > self._last_time:
+                self.fps = self._average(self.fps, 1.0 / (done_time - self._last_time))
+            self._last_time = done_time
+
+    def report(self):
+        # Returns a dictionary of the stream statistics which is appropriate for json serialization
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "fps": round(self.fps, 2) if self.fps is not None else None,
+                "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            }
@@ -0,0 +1,93 @@
+import cv2 as cv
+import numpy as np
+
+
+class FramePreprocessor:
+    """
+    Prepare the frames of a video stream for display and for the detector without per-frame allocations.
+
+    The geometry (display resolution and detector input size) is parsed once, and the output buffers are
+    allocated once. Since the frames of a pipeline are processed concurrently by different stages, the
+    preprocessor rotates over num_buffers sets of buffers; a buffer is reused only after num_buffers newer
+    frames were preprocessed, so num_buffers should be larger than the number of frames in flight.
+
+    :param resolution: (width, height) of the display frame
+    :param image_size: (width, height) of the detector input
+    :param num_buffers: number of buffer sets to rotate over
+    """
+
+    def __init__(self, resolution, image_size, num_buffers=1):
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.num_buffers = max(int(num_buffers), 1)
+        self.set_resolution(resolution)
+        input_width, input_height = self.image_size
+        self._detector_inputs = [
+            np.empty((input_height, input_width, 3), dtype=np.uint8) for _ in range(self.num_buffers)
+        ]
+        # Intermediate BGR image of the detector size, it is consumed immediately so one buffer is enough
+        self._resized_bgr = np.empty((input_height, input_width, 3), dtype=np.uint8)
+        self._input_index = 0
+
+    def set_resolution(self, resolution):
+        """
+        Change the display resolution. New buffers are allocated, so the display frames which are still in
+        flight keep their size and content.
+
+        Args:
+            resolution: (width, height) of the display frame
+        """
+        self.resolution = (int(resolution[0]), int(resolution[1]))
+        width, height = self.resolution
+        self._display_frames = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self.num_buffers)]
+        self._index = 0
+
+    def resize_display(self, cv_image):
+        """
+        Resize a frame to the display resolution.
+
+        Args:
+            cv_image: uint8 BGR numpy array with shape (img_height, img_width, 3)
+
+        Returns:
+            display_frame: the frame resized to resolution, stored in the next preallocated buffer
+        """
+        display_frame = self._display_frames[self._index]
+        self._index = (self._index + 1) % self.num_buffers
+        cv.resize(cv_image, self.resolution, dst=display_frame)
+        return display_frame
+
+    def process(self, cv_image, detector_input=None):
+        """
+        Resize a frame to the display resolution and build the RGB detector input from it.
+
+        Args:
+            cv_image: uint8 BGR numpy array with shape (img_height, img_width, 3)
+            detector_input: optional uint8 array with shape (input_height, input_width, 3) that receives the
+                detector input (e.g. a view of the interpreter's input tensor). If it is None the next
+                preallocated buffer is used.
+
+        Returns:
+            display_frame: the frame resized to resolution (BGR)
+            detector_input: the frame resized to image_size (RGB)
+        """
+        display_frame = self.resize_display(cv_image)
+        return display_frame, self.prepare_detector_input(display_frame, detector_input)
+
+    def prepare_detector_input(self, display_frame, detector_input=None):
+        """
+        Resize a display frame to image_size and convert it to RGB.
+
+        Args:
+            display_frame: uint8 BGR numpy array, the output of resize_display
+            detector_input: optional uint8 array with shape (input_height, input_width, 3) that receives the
+                detector input. If it is None the next preallocated buffer is used.
+
+        Returns:
+            detector_input
+        """
+        if detector_input is None:
+            detector_input = self._detector_inputs[self._input_index]
+            self._input_index = (self._input_index + 1) % self.num_buffers
+        cv.resize(display_frame, self.image_size, dst=self._resized_bgr)
+        cv.cvtColor(self._resized_bgr, cv.COLOR_BGR2RGB, dst=detector_input)
+        return detector_input
@@ -0,0 +1,175 @@
+"""
+Record the raw detector outputs of a video and read them back.
+
+The recording is a compact binary file, so the post-processing, logging and analytics of a video can be re-run
+(e.g. to tune NMSThreshold, MaxTrackFrame, DistThreshold or DistMethod) without running the model again, see the
+Replay device (libs/detectors/replay) and the headless mode.
+
+File format (little-endian):
+    header: 8 bytes magic b"SDREC\\x00\\x02\\x00", float64 frame rate of the video, uint32 number of frames of
+        the video (the frames after the last detection are extrapolated by the tracker when replaying)
+    for each frame passed to the detector:
+        uint32 frame index, uint32 number of objects N
+        N records of RECORD_DTYPE: float32[4] normalized (xmin, ymin, xmax, ymax), float32 score, int16 class id
+    for each frame whose detector was skipped by the motion gate and which reused the result of the frame
+    before it:
+        uint32 frame index, uint32 REUSED
+
+The recordings of version 1 (magic b"SDREC\\x00\\x01\\x00") have no reused frames and are still read.
+"""
+import os
+import struct
+
+import numpy as np
+
+from libs.detections import DetectionBatch
+
+MAGIC = b"SDREC\x00\x02\x00"
+MAGICS = (b"SDREC\x00\x01\x00", MAGIC)
+HEADER = struct.Struct("<8sdI")
+FRAME_HEADER = struct.Struct("<II")
+RECORD_DTYPE = np.dtype([("bbox", "<f4", (4,)), ("score", "<f4"), ("class_id", "<i2")])
+# Number of objects of the frames which reused the result of the frame before them
+REUSED = 0xFFFFFFFF
+
+
+def recording_path(path, source_name=None):
+    """
+    Returns the recording path of a video source. Each camera of a multi-camera config gets its own
+    file: the name of the source is added before the extension of path.
+    """
+    if source_name is None:
+        return path
+    root, extension = os.path.splitext(path)
+    return root + "_" + source_name + extension
+
+
+class DetectionRecorder:
+    """
+    Append the detector output of each frame to a recording file.
+
+    :param path: Path of the recording file, it is overwritten.
+    :param fps: Frame rate of the video, stored in the header so the frame timestamps can be recovered.
+    """
+
+    def __init__(self, path, fps=0.0):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.fps = float(fps)
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, self.fps, 0))
+        self.frames = 0
+        # Number of frames of the video, at least the last recorded frame index + 1
+        self.frame_count = 0
+
+    def write(self, frame_index, detections):
+        """
+        Args:
+            frame_index: index of the frame in the video
+            detections: the output of the detector, a DetectionBatch or a list of dictionaries, see
+                DetectionBatch.from_detector_output, or None if the motion gate skipped the detector and the
+                result of the frame before was reused
+        """
+        self.frames += 1
+        self.frame_count = max(self.frame_count, int(frame_index) + 1)
+        if detections is None:
+            self._file.write(FRAME_HEADER.pack(int(frame_index), REUSED))
+            return
+        if not isinstance(detections, DetectionBatch):
+            detections = DetectionBatch.from_detector_output(detections)
+        records = np.empty(len(detections), dtype=RECORD_DTYPE)
+        records["bbox"] = detections.boxes
+        records["score"] = detections.scores
+        records["class_id"] = detections.class_ids
+        self._file.write(FRAME_HEADER.pack(int(frame_index), len(records)))
+        self._file.write(records.tobytes())
+
+    def close(self, frame_count=None):
+        """
+        Close the file and write the number of frames of the video into the header.
+
+        Args:
+            frame_count: number of frames of the video, defaults to the last recorded frame index + 1
+        """
+        if self._file.closed:
+            return
+        if frame_count is not None:
+            self.frame_count = max(self.frame_count, int(frame_count))
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, self.fps, self.frame_count))
+        self._file.close()
+
+
+def read_recording(path):
+    """
+    Read a recording file.
+
+    Returns:
+        fps: frame rate of the recorded video (0 if it was unknown)
+        frame_count: number of frames of the recorded video
+        frames: a dict of {frame index: DetectionBatch, or None if the frame reused the result of the frame
+            before it}, in the order of the recording
+    """
+    with open(path, "rb") as recording_file:
+        data = recording_file.read()
+    if len(data) < HEADER.size:
+        raise ValueError("not a detection recording: " + path)
+    magic, fps, frame_count = HEADER.unpack_from(data, 0)
+    if magic not in MAGICS:
+        raise ValueError("not a detection recording: " + path)
+    frames = {}
+    offset = HEADER.size
+    while offset + FRAME_HEADER.size <= len(data):
+        frame_index, num_objects = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        if num_objects == REUSED:
+            frames[frame_index] = None
+            continue
+        if offset + num_objects * RECORD_DTYPE.itemsize > len(data):
+            # The last frame of a recording which was interrupted while writing
+            break
+        records = np.frombuffer(data, dtype=RECORD_DTYPE, count=num_objects, offset=offset)
+        offset += records.nbytes
+        frames[frame_index] = DetectionBatch.from_arrays(
+            records["bbox"], scores=records["score"], class_ids=records["class_id"]
+        )
+    if len(frames) > 0:
+        frame_count = max(frame_count, max(frames) + 1)
+    return fps, frame_count, frames
+
+
+def merge_recordings(segments, path):
+    """
+    Concatenate the recordings of consecutive segments of a video into one recording.
+
+    Args:
+        segments: a list of (recording path, start frame) tuples in the order of the video. The frames before
+            the start frame of a segment (the warm-up frames of the headless mode) are skipped, the first frame
+            of a segment which reused the result of a warm-up frame gets the detections of that frame instead.
+        path: path of the merged recording
+    """
+    recorder = None
+    frame_count = 0
+    for segment_path, start_frame in segments:
+        if not os.path.isfile(segment_path):
+            continue
+        fps, segment_frame_count, frames = read_recording(segment_path)
+        if recorder is None:
+            recorder = DetectionRecorder(path, fps)
+        frame_count = max(frame_count, segment_frame_count)
+        # The last detections of the warm-up frames, until a frame of the segment is written
+        warmup_detections = None
+        for frame_index in sorted(frames):
+            detections = frames[frame_index]
+            if frame_index < start_frame:
+                if detections is not None:
+                    warmup_detections = detections
+                continue
+            if detections is None and warmup_detections is not None:
+                detections = warmup_detections
+            warmup_detections = None
+            recorder.write(frame_index, detections)
+    if recorder is not None:
+        recorder.close(frame_count)
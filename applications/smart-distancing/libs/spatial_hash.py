@@ -0,0 +1,290 @@
+"""
+Find the pairs of people that are closer than the distance threshold without enumerating all N^2 pairs.
+
+The points are bucketed into uniform grids whose cells are as large as the largest distance (in pixels) at which
+two people can still violate the threshold. A violating pair must then lie in the same or in neighbouring cells,
+so only those candidates are compared, and the cost grows roughly linearly with the number of people instead of
+quadratically. Since that distance grows with the heights of the boxes, the boxes of a perspective scene are
+split into height bands with one grid per pair of bands, so the people far from the camera are searched with
+small cells whatever the height of the people close to it. The result is a sparse list of the violating pairs and
+their distances.
+"""
+import numpy as np
+
+from libs.distances import PERSON_HEIGHT
+
+# Ratio of the tallest to the shortest box of a height band, see candidate_pairs
+HEIGHT_BAND_RATIO = 2.0
+# Below this number of pairs (about 256 boxes), all of the pairs are compared instead of building the grids: the
+# grids of the height bands cost a fixed number of numpy calls per pair of bands, which is slower for small crowds
+EXHAUSTIVE_PAIRS = 32768
+
+
+class SparseDistances:
+    """
+    Distances of the violating pairs of a frame, a sparse replacement of the NxN distance matrix.
+
+    :param num_objects: Number of objects (N) of the frame.
+    :param pairs: A numpy array of shape [M, 2] of the (i, j) indices of the violating pairs, i < j.
+    :param distances: A numpy array of shape [M], the estimated distance (cm) of each pair.
+    """
+
+    def __init__(self, num_objects, pairs, distances):
+        self.num_objects = num_objects
+        self.pairs = pairs
+        self.distances = distances
+
+    def __len__(self):
+        return self.num_objects
+
+    @property
+    def shape(self):
+        return self.num_objects, self.num_objects
+
+    def violating_pairs(self, dist_threshold):
+        return self.pairs[self.distances < float(dist_threshold)]
+
+    def min_distances(self, default):
+        """
+        Returns a numpy array of shape [N], the distance of each object to its closest violating neighbour,
+        or default if the object does not violate the threshold.
+        """
+        min_distances = np.full(self.num_objects, float(default))
+        if len(self.pairs) > 0:
+            np.minimum.at(min_distances, self.pairs[:, 0], self.distances)
+            np.minimum.at(min_distances, self.pairs[:, 1], self.distances)
+        return min_distances
+
+    def to_dense(self, fill_value=np.inf):
+        # NxN float32 matrix; the distances of the non-violating pairs are unknown and set to fill_value
+        dense = np.full(self.shape, fill_value, dtype=np.float32)
+        np.fill_diagonal(dense, 0)
+        dense[self.pairs[:, 0], self.pairs[:, 1]] = self.distances
+        dense[self.pairs[:, 1], self.pairs[:, 0]] = self.distances
+        return dense
+
+
+def grid_pairs(points, others, cell_size):
+    """
+    Bucket the points of others into a grid of square cells and return every pair of a point of points and a
+    point of others which lie in the same or in adjacent cells. Any pair closer than cell_size is guaranteed to
+    be returned.
+
+    Args:
+        points: A numpy array of shape [N, 2]
+        others: A numpy array of shape [K, 2]
+        cell_size: Size of the grid cells, in the units of points
+
+    Returns:
+        pairs: A numpy array of shape [M, 2] of the candidate (i, j) pairs, i indexes points and j others
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    others = np.asarray(others, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0 or len(others) == 0 or not cell_size > 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    origin = np.minimum(points.min(axis=0), others.min(axis=0))
+    cells = np.floor((points - origin) / cell_size).astype(np.int64)
+    other_cells = np.floor((others - origin) / cell_size).astype(np.int64)
+    # Unique key of each cell; rows are shifted by one so the neighbours of the first and last row
+    # do not wrap around into another column
+    stride = max(cells[:, 1].max(), other_cells[:, 1].max()) + 3
+    keys = cells[:, 0] * stride + cells[:, 1] + 1
+    other_keys = other_cells[:, 0] * stride + other_cells[:, 1] + 1
+    order = np.argsort(other_keys, kind="stable")
+    sorted_keys = other_keys[order]
+
+    all_pairs = []
+    for dx in (-1, 0, 1):
+        # The three cells of a neighbouring column have consecutive keys, they are one range of the sorted others
+        neighbour_keys = keys + dx * stride
+        begins = np.searchsorted(sorted_keys, neighbour_keys - 1, side="left")
+        ends = np.searchsorted(sorted_keys, neighbour_keys + 1, side="right")
+        counts = ends - begins
+        total = counts.sum()
+        if total == 0:
+            continue
+        # For each point i, the positions begins[i] ... ends[i] - 1 of the sorted others
+        first = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(begins, counts) + offsets]
+        all_pairs.append(np.stack([first, second], axis=1))
+    if len(all_pairs) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.concatenate(all_pairs, axis=0)
+
+
+def neighbour_pairs(points, cell_size):
+    """
+    Bucket the points into a grid of square cells and return every pair of points which lie in the same
+    or in adjacent cells. Any pair closer than cell_size is guaranteed to be returned.
+
+    Args:
+        points: A numpy array of shape [N, 2]
+        cell_size: Size of the grid cells, in the units of points
+
+    Returns:
+        pairs: A numpy array of shape [M, 2] of the candidate (i, j) pairs, i < j
+    """
+    pairs = grid_pairs(points, points, cell_size)
+    return pairs[pairs[:, 0] < pairs[:, 1]]
+
+
+def height_bands(heights):
+    """
+    Split the boxes into bands of similar heights: the heights of a band are within HEIGHT_BAND_RATIO of each
+    other, and every height of a band is smaller than the heights of the next bands.
+
+    Args:
+        heights: A numpy array of shape [N], the height of each box in pixels
+
+    Returns:
+        A list of the index arrays of the non-empty bands, from the shortest to the tallest boxes
+    """
+    heights = np.maximum(np.asarray(heights, dtype=np.float64), 1e-6)
+    bands = np.floor(np.log2(heights / heights.min()) / np.log2(HEIGHT_BAND_RATIO)).astype(np.int64)
+    order = np.argsort(bands, kind="stable")
+    splits = np.flatnonzero(np.diff(bands[order])) + 1
+    return np.split(order, splits)
+
+
+def candidate_pairs(boxes, dist_threshold, dist_method='CenterPointsDistance'):
+    """
+    Return the pairs of boxes which may be closer than dist_threshold; every violating pair is returned.
+
+    Two people with box heights h1 and h2 pixels can only be closer than T centimeters if their centers are
+    closer than T * 2 * h1 * h2 / (h1 + h2) / 170 pixels (plus half of the difference of the box sizes for
+    FourCornerPointsDistance). The reach of a pair therefore depends on the heights of its own boxes, so the
+    boxes are split into height bands (see height_bands) and the pairs of each two bands are searched on a grid
+    whose cells are sized by the tallest boxes of these two bands only. A few tall people close to the camera do
+    not enlarge the cells of the small people far from it, and the number of compared pairs stays close to the
+    number of pairs which are actually near each other.
+
+    Args:
+        boxes: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+        dist_threshold: The distance threshold in centimeters
+        dist_method: CenterPointsDistance or FourCornerPointsDistance
+
+    Returns:
+        pairs: A numpy array of shape [M, 2] of the candidate (i, j) pairs, i < j
+    """
+    all_pairs = list(_band_candidate_pairs(boxes, dist_threshold, dist_method))
+    if len(all_pairs) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    return np.concatenate(all_pairs, axis=0)
+
+
+def _band_candidate_pairs(boxes, dist_threshold, dist_method):
+    # Generator of the candidate pairs (i < j) of each two height bands, see candidate_pairs
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) < 2:
+        return
+    if len(boxes) * (len(boxes) - 1) // 2 <= EXHAUSTIVE_PAIRS:
+        yield np.stack(np.triu_indices(len(boxes), 1), axis=1)
+        return
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+    scale = float(dist_threshold) / PERSON_HEIGHT
+    bands = height_bands(heights)
+    bounds = [(centers[band].min(axis=0), centers[band].max(axis=0)) for band in bands]
+    for index, short in enumerate(bands):
+        for tall_index in range(index, len(bands)):
+            tall = bands[tall_index]
+            short_height, tall_height = heights[short].max(), heights[tall].max()
+            cell_size = scale * 2 * short_height * tall_height / (short_height + tall_height)
+            if dist_method == 'FourCornerPointsDistance':
+                # Corresponding corners can be closer than the centers by at most half of the size difference
+                both = np.concatenate([short, tall])
+                cell_size += np.hypot(np.ptp(widths[both]), np.ptp(heights[both])) / 2
+            if tall_index == index:
+                yield short[neighbour_pairs(centers[short], cell_size)]
+                continue
+            # Skip the bands which are farther apart than the cell size
+            (short_min, short_max), (tall_min, tall_max) = bounds[index], bounds[tall_index]
+            if np.any(short_min - tall_max >= cell_size) or np.any(tall_min - short_max >= cell_size):
+                continue
+            pairs = grid_pairs(centers[short], centers[tall], cell_size)
+            first, second = short[pairs[:, 0]], tall[pairs[:, 1]]
+            yield np.stack([np.minimum(first, second), np.maximum(first, second)], axis=1)
+
+
+def pairs_distances(boxes, pairs, dist_method):
+    """
+    Estimate the distance (cm) of the given pairs of boxes with the same model as libs/distances.py.
+
+    Args:
+        boxes: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+        pairs: A numpy array of shape [M, 2] of (i, j) indices
+        dist_method: CenterPointsDistance or FourCornerPointsDistance
+
+    Returns:
+        distances: A numpy array of shape [M]
+    """
+    heights = boxes[:, 3] - boxes[:, 1]
+    first, second = pairs[:, 0], pairs[:, 1]
+    scales = PERSON_HEIGHT * (1.0 / heights[first] + 1.0 / heights[second]) / 2
+    if dist_method == 'FourCornerPointsDistance':
+        corners = ((0, 1), (2, 1), (0, 3), (2, 3))
+        pixel_distances = np.min([
+            np.hypot(boxes[second, x] - boxes[first, x], boxes[second, y] - boxes[first, y]) for x, y in corners
+        ], axis=0)
+    else:
+        centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+        pixel_distances = np.hypot(*(centers[second] - centers[first]).T)
+    return pixel_distances * scales
+
+
+def find_violating_pairs(boxes, dist_threshold, dist_method='CenterPointsDistance'):
+    """
+    Find the pairs of boxes whose estimated distance is smaller than dist_threshold, only the candidate pairs
+    (see candidate_pairs) are compared.
+
+    Args:
+        boxes: A numpy array of shape [N, 4], (xmin, ymin, xmax, ymax) of each box in pixels
+        dist_threshold: The distance threshold in centimeters
+        dist_method: CenterPointsDistance or FourCornerPointsDistance
+
+    Returns:
+        A SparseDistances instance which contains the violating pairs
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    dist_threshold = float(dist_threshold)
+    if len(boxes) < 2:
+        return SparseDistances(len(boxes), np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.float32))
+    all_pairs, all_distances = [], []
+    # The candidates of each two height bands are filtered before the next ones are generated
+    for pairs in _band_candidate_pairs(boxes, dist_threshold, dist_method):
+        # Compare in float32, like the thresholding of the float32 distance matrix
+        distances = pairs_distances(boxes, pairs, dist_method).astype(np.float32)
+        violating = distances < dist_threshold
+        all_pairs.append(pairs[violating])
+        all_distances.append(distances[violating])
+    pairs, distances = np.concatenate(all_pairs, axis=0), np.concatenate(all_distances)
+    # Same order as np.argwhere on the upper triangle of the distance matrix
+    order = np.argsort(pairs[:, 0] * len(boxes) + pairs[:, 1], kind="stable")
+    return SparseDistances(len(boxes), pairs[order], distances[order])
+
+
+def find_violating_points(points, dist_threshold):
+    """
+    Find the pairs of floor positions of a calibrated camera (see libs/ground_plane.py) that are closer than
+    dist_threshold. The positions are metric, so the cell size of the grid is the threshold itself.
+
+    Args:
+        points: A numpy array of shape [N, 2], (x, y) floor positions in centimeters, NaN if unknown
+        dist_threshold: The distance threshold in centimeters
+
+    Returns:
+        A SparseDistances instance which contains the violating pairs
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    dist_threshold = float(dist_threshold)
+    known = np.flatnonzero(np.isfinite(points).all(axis=1))
+    if len(known) < 2:
+        return SparseDistances(len(points), np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.float32))
+    pairs = known[neighbour_pairs(points[known], dist_threshold)]
+    distances = np.hypot(*(points[pairs[:, 1]] - points[pairs[:, 0]]).T).astype(np.float32)
+    violating = distances < dist_threshold
+    pairs, distances = pairs[violating], distances[violating]
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    return SparseDistances(len(points), pairs[order], distances[order])
@@ -0,0 +1,97 @@
+"""
+Bounded trajectory history of the tracks of a tracker.
+
+Each track keeps its last `length` centroids, box heights and timestamps, and whether the box was detected or
+extrapolated, in fixed-size ring buffers. The buffers of all of the tracks are rows of a few numpy arrays that are
+kept aligned with the rows of the tracker state, so recording a frame is a single vectorized write and the memory
+is bounded by the number of live tracks times `length`, however long the process runs.
+"""
+import numpy as np
+
+
+class TrajectoryHistory:
+    """
+    :param length: Number of frames kept for each track.
+    """
+
+    def __init__(self, length=32):
+        self.length = max(int(length), 1)
+        # Row i is the ring buffer of the i-th track, entry counts[i] % length is written next
+        self.positions = np.zeros((0, self.length, 2))
+        self.heights = np.zeros((0, self.length))
+        self.timestamps = np.zeros((0, self.length))
+        self.detected = np.zeros((0, self.length), dtype=bool)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add_tracks(self, num_tracks):
+        # Append empty buffers for num_tracks new tracks
+        if num_tracks == 0:
+            return
+        self.positions = np.concatenate([self.positions, np.zeros((num_tracks, self.length, 2))])
+        self.heights = np.concatenate([self.heights, np.zeros((num_tracks, self.length))])
+        self.timestamps = np.concatenate([self.timestamps, np.zeros((num_tracks, self.length))])
+        self.detected = np.concatenate([self.detected, np.zeros((num_tracks, self.length), dtype=bool)])
+        self.counts = np.concatenate([self.counts, np.zeros(num_tracks, dtype=np.int64)])
+
+    def keep(self, mask):
+        # Keep the buffers of the tracks selected by a boolean mask (or an index array)
+        self.positions = self.positions[mask]
+        self.heights = self.heights[mask]
+        self.timestamps = self.timestamps[mask]
+        self.detected = self.detected[mask]
+        self.counts = self.counts[mask]
+
+    def record(self, boxes, timestamp, detected):
+        """
+        Append one entry to the buffer of every track.
+
+        Args:
+            boxes: a float array of shape [N, 4], the normalized (xmin, ymin, xmax, ymax) box of each track
+            timestamp: time of the frame (seconds, or the frame number)
+            detected: a boolean array of shape [N], False for the extrapolated boxes
+        """
+        rows = np.arange(len(self.counts))
+        slots = self.counts % self.length
+        self.positions[rows, slots, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+        self.positions[rows, slots, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+        self.heights[rows, slots] = boxes[:, 3] - boxes[:, 1]
+        self.timestamps[rows, slots] = timestamp
+        self.detected[rows, slots] = detected
+        self.counts += 1
+
+    def chronological(self, rows=None):
+        """
+        Returns the history of the selected tracks (all of them by default) from the oldest to the newest entry.
+
+        Returns:
+            A dictionary of
+            "positions": float array [K, length, 2] of the normalized centroids
+            "heights": float array [K, length] of the normalized box heights
+            "timestamps": float array [K, length]
+            "detected": boolean array [K, length], False for the extrapolated boxes
+            "valid": boolean array [K, length], the tracks with fewer than length entries are padded at the end
+            with invalid entries (NaN positions, heights and timestamps)
+        """
+        if rows is None:
+            rows = np.arange(len(self.counts))
+        counts = self.counts[rows]
+        steps = np.arange(self.length)
+        first = np.maximum(counts - self.length, 0)
+        slots = (first[:, None] + steps[None, :]) % self.length
+        valid = steps[None, :] < np.minimum(counts, self.length)[:, None]
+        positions = np.take_along_axis(self.positions[rows], slots[:, :, None], axis=1)
+        heights = np.take_along_axis(self.heights[rows], slots, axis=1)
+        timestamps = np.take_along_axis(self.timestamps[rows], slots, axis=1)
+        positions[~valid] = np.nan
+        heights[~valid] = np.nan
+        timestamps[~valid] = np.nan
+        return {
+            "positions": positions,
+            "heights": heights,
+            "timestamps": timestamps,
+            "detected": np.take_along_axis(self.detected[rows], slots, axis=1) & valid,
+            "valid": valid,
+        }
@@ -2,21 +2,49 @@
 import sys
 
 import argparse
+from datetime import datetime
 
 from libs.core import Distancing as CvEngine
 from libs.config_engine import ConfigEngine
+from libs.detectors.shared_detector import SharedDetector
 from ui.web_gui import WebGUI as UI
 
 class DistanceApp():
     def __init__(self, args):
         self.config = ConfigEngine(args.config)
-        self.engine = CvEngine(self.config)
-        self.ui = UI(self.config, self.engine)
-        self.engine.set_ui(self.ui)
+        # A single detector is loaded and shared between all of the cameras, except the Replay device
+        # which replays a separate recording for each camera
+        if self.config.get_section_dict('Detector')['Device'] == 'Replay':
+            self.detector = None
+        else:
+            self.detector = SharedDetector(self.config)
+        self.engines = [CvEngine(self.config, self.detector, source) for source in self.config.get_video_sources()]
+        self.ui = UI(self.config, self.engines)
+        for engine in self.engines:
+            engine.set_ui(self.ui)
         self.ui.start()
 
+def run_headless(args):
+    # Imported here so the live mode does not depend on multiprocessing start methods
+    from libs.offline import OfflineAnalyzer
+    start_time = datetime.strptime(args.start_time, '%Y-%m-%d %H:%M:%S') if args.start_time else None
+    analyzer = OfflineAnalyzer(args.config, workers=args.workers, segment_length=args.segment_length,
+                               start_time=start_time)
+    analyzer.run()
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--config', required=True)
+    parser.add_argument('--headless', action='store_true',
+                        help='analyze the recorded videos of the config as fast as possible, without the web ui')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes of the headless mode')
+    parser.add_argument('--segment_length', type=float, default=300,
+                        help='length (seconds) of the video segments processed by the workers in headless mode')
+    parser.add_argument('--start_time', default=None,
+                        help='"YYYY-MM-DD HH:MM:SS" of the first frame, used for the timestamps of the headless logs '
+                             '(defaults to the modification time of the video file minus its duration)')
     args = parser.parse_args()
-    DistanceApp(args)
+    if args.headless:
+        run_headless(args)
+    else:
+        DistanceApp(args)
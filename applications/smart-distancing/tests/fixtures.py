@@ -0,0 +1,206 @@
+"""
+Reference implementations and synthetic inputs shared by the tests and the benchmarks of benchmarks/.
+
+The tests check the optimized engines against the per-item loops they replace on these inputs, and the
+benchmarks time both on the same inputs.
+"""
+import numpy as np
+
+from libs.assignment_tracker import AssignmentTracker
+from libs.core import Distancing
+from libs.detectors.dummy.crowd import SyntheticCrowd
+from libs.distances import center_points_distances, four_corner_points_distances
+from libs.ground_plane import GroundPlane
+from libs.nms import pairwise_iou
+
+
+def person(x, y, width=0.1, height=0.3):
+    # The normalized box of a person whose top left corner is at (x, y)
+    return [x, y, x + width, y + height]
+
+
+# The greedy NMS which the block-wise NMS of libs/nms.py replaces
+def loop_non_max_suppression(boxes, scores, iou_threshold, class_ids=None, order="Score"):
+    # One box at a time: keep the next remaining box and remove the remaining boxes it overlaps
+    if order == "Score":
+        remaining = list(np.argsort(-scores, kind="stable"))
+    else:
+        remaining = list(np.argsort(-boxes[:, 3], kind="stable"))
+    keep = []
+    while remaining:
+        i = remaining.pop(0)
+        keep.append(i)
+        ious = pairwise_iou(boxes[[i]], boxes[remaining])[0] if remaining else []
+        remaining = [j for j, iou in zip(remaining, ious)
+                     if iou <= iou_threshold or (class_ids is not None and class_ids[i] != class_ids[j])]
+    return np.sort(keep)
+
+
+# Crowds of the distance engines (pixel coordinates)
+def random_scene(num_objects, resolution=(640, 480), person_height=(48, 192), seed=0):
+    """
+    Returns a list of objects with "centroidReal" and "bboxReal" keys (pixel coordinates), like the objects
+    that Distancing.calculate_box_distances receives. Box heights are drawn from the person_height range (pixels).
+    """
+    rng = np.random.RandomState(seed)
+    width, height = resolution
+    objects = []
+    for _ in range(num_objects):
+        h = rng.uniform(*person_height)
+        w = h * rng.uniform(0.3, 0.5)
+        cx = rng.uniform(w / 2, width - w / 2)
+        cy = rng.uniform(h / 2, height - h / 2)
+        objects.append({
+            "centroidReal": [cx, cy, w, h],
+            "bboxReal": [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2],
+        })
+    return objects
+
+
+def perspective_scene(num_objects, resolution=(640, 480), person_height=(8, 240), seed=0):
+    """
+    Returns the pixel boxes (xmin, ymin, xmax, ymax) of a crowd seen in perspective: the feet are below 15% of
+    the frame height, and the boxes grow linearly from person_height[0] at the top to person_height[1] at the
+    bottom of the frame.
+    """
+    rng = np.random.RandomState(seed)
+    width, height = resolution
+    feet = rng.uniform(0.15 * height, height, num_objects)
+    heights = person_height[0] + (person_height[1] - person_height[0]) * (feet - 0.15 * height) / (0.85 * height)
+    widths = heights * rng.uniform(0.3, 0.5, num_objects)
+    centers = rng.uniform(0, width, num_objects)
+    return np.stack([centers - widths / 2, feet - heights, centers + widths / 2, feet], axis=1)
+
+
+def loop_distances(nn_out, dist_method):
+    # The per-pair implementation which libs/distances.py replaces
+    distance_of_two_points = Distancing.calculate_distance_of_two_points_of_boxes
+    distances = []
+    for i in range(len(nn_out)):
+        distance_row = []
+        for j in range(len(nn_out)):
+            if i == j:
+                l = 0
+            elif dist_method == 'FourCornerPointsDistance':
+                box_i, h_i = nn_out[i]["bboxReal"], nn_out[i]["centroidReal"][3]
+                box_j, h_j = nn_out[j]["bboxReal"], nn_out[j]["centroidReal"][3]
+                l = min(
+                    distance_of_two_points(None, [box_i[x], box_i[y], h_i], [box_j[x], box_j[y], h_j])
+                    for x, y in ((0, 1), (2, 1), (0, 3), (2, 3))
+                )
+            else:
+                c_i, c_j = nn_out[i]["centroidReal"], nn_out[j]["centroidReal"]
+                l = distance_of_two_points(None, [c_i[0], c_i[1], c_i[3]], [c_j[0], c_j[1], c_j[3]])
+            distance_row.append(l)
+        distances.append(distance_row)
+    return np.asarray(distances, dtype=np.float32)
+
+
+def vectorized_distances(nn_out, dist_method):
+    if dist_method == 'FourCornerPointsDistance':
+        boxes = np.array([obj["bboxReal"] for obj in nn_out])
+        heights = np.array([obj["centroidReal"][3] for obj in nn_out])
+        return four_corner_points_distances(boxes, heights)
+    centroids = np.array([obj["centroidReal"] for obj in nn_out])
+    return center_points_distances(centroids)
+
+
+def synthetic_ground_plane(resolution):
+    # A camera looking down at a 8 x 12 m floor, the far edge of the floor is at the top of the frame
+    width, height = resolution
+    image_points = [[0.3 * width, 0.1 * height], [0.7 * width, 0.1 * height], [width, height], [0, height]]
+    ground_points = [[0, 0], [8, 0], [8, 12], [0, 12]]
+    return GroundPlane(image_points, ground_points, resolution)
+
+
+def tracked_sequence(num_objects, num_frames, resolution=(640, 480), walking_speed=0.0005, seed=0):
+    # (track ids, pixel boxes) of each frame of a tracked synthetic crowd
+    crowd = SyntheticCrowd(num_objects, walking_speed=walking_speed, seed=seed)
+    tracker = AssignmentTracker(max_disappeared=5)
+    scale = np.array([resolution[0], resolution[1], resolution[0], resolution[1]], dtype=np.float64)
+    frames = []
+    for _ in range(num_frames):
+        crowd.step()
+        objects = tracker.update(crowd.detections(1))
+        frames.append((objects.track_ids.copy(), objects.boxes.astype(np.float64) * scale))
+    return frames
+
+
+
+# Raw outputs of the detector backends and the decoding loops of the backends
+def synthetic_ssd_outputs(num_images, num_candidates, num_classes=90, seed=0):
+    # boxes [B, N, 4] (ymin, xmin, ymax, xmax), classes [B, N] and scores [B, N] sorted by score like the SSD outputs
+    rng = np.random.RandomState(seed)
+    corners = rng.uniform(0, 1, (num_images, num_candidates, 2, 2))
+    boxes = np.concatenate([corners.min(axis=2), corners.max(axis=2)], axis=2).astype(np.float32)
+    classes = rng.randint(0, num_classes, (num_images, num_candidates)).astype(np.float32)
+    scores = -np.sort(-rng.beta(0.5, 2, (num_images, num_candidates)), axis=1).astype(np.float32)
+    return boxes, classes, scores
+
+
+def synthetic_detection_output(num_images, num_candidates, num_classes=2, seed=0):
+    # [1, 1, M, 7] rows of the images of the batch, ended by a row whose image_id is -1 and followed by garbage
+    boxes, classes, scores = synthetic_ssd_outputs(num_images, num_candidates, num_classes, seed)
+    image_ids = np.repeat(np.arange(num_images), num_candidates)
+    rows = np.column_stack([
+        image_ids, classes.reshape(-1), scores.reshape(-1), boxes.reshape(-1, 4)[:, [1, 0, 3, 2]],
+    ]).astype(np.float32)
+    end = np.full((1, 7), -1, dtype=np.float32)
+    garbage = np.random.RandomState(seed + 1).uniform(0, 1, (num_candidates, 7)).astype(np.float32)
+    return np.concatenate([rows, end, garbage])[None, None]
+
+
+def synthetic_trt_output(num_candidates, num_classes=3, seed=0):
+    # Flat rows of the TensorRT NMS plugin for one image, padded with rows whose image_id is -1 and score is 0
+    detections = synthetic_detection_output(1, num_candidates, num_classes, seed)[0, 0, :num_candidates]
+    padding = np.zeros((num_candidates // 2, 7), dtype=np.float32)
+    padding[:, 0] = -1
+    return np.concatenate([detections, padding]).reshape(-1)
+
+
+def loop_ssd(boxes, labels, scores, class_id, score_threshold):
+    # The loop of the EdgeTPU and x86 backends
+    results = []
+    for batch_index in range(boxes.shape[0]):
+        result = []
+        for i in range(boxes.shape[1]):  # number of boxes
+            if labels[batch_index, i] == class_id and scores[batch_index, i] > score_threshold:
+                result.append({"id": str(class_id) + '-' + str(i), "bbox": boxes[batch_index, i, :],
+                               "score": scores[batch_index, i]})
+        results.append(result)
+    return results
+
+
+def loop_detection_output(output, num_images, class_id, score_threshold):
+    # The loop of the OpenVINO backend
+    results = [[] for _ in range(num_images)]
+    for i, (image_id, label, score, x_min, y_min, x_max, y_max) in enumerate(output[0][0]):
+        if image_id < 0:
+            break
+        if int(image_id) >= num_images:
+            continue
+        if label == class_id and score > score_threshold:
+            results[int(image_id)].append({"id": str(class_id) + '-' + str(i), "bbox": [y_min, x_min, y_max, x_max],
+                                           "score": score})
+    return results
+
+
+def loop_trt(output, class_id, score_threshold, output_layout=7):
+    # The loop of the Jetson backend (_postprocess_trt), label 0 of the model is the background
+    boxes, confs, clss = [], [], []
+    for prefix in range(0, len(output), output_layout):
+        conf = float(output[prefix + 2])
+        if conf < float(score_threshold):
+            continue
+        x1 = output[prefix + 3]
+        y1 = output[prefix + 4]
+        x2 = output[prefix + 5]
+        y2 = output[prefix + 6]
+        boxes.append((y1, x1, y2, x2))
+        confs.append(conf)
+        clss.append(int(output[prefix + 1]))
+    result = []
+    for i in range(len(boxes)):
+        if clss[i] == class_id + 1:
+            result.append({"id": str(clss[i] - 1) + '-' + str(i), "bbox": boxes[i], "score": confs[i]})
+    return [result]
@@ -0,0 +1,104 @@
+"""
+Tracks of the assignment tracker (ids, prediction, removal, class gate), and equivalence of its gate on the
+spatial-hash grids with the gate of all of the pairs.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from libs import assignment_tracker
+from libs.assignment_tracker import AssignmentTracker
+from libs.detections import DetectionBatch
+from tests.fixtures import person, perspective_scene, random_scene
+
+RESOLUTION = np.array([640, 480, 640, 480], dtype=np.float64)
+SETTINGS = (("IoU", {}), ("IoU", {"min_iou": 0.3}), ("Centroid", {}), ("Centroid", {"max_distance": 0.5}))
+
+
+def scenes(size):
+    spread = np.array([obj["bboxReal"] for obj in random_scene(size, (2560, 1920), seed=size)]) / (RESOLUTION * 4)
+    return {"spread": spread, "perspective": perspective_scene(size, seed=size) / RESOLUTION}
+
+
+class TracksTest(unittest.TestCase):
+
+    def closest_id(self, tracked, box):
+        return tracked.track_ids[np.argmin(np.abs(tracked.boxes - box).sum(axis=1))]
+
+    def test_ids_are_kept_through_a_crossing_and_a_missed_frame(self):
+        for cost in ("IoU", "Centroid"):
+            with self.subTest(cost=cost):
+                tracker = AssignmentTracker(max_disappeared=2, cost=cost)
+                ids = None
+                for frame in range(15):
+                    # Two people walk towards each other and cross between the 5th and the 6th frame: without the
+                    # prediction each track would be closer to the other person. The first one is missed in the
+                    # 5th frame
+                    first, second = person(0.1 + 0.06 * frame, 0.3), person(0.76 - 0.06 * frame, 0.32)
+                    boxes = [second] if frame == 5 else [first, second] if frame % 2 else [second, first]
+                    tracked = tracker.update(DetectionBatch.from_arrays(boxes))
+                    self.assertEqual(len(tracked), 2)
+                    frame_ids = (self.closest_id(tracked, first), self.closest_id(tracked, second))
+                    if ids is None:
+                        ids = frame_ids
+                    self.assertEqual(frame_ids, ids)
+                self.assertNotEqual(ids[0], ids[1])
+
+    def test_predict_moves_the_boxes_by_their_velocity(self):
+        tracker = AssignmentTracker()
+        tracker.update(DetectionBatch.from_arrays([person(0.2, 0.3)]))
+        tracker.update(DetectionBatch.from_arrays([person(0.22, 0.31)]))
+        np.testing.assert_allclose(tracker.predict().boxes, [person(0.24, 0.32)], atol=1e-6)
+        np.testing.assert_allclose(tracker.predict().boxes, [person(0.26, 0.33)], atol=1e-6)
+
+    def test_tracks_are_removed_after_max_disappeared_frames(self):
+        tracker = AssignmentTracker(max_disappeared=2)
+        tracker.update(DetectionBatch.from_arrays([person(0.2, 0.3)]))
+        for _ in range(2):
+            self.assertEqual(len(tracker.update(DetectionBatch())), 1)
+        self.assertEqual(len(tracker.update(DetectionBatch())), 0)
+        # The id of a removed track is not reused
+        self.assertEqual(tracker.update(DetectionBatch.from_arrays([person(0.2, 0.3)])).track_ids.tolist(), [1])
+
+    def test_detections_only_match_tracks_of_their_class(self):
+        for cost in ("IoU", "Centroid"):
+            with self.subTest(cost=cost):
+                tracker = AssignmentTracker(cost=cost)
+                box = person(0.2, 0.3)
+                tracker.update(DetectionBatch.from_arrays([box], class_ids=[0]))
+                tracked = tracker.update(DetectionBatch.from_arrays([box], class_ids=[1]))
+                self.assertEqual(tracked.track_ids.tolist(), [0, 1])
+                self.assertEqual(tracked.class_ids.tolist(), [0, 1])
+                self.assertEqual(tracker.tracks["disappeared"].tolist(), [1, 0])
+                tracked = tracker.update(DetectionBatch.from_arrays([box, box], class_ids=[1, 0]))
+                self.assertEqual(tracked.track_ids.tolist(), [0, 1])
+                self.assertEqual(tracker.tracks["disappeared"].tolist(), [0, 0])
+
+
+class CandidatePairsTest(unittest.TestCase):
+
+    def test_grids_match_the_dense_gate(self):
+        rng = np.random.RandomState(0)
+        for cost, kwargs in SETTINGS:
+            for size in (10, 200, 1000):
+                for name, boxes in scenes(size).items():
+                    with self.subTest(cost=cost, kwargs=kwargs, size=size, scene=name):
+                        tracker = AssignmentTracker(cost=cost, **kwargs)
+                        tracker.update(DetectionBatch.from_arrays(boxes))
+                        # The people moved a little since the last frame
+                        moved = boxes + rng.normal(0, 0.005, (len(boxes), 1)) * np.array([1, 0, 1, 0])
+                        with mock.patch.object(assignment_tracker, "GRID_PAIRS", np.inf):
+                            dense = tracker._candidate_pairs(moved)
+                        with mock.patch.object(assignment_tracker, "GRID_PAIRS", 0):
+                            grid = tracker._candidate_pairs(moved)
+                        self.assertGreater(len(dense[0]), 0)
+                        np.testing.assert_array_equal(grid[0], dense[0])
+                        np.testing.assert_array_equal(grid[1], dense[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Adaptive detection stride (libs/detection_stride.py) for simulated motions and inference times.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import numpy as np
+
+from libs.detection_stride import DetectionStrideController
+
+
+class StrideConfig:
+    # The subset of ConfigEngine that DetectionStrideController reads
+    def __init__(self, min_stride, max_stride, latency_budget=100, motion_tolerance=0.25):
+        self.detector = {
+            "MinDetectionStride": str(min_stride),
+            "MaxDetectionStride": str(max_stride),
+            "LatencyBudget": str(latency_budget),
+            "MotionTolerance": str(motion_tolerance),
+        }
+
+    def get_section_dict(self, section):
+        return self.detector
+
+
+class DetectionStrideTest(unittest.TestCase):
+
+    def test_stride_stays_within_its_bounds(self):
+        rng = np.random.RandomState(0)
+        controller = DetectionStrideController(StrideConfig(2, 5))
+        self.assertEqual(controller.stride, 2)
+        for _ in range(500):
+            controller.update_inference_time(rng.choice([0.001, 0.1, 2.0]))
+            controller.update_motion(rng.choice([0, 1e-4, 0.05, 10], rng.randint(0, 20)))
+            controller.set_stride_floor(rng.randint(-3, 10))
+            self.assertTrue(2 <= controller.stride <= 5)
+            self.assertTrue(2 <= controller.stride_floor <= 5)
+
+    def test_stride_rises_when_the_inference_is_over_budget(self):
+        controller = DetectionStrideController(StrideConfig(1, 6, latency_budget=100))
+        # People move fast enough that the motion alone keeps the detector on every frame
+        fast = np.full(10, 0.3)
+        for _ in range(50):
+            controller.update_inference_time(0.05)
+            controller.update_motion(fast)
+        self.assertEqual(controller.stride, 1)
+        strides = []
+        for _ in range(100):
+            controller.update_inference_time(0.25)
+            controller.update_motion(fast)
+            strides.append(controller.stride)
+        # The moving average of the inference time approaches 250 ms, 3 frames of the 100 ms budget
+        self.assertEqual(strides, sorted(strides))
+        self.assertEqual(strides[-1], 3)
+        # Back under budget
+        for _ in range(100):
+            controller.update_inference_time(0.05)
+            controller.update_motion(fast)
+        self.assertEqual(controller.stride, 1)
+
+    def test_stride_follows_the_motion(self):
+        controller = DetectionStrideController(StrideConfig(1, 8, motion_tolerance=0.25))
+        controller.update_motion(np.full(10, 0.05))
+        self.assertEqual(controller.stride, 5)
+        controller.update_motion(np.zeros(10))
+        self.assertEqual(controller.stride, 8)
+        controller.update_motion(np.full(10, 1.0))
+        self.assertEqual(controller.stride, 1)
+
+    def test_detected_frames_follow_the_stride(self):
+        controller = DetectionStrideController(StrideConfig(3, 3))
+        detected = [controller.should_detect() for _ in range(9)]
+        self.assertEqual(detected, [True, False, False] * 3)
+        self.assertAlmostEqual(controller.skipped_fraction(), 2 / 3)
+        # A fixed stride does not adapt
+        controller.update_inference_time(10)
+        controller.update_motion(np.full(10, 1.0))
+        self.assertEqual(controller.stride, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
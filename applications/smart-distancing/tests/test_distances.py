@@ -0,0 +1,122 @@
+"""
+Equivalence of the vectorized distance engines with the implementations they replace.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import cv2 as cv
+import numpy as np
+
+from libs.distances import center_points_distances, ground_distances
+from libs.incremental_distances import IncrementalDistances
+from libs.spatial_hash import candidate_pairs, find_violating_pairs, find_violating_points
+from tests.fixtures import (loop_distances, perspective_scene, random_scene, synthetic_ground_plane, tracked_sequence,
+                            vectorized_distances)
+from tools.objects_post_process import extract_violating_objects
+
+SIZES = (10, 20, 50, 100, 200, 500)
+DIST_METHODS = ('CenterPointsDistance', 'FourCornerPointsDistance')
+DIST_THRESHOLD = 150
+
+
+class DistanceMatrixTest(unittest.TestCase):
+
+    def test_matches_the_per_pair_loop(self):
+        for dist_method in DIST_METHODS:
+            for size in SIZES:
+                with self.subTest(dist_method=dist_method, size=size):
+                    objects = random_scene(size, seed=size)
+                    np.testing.assert_allclose(
+                        vectorized_distances(objects, dist_method), loop_distances(objects, dist_method),
+                        rtol=1e-5, atol=1e-3,
+                    )
+
+    def test_single_and_empty_scene(self):
+        for dist_method in DIST_METHODS:
+            self.assertEqual(vectorized_distances(random_scene(1), dist_method).shape, (1, 1))
+            self.assertEqual(vectorized_distances([], dist_method).shape, (0, 0))
+
+
+class SpatialHashTest(unittest.TestCase):
+
+    def test_matches_the_thresholded_matrix(self):
+        for dist_method in DIST_METHODS:
+            for size in SIZES:
+                with self.subTest(dist_method=dist_method, size=size):
+                    scale = max(np.sqrt(size / 20.0), 1)
+                    objects = random_scene(size, (int(640 * scale), int(480 * scale)), seed=size)
+                    boxes = np.array([obj["bboxReal"] for obj in objects])
+                    expected = extract_violating_objects(vectorized_distances(objects, dist_method), DIST_THRESHOLD)
+                    np.testing.assert_array_equal(
+                        find_violating_pairs(boxes, DIST_THRESHOLD, dist_method).pairs, expected
+                    )
+
+    def test_perspective_scene_matches_the_thresholded_matrix(self):
+        for dist_method in DIST_METHODS:
+            for size in (10, 100, 500, 2000):
+                with self.subTest(dist_method=dist_method, size=size):
+                    boxes = perspective_scene(size, seed=size)
+                    objects = [{"bboxReal": box, "centroidReal": [(box[0] + box[2]) / 2, (box[1] + box[3]) / 2,
+                                                                   box[2] - box[0], box[3] - box[1]]} for box in boxes]
+                    expected = extract_violating_objects(vectorized_distances(objects, dist_method), DIST_THRESHOLD)
+                    np.testing.assert_array_equal(
+                        find_violating_pairs(boxes, DIST_THRESHOLD, dist_method).pairs, expected
+                    )
+
+    def test_tall_boxes_do_not_widen_the_search(self):
+        # A few tall people close to the camera must not make the grid examine most of the pairs
+        boxes = perspective_scene(2000)
+        examined = len(candidate_pairs(boxes, DIST_THRESHOLD))
+        violating = len(find_violating_pairs(boxes, DIST_THRESHOLD).pairs)
+        self.assertLess(examined, 4 * violating)
+        self.assertLess(examined, 0.5 * len(boxes) * (len(boxes) - 1) / 2)
+        # The far people alone are searched as efficiently
+        short = boxes[boxes[:, 3] - boxes[:, 1] < 40]
+        self.assertLess(len(candidate_pairs(short, DIST_THRESHOLD)),
+                        4 * len(find_violating_pairs(short, DIST_THRESHOLD).pairs))
+
+    def test_ground_plane_matches_the_thresholded_matrix(self):
+        resolution = (640, 480)
+        ground_plane = synthetic_ground_plane(resolution)
+        for size in SIZES:
+            with self.subTest(size=size):
+                boxes = np.array([obj["bboxReal"] for obj in random_scene(size, resolution, seed=size)])
+                points = ground_plane.ground_positions(boxes) * 100
+                np.testing.assert_array_equal(
+                    find_violating_points(points, DIST_THRESHOLD).pairs,
+                    extract_violating_objects(ground_distances(points), DIST_THRESHOLD),
+                )
+
+
+class GroundPlaneTest(unittest.TestCase):
+
+    def test_lookup_table_matches_the_homography(self):
+        resolution = (640, 480)
+        ground_plane = synthetic_ground_plane(resolution)
+        boxes = np.array([obj["bboxReal"] for obj in random_scene(200, resolution)])
+        feet = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
+        # The feet are rounded to the pixel grid of the lookup table
+        points = np.clip(np.rint(feet), 0, [resolution[0] - 1, resolution[1] - 1])
+        projected = cv.perspectiveTransform(points[None].astype(np.float64), ground_plane.homography)[0]
+        np.testing.assert_allclose(ground_plane.ground_positions(boxes), projected, rtol=1e-4, atol=1e-3)
+
+
+class IncrementalDistancesTest(unittest.TestCase):
+
+    def test_zero_tolerance_matches_the_full_matrix(self):
+        for size in (10, 50, 200):
+            with self.subTest(size=size):
+                engine = IncrementalDistances(DIST_THRESHOLD, tolerance=0)
+                for track_ids, boxes in tracked_sequence(size, 30, seed=size):
+                    centroids = np.stack([
+                        (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                        boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1],
+                    ], axis=1)
+                    expected = extract_violating_objects(center_points_distances(centroids), DIST_THRESHOLD)
+                    np.testing.assert_array_equal(engine.update(track_ids, boxes).pairs, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Mapping of the detections of the tiles and of the region of interest (libs/inference_regions.py) to the frame,
+and their cross-tile merge.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import numpy as np
+
+from libs.detections import DetectionBatch
+from libs.inference_regions import InferenceRegions, cross_region_suppression
+
+RESOLUTION = (640, 480)
+# A triangle whose apex is at the top of the frame, its bounding rectangle is the whole frame
+TRIANGLE = [(0, 479), (639, 479), (320, 0)]
+
+
+def to_region(rect, boxes):
+    # Normalize frame boxes to a region, as the detector returns them
+    size = np.array([rect[2] - rect[0], rect[3] - rect[1]] * 2)
+    return (np.asarray(boxes, dtype=np.float64).reshape(-1, 4) - rect[[0, 1, 0, 1]]) / size
+
+
+class InferenceRegionsTest(unittest.TestCase):
+
+    def test_tile_boxes_are_mapped_to_the_frame(self):
+        regions = InferenceRegions(RESOLUTION, tiles=(2, 2), overlap=0.2)
+        self.assertEqual(len(regions), 5)
+        np.testing.assert_allclose(regions.rects[0], [0, 0, 1 / 1.8, 1 / 1.8])
+        np.testing.assert_allclose(regions.rects[3], [0.8 / 1.8, 0.8 / 1.8, 1, 1])
+        np.testing.assert_allclose(regions.rects[4], [0, 0, 1, 1])
+        # The crops are the regions of the frame at its full resolution
+        image = np.arange(960 * 1280).reshape(960, 1280)
+        crops = regions.crops(image)
+        self.assertEqual(crops[3].shape, (960 - 427, 1280 - 569))
+        self.assertEqual(crops[3][0, 0], image[427, 569])
+        box = [0.7, 0.6, 0.8, 0.9]
+        outputs = [DetectionBatch() for _ in range(len(regions))]
+        outputs[3] = DetectionBatch.from_arrays(to_region(regions.rects[3], box))
+        np.testing.assert_allclose(regions.merge(outputs).boxes, [box], atol=1e-6)
+
+    def test_roi_boxes_are_mapped_to_the_frame(self):
+        regions = InferenceRegions(RESOLUTION, [(100, 100), (299, 100), (299, 399), (100, 399)])
+        self.assertEqual(len(regions), 1)
+        np.testing.assert_allclose(regions.rects[0], [100 / 640, 100 / 480, 300 / 640, 400 / 480])
+        output = DetectionBatch.from_arrays([[0.25, 0.5, 0.75, 0.9]])
+        np.testing.assert_allclose(regions.merge([output]).boxes,
+                                   [[150 / 640, 250 / 480, 250 / 640, 370 / 480]], atol=1e-6)
+
+    def test_boxes_with_the_feet_outside_of_the_roi_are_dropped(self):
+        regions = InferenceRegions(RESOLUTION, TRIANGLE)
+        inside = [300 / 640, 250 / 480, 340 / 640, 400 / 480]
+        # In the top left corner of the bounding rectangle, outside of the triangle
+        outside = [30 / 640, 20 / 480, 70 / 640, 100 / 480]
+        # The head is outside of the triangle, the feet are inside
+        tall = [440 / 640, 10 / 480, 480 / 640, 470 / 480]
+        self.assertEqual(regions.inside([inside, outside, tall]).tolist(), [True, False, True])
+        merged = regions.merge([DetectionBatch.from_arrays([inside, outside, tall], scores=[0.9, 0.8, 0.7])])
+        np.testing.assert_allclose(merged.boxes, [inside, tall], atol=1e-6)
+        np.testing.assert_allclose(merged.scores, [0.9, 0.7])
+
+    def test_box_split_across_two_tiles_is_merged(self):
+        regions = InferenceRegions(RESOLUTION, tiles=(2, 1), overlap=0.2, full_region=False)
+        left, right = regions.rects
+        # A person on the border of the tiles is cut by the edge of each tile
+        person = np.array([0.4, 0.2, 0.6, 0.8])
+        left_part = [person[0], person[1], left[2], person[3]]
+        right_part = [right[0], person[1], person[2], person[3]]
+        merged = regions.merge([
+            DetectionBatch.from_arrays(to_region(left, left_part), scores=[0.9]),
+            DetectionBatch.from_arrays(to_region(right, right_part), scores=[0.8]),
+        ])
+        np.testing.assert_allclose(merged.boxes, [left_part], atol=1e-6)
+        np.testing.assert_allclose(merged.scores, [0.9])
+
+    def test_boxes_of_the_same_tile_are_not_suppressed(self):
+        regions = InferenceRegions(RESOLUTION, tiles=(2, 1), overlap=0.2, full_region=False)
+        # Two people of the same tile, one mostly hidden behind the other
+        boxes = [[0.1, 0.2, 0.3, 0.8], [0.12, 0.25, 0.28, 0.75]]
+        merged = regions.merge([
+            DetectionBatch.from_arrays(to_region(regions.rects[0], boxes), scores=[0.9, 0.8]), DetectionBatch(),
+        ])
+        np.testing.assert_allclose(merged.boxes, boxes, atol=1e-6)
+
+    def test_cross_region_suppression(self):
+        boxes = [[0.1, 0.1, 0.3, 0.5], [0.1, 0.1, 0.3, 0.5], [0.1, 0.1, 0.3, 0.5], [0.6, 0.1, 0.8, 0.5]]
+        # The first box is suppressed by the more confident second one. The third one is in the region of the
+        # second one, and the suppressed first box does not suppress it
+        kept = cross_region_suppression(boxes, [0.9, 0.95, 0.8, 0.7], [0, 1, 1, 0], 0.6)
+        self.assertEqual(kept.tolist(), [1, 2, 3])
+        self.assertEqual(cross_region_suppression([], [], [], 0.6).tolist(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
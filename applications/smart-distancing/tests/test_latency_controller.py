@@ -0,0 +1,142 @@
+"""
+Adjustments of the latency controller (libs/latency_controller.py) for synthetic latencies.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+from libs.latency_controller import LatencyController
+
+INTERVAL = 2
+TARGET = 0.1  # Seconds
+
+
+class ControllerConfig:
+    # The subset of ConfigEngine that LatencyController reads
+    def __init__(self, resolution="640,480", min_resolution="320,240", target_ms=TARGET * 1000):
+        self.sections = {
+            "App": {
+                "Resolution": resolution,
+                "MinResolution": min_resolution,
+                "TargetLatency": str(target_ms),
+                "LatencyControlInterval": str(INTERVAL),
+                "LatencyHysteresis": "0.2",
+                "JpegQuality": "95",
+                "MinJpegQuality": "50",
+            },
+            "Detector": {"MinDetectionStride": "1", "MaxDetectionStride": "3"},
+        }
+
+    def get_section_dict(self, section):
+        return self.sections[section]
+
+
+class LatencyControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = LatencyController(ControllerConfig())
+        self.now = 0.0
+        self.dropped = 0
+
+    def window(self, latency, dropped=0, queue_depth=0):
+        # Feed a window of frames with the same latency, returns the knob adjusted at its end. The dropped frames
+        # are counted by the last frame of the window
+        knobs = []
+        for i in range(5):
+            if i == 4:
+                self.dropped += dropped
+            knobs.append(self.controller.update(latency, queue_depth, self.dropped, self.now + 0.5 * i))
+        self.now += INTERVAL
+        self.assertEqual(knobs[:-1], [None] * 4)
+        return knobs[-1]
+
+    def test_knobs_are_degraded_in_order_until_their_bounds(self):
+        self.assertEqual(self.controller.steps["resolution"],
+                         [(640, 480), (512, 384), (410, 308), (328, 246), (320, 240)])
+        self.assertEqual(self.controller.steps["jpeg_quality"], [95, 85, 75, 65, 55, 50])
+        knobs = [self.window(2 * TARGET) for _ in range(14)]
+        self.assertEqual(knobs, ["detection_stride"] * 2 + ["resolution"] * 4 + ["jpeg_quality"] * 5 + [None] * 3)
+        self.assertEqual((self.controller.detection_stride, self.controller.resolution,
+                          self.controller.jpeg_quality), (3, (320, 240), 50))
+        self.assertEqual(self.controller.adjustments, 11)
+
+    def test_dropped_frames_degrade_a_knob_on_target(self):
+        self.assertEqual(self.window(TARGET, dropped=3), "detection_stride")
+        self.assertIsNone(self.window(TARGET))
+
+    def test_hysteresis(self):
+        # Within 20% of the target nothing changes
+        for latency in (1.19 * TARGET, 0.81 * TARGET):
+            self.assertIsNone(self.window(latency))
+        self.assertEqual(self.window(1.21 * TARGET), "detection_stride")
+        self.assertIsNone(self.window(0.85 * TARGET))
+        # Below the target but with frames waiting in the queues
+        self.assertIsNone(self.window(0.5 * TARGET, queue_depth=2))
+        self.assertEqual(self.window(0.5 * TARGET), "detection_stride")
+        self.assertEqual(self.controller.detection_stride, 1)
+
+    def test_knobs_are_restored_in_the_reverse_order(self):
+        for _ in range(3):
+            self.window(2 * TARGET)
+        self.assertEqual((self.controller.detection_stride, self.controller.resolution), (3, (512, 384)))
+        knobs = [self.window(0.5 * TARGET) for _ in range(4)]
+        self.assertEqual(knobs, ["resolution", "detection_stride", "detection_stride", None])
+        self.assertEqual(self.controller.levels, {knob: 0 for knob in LatencyController.KNOBS})
+
+    def test_restore_backoff_doubles_and_halves(self):
+        expected = []
+        restore_windows = 1
+        self.assertEqual(self.window(2 * TARGET), "detection_stride")
+        for _ in range(6):
+            # Count the calm windows until the stride is restored, then overload the pipeline again
+            calm = 1
+            while self.window(0.5 * TARGET) is None:
+                calm += 1
+            expected.append(restore_windows)
+            self.assertEqual(calm, restore_windows)
+            self.assertEqual(self.window(2 * TARGET), "detection_stride")
+            restore_windows = min(restore_windows * 2, LatencyController.MAX_RESTORE_WINDOWS)
+        self.assertEqual(expected, [1, 2, 4, 8, 16, 32])
+        # Bounded by MAX_RESTORE_WINDOWS
+        knobs = [self.window(0.5 * TARGET) for _ in range(32)]
+        self.assertEqual(knobs, [None] * 31 + ["detection_stride"])
+        # A restore which holds halves the number of calm windows of the next one
+        self.assertIsNone(self.window(0.9 * TARGET))
+        self.assertEqual(self.window(2 * TARGET), "detection_stride")
+        calm = 1
+        while self.window(0.5 * TARGET) is None:
+            calm += 1
+        self.assertEqual(calm, 16)
+
+    def test_disabled(self):
+        self.assertTrue(self.controller.enabled)
+        self.assertFalse(LatencyController(ControllerConfig(target_ms=0)).enabled)
+
+
+class ResolutionStepsTest(unittest.TestCase):
+
+    def steps(self, resolution, min_resolution):
+        return LatencyController(ControllerConfig(resolution, min_resolution)).steps["resolution"]
+
+    def test_min_resolution_equal_to_the_resolution(self):
+        self.assertEqual(self.steps("640,480", "640,480"), [(640, 480)])
+        # An empty or larger minimum is the resolution
+        self.assertEqual(self.steps("640,480", ""), [(640, 480)])
+        self.assertEqual(self.steps("640,480", "800,600"), [(640, 480)])
+
+    def test_odd_sizes(self):
+        self.assertEqual(self.steps("640,480", "333,251"),
+                         [(640, 480), (512, 384), (410, 308), (333, 251)])
+        steps = self.steps("641,481", "101,77")
+        self.assertEqual(steps[0], (641, 481))
+        self.assertEqual(steps[-1], (101, 77))
+        for width, height in steps[1:-1]:
+            self.assertEqual((width % 2, height % 2), (0, 0))
+        for (width, height), (next_width, next_height) in zip(steps, steps[1:]):
+            self.assertTrue(next_width <= width and next_height <= height)
+            self.assertNotEqual((width, height), (next_width, next_height))
+
+
+if __name__ == '__main__':
+    unittest.main()
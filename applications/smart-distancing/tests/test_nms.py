@@ -0,0 +1,40 @@
+"""
+Equivalence of the block-wise greedy NMS of libs/nms.py with the plain greedy loop.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import numpy as np
+
+from libs.nms import non_max_suppression
+from tests.fixtures import loop_non_max_suppression
+
+
+class NonMaxSuppressionTest(unittest.TestCase):
+
+    def test_matches_the_greedy_loop(self):
+        rng = np.random.RandomState(0)
+        for size in (1, 10, 100, 600):
+            corners = rng.uniform(0, 0.9, (size, 2))
+            boxes = np.concatenate([corners, corners + rng.uniform(0.01, 0.1, (size, 2))], axis=1)
+            boxes = boxes.astype(np.float32)
+            scores = rng.uniform(size=size).astype(np.float32)
+            class_ids = rng.randint(0, 3, size)
+            for order in ("Score", "Bottom"):
+                for aware in (False, True):
+                    for block_size in (7, 256):
+                        with self.subTest(size=size, order=order, class_aware=aware, block_size=block_size):
+                            classes = class_ids if aware else None
+                            np.testing.assert_array_equal(
+                                non_max_suppression(boxes, scores, 0.3, classes, order, block_size),
+                                loop_non_max_suppression(boxes, scores, 0.3, classes, order),
+                            )
+
+    def test_empty_frame(self):
+        self.assertEqual(len(non_max_suppression(np.empty((0, 4)))), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Equivalence of the vectorized output decoder (libs/detectors/utils/output_decoder.py) with the per-candidate loops
+of the backends it replaces.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import numpy as np
+
+from libs.detections import DetectionBatch
+from libs.detectors.utils.output_decoder import OutputDecoder
+from tests.fixtures import (loop_detection_output, loop_ssd, loop_trt, synthetic_detection_output,
+                            synthetic_ssd_outputs, synthetic_trt_output)
+
+CANDIDATES = (1, 10, 100, 1000)
+CLASS_ID = 1
+MIN_SCORE = 0.25
+
+
+class OutputDecoderTest(unittest.TestCase):
+
+    def assert_same_detections(self, loop_results, batches):
+        # The loops output (ymin, xmin, ymax, xmax) dictionaries, the decoder DetectionBatch instances
+        self.assertEqual(len(loop_results), len(batches))
+        for objects, batch in zip(loop_results, batches):
+            expected = DetectionBatch.from_detector_output(objects)
+            np.testing.assert_array_equal(batch.boxes, expected.boxes)
+            np.testing.assert_array_equal(batch.scores, expected.scores)
+            np.testing.assert_array_equal(batch.class_ids, expected.class_ids)
+
+    def test_ssd_matches_the_loop(self):
+        decoder = OutputDecoder(CLASS_ID, MIN_SCORE, layout="SSD")
+        for num_images in (1, 3):
+            for size in CANDIDATES:
+                with self.subTest(num_images=num_images, candidates=size):
+                    boxes, classes, scores = synthetic_ssd_outputs(num_images, size, num_classes=3, seed=size)
+                    self.assert_same_detections(
+                        loop_ssd(boxes, classes, scores, CLASS_ID, MIN_SCORE),
+                        decoder.decode_ssd(boxes, classes, scores),
+                    )
+
+    def test_ssd_of_one_image_without_the_batch_axis(self):
+        decoder = OutputDecoder(CLASS_ID, MIN_SCORE, layout="SSD")
+        boxes, classes, scores = synthetic_ssd_outputs(1, 100, num_classes=3)
+        self.assert_same_detections(
+            loop_ssd(boxes, classes, scores, CLASS_ID, MIN_SCORE), decoder.decode_ssd(boxes[0], classes[0], scores[0])
+        )
+
+    def test_detection_output_matches_the_loop(self):
+        # The rows after the image_id -1 row and the rows of the padding images of the batch are ignored
+        decoder = OutputDecoder(CLASS_ID, MIN_SCORE, layout="DetectionOutput")
+        for num_images, padded_images in ((1, 1), (2, 4)):
+            for size in CANDIDATES:
+                with self.subTest(num_images=num_images, padded_images=padded_images, candidates=size):
+                    output = synthetic_detection_output(padded_images, size, seed=size)
+                    self.assert_same_detections(
+                        loop_detection_output(output, num_images, CLASS_ID, MIN_SCORE),
+                        decoder.decode_detection_output(output, num_images),
+                    )
+
+    def test_tensorrt_output_matches_the_loop(self):
+        # Label 0 of the TensorRT models is the background, so the labels are offset by one
+        decoder = OutputDecoder(CLASS_ID, MIN_SCORE, layout="DetectionOutput", label_offset=1)
+        for size in CANDIDATES:
+            with self.subTest(candidates=size):
+                output = synthetic_trt_output(size, seed=size)
+                self.assert_same_detections(
+                    loop_trt(output, CLASS_ID, MIN_SCORE), decoder.decode_detection_output(output)
+                )
+
+    def test_class_and_score_filter(self):
+        # Only the boxes of ClassID scored above MinScore are kept, a score equal to MinScore is removed
+        decoder = OutputDecoder(CLASS_ID, MIN_SCORE, layout="SSD")
+        boxes = np.tile([[0.1, 0.2, 0.5, 0.6]], (4, 1)).astype(np.float32)
+        classes = np.array([CLASS_ID, CLASS_ID + 1, CLASS_ID, CLASS_ID], dtype=np.float32)
+        scores = np.array([0.9, 0.9, MIN_SCORE, 0.3], dtype=np.float32)
+        batch = decoder.decode_ssd(boxes[None], classes[None], scores[None])[0]
+        np.testing.assert_array_equal(batch.scores, np.array([0.9, 0.3], dtype=np.float32))
+        np.testing.assert_array_equal(batch.class_ids, [CLASS_ID, CLASS_ID])
+
+    def test_coordinates_are_normalized_xyxy(self):
+        # (ymin, xmin, ymax, xmax) of the SSD layout and (xmin, ymin, xmax, ymax) of the DetectionOutput layout
+        # both give normalized (xmin, ymin, xmax, ymax) boxes, clipped to the image
+        ssd = OutputDecoder(CLASS_ID, MIN_SCORE, layout="SSD").decode_ssd(
+            np.array([[[0.1, 0.2, 0.5, 0.6], [-0.1, 0.9, 0.4, 1.2]]]), np.array([[CLASS_ID, CLASS_ID]]),
+            np.array([[0.9, 0.8]]),
+        )[0]
+        np.testing.assert_allclose(ssd.boxes, [[0.2, 0.1, 0.6, 0.5], [0.9, 0, 1, 0.4]])
+        rows = np.array([
+            [0, CLASS_ID, 0.9, 0.2, 0.1, 0.6, 0.5],
+            [0, CLASS_ID, 0.8, 0.9, -0.1, 1.2, 0.4],
+            [-1, 0, 0, 0, 0, 0, 0],
+        ])
+        detection_output = OutputDecoder(CLASS_ID, MIN_SCORE, layout="DetectionOutput").decode_detection_output(rows)
+        np.testing.assert_allclose(detection_output[0].boxes, ssd.boxes)
+
+    def test_unknown_layout(self):
+        with self.assertRaises(ValueError):
+            OutputDecoder(CLASS_ID, MIN_SCORE, layout="YOLO")
+
+
+if __name__ == '__main__':
+    unittest.main()
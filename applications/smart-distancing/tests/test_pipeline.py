@@ -0,0 +1,144 @@
+"""
+Drop policies of the queues of the threaded pipeline (libs/pipeline.py) and the shutdown of its stages.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import itertools
+import threading
+import time
+import unittest
+
+from libs.pipeline import FrameQueue, Pipeline
+
+# Seconds to wait for a thread before the test fails instead of hanging
+TIMEOUT = 10
+
+
+def run_in_thread(func):
+    # Start func on a daemon thread, so a thread which hangs does not keep the test process alive
+    thread = threading.Thread(target=func, daemon=True)
+    thread.start()
+    return thread
+
+
+class FrameQueueTest(unittest.TestCase):
+
+    def join_thread(self, thread):
+        thread.join(TIMEOUT)
+        self.assertFalse(thread.is_alive())
+
+    def test_drop_oldest_keeps_the_newest_items_in_order(self):
+        frame_queue = FrameQueue(maxsize=2, drop_oldest=True)
+        for item in range(5):
+            self.assertTrue(frame_queue.put(item))
+        self.assertEqual(frame_queue.dropped, 3)
+        self.assertEqual(frame_queue.qsize(), 2)
+        frame_queue.close()
+        self.assertEqual([frame_queue.get(), frame_queue.get(), frame_queue.get()], [3, 4, None])
+
+    def test_block_delivers_every_item(self):
+        frame_queue = FrameQueue(maxsize=2, drop_oldest=False)
+        received = []
+
+        def consume():
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+                received.append(item)
+                time.sleep(0.0005)
+
+        consumer = run_in_thread(consume)
+        for item in range(200):
+            self.assertTrue(frame_queue.put(item))
+            self.assertLessEqual(frame_queue.qsize(), 2)
+        frame_queue.close()
+        self.join_thread(consumer)
+        self.assertEqual(received, list(range(200)))
+        self.assertEqual(frame_queue.dropped, 0)
+
+    def test_close_releases_a_blocked_producer(self):
+        frame_queue = FrameQueue(maxsize=1, drop_oldest=False)
+        frame_queue.put(0)
+        results = []
+        producer = run_in_thread(lambda: results.append(frame_queue.put(1)))
+        time.sleep(0.05)
+        frame_queue.close(discard=True)
+        self.join_thread(producer)
+        self.assertEqual(results, [False])
+        self.assertIsNone(frame_queue.get())
+
+
+class PipelineTest(unittest.TestCase):
+
+    def run_pipeline(self, pipeline):
+        # Run the pipeline on a thread and check that it and every stage thread end
+        errors = []
+
+        def run():
+            try:
+                pipeline.run()
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = run_in_thread(run)
+        thread.join(TIMEOUT)
+        self.assertFalse(thread.is_alive())
+        for stage in pipeline.stages:
+            self.assertFalse(stage.is_alive())
+        return errors
+
+    def test_block_processes_every_frame(self):
+        outputs = []
+
+        def slow_render(item):
+            time.sleep(0.0005)
+            outputs.append(item)
+
+        pipeline = Pipeline(range(300), [("double", lambda item: 2 * item), ("render", slow_render)],
+                            queue_size=2, drop_oldest=False)
+        self.assertEqual(self.run_pipeline(pipeline), [])
+        self.assertEqual(outputs, [2 * item for item in range(300)])
+        self.assertEqual(pipeline.dropped_frames(), {"double": 0, "render": 0})
+        self.assertEqual([stage.processed for stage in pipeline.stages], [300, 300])
+
+    def test_drop_oldest_drops_frames_of_a_slow_pipeline(self):
+        outputs = []
+
+        def slow_render(item):
+            time.sleep(0.002)
+            outputs.append(item)
+
+        pipeline = Pipeline(range(300), [("double", lambda item: 2 * item), ("render", slow_render)],
+                            queue_size=2, drop_oldest=True)
+        self.assertEqual(self.run_pipeline(pipeline), [])
+        dropped = pipeline.dropped_frames()
+        self.assertGreater(dropped["double"] + dropped["render"], 0)
+        # The frames which are not dropped are delivered in order, the last ones are never dropped
+        self.assertEqual(outputs, sorted(outputs))
+        self.assertEqual(outputs[-1], 2 * 299)
+        self.assertEqual(len(outputs) + dropped["double"] + dropped["render"], 300)
+
+    def test_failing_stage_stops_the_pipeline(self):
+        def fail(item):
+            if item == 10:
+                raise ValueError("broken frame")
+            return item
+
+        pipeline = Pipeline(itertools.count(1), [("fail", fail), ("render", lambda item: None)], drop_oldest=False)
+        errors = self.run_pipeline(pipeline)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0].__cause__, ValueError)
+
+    def test_stop_ends_an_endless_source(self):
+        pipeline = Pipeline(itertools.count(1), [("double", lambda item: 2 * item), ("render", lambda item: None)],
+                            drop_oldest=False)
+        stopper = threading.Timer(0.1, pipeline.stop)
+        stopper.start()
+        self.assertEqual(self.run_pipeline(pipeline), [])
+        stopper.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
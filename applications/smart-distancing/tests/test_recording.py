@@ -0,0 +1,67 @@
+"""
+Round trip of the detector recordings of libs/recording.py.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from libs.detections import DetectionBatch
+from libs.recording import DetectionRecorder, merge_recordings, read_recording
+
+
+def detections(num_objects, seed):
+    rng = np.random.RandomState(seed)
+    corners = rng.uniform(0, 0.8, (num_objects, 2))
+    boxes = np.concatenate([corners, corners + 0.1], axis=1)
+    return DetectionBatch.from_arrays(boxes, scores=rng.uniform(size=num_objects),
+                                      class_ids=np.zeros(num_objects, dtype=np.int16))
+
+
+class RecordingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record(self, name, frames, frame_count):
+        path = os.path.join(self.directory, name)
+        recorder = DetectionRecorder(path, 25)
+        for frame_index, frame_detections in frames:
+            recorder.write(frame_index, frame_detections)
+        recorder.close(frame_count)
+        return path
+
+    def test_reused_frames_are_read_back(self):
+        path = self.record("video.rec", [(0, detections(3, 0)), (2, None), (3, None), (4, detections(0, 1))], 10)
+        fps, frame_count, frames = read_recording(path)
+        self.assertEqual((fps, frame_count), (25, 10))
+        self.assertEqual(list(frames), [0, 2, 3, 4])
+        self.assertIsNone(frames[2])
+        self.assertIsNone(frames[3])
+        np.testing.assert_array_equal(frames[0].boxes, detections(3, 0).boxes)
+        self.assertEqual(len(frames[4]), 0)
+
+    def test_merge_resolves_the_reused_warmup_frames(self):
+        # The second segment starts at frame 10 and its first frames reuse the detections of a warm-up frame
+        first = self.record("0.rec", [(0, detections(2, 0)), (5, None), (9, None)], 10)
+        second = self.record("1.rec", [(7, detections(4, 1)), (8, None), (10, None), (11, None),
+                                       (12, detections(1, 2))], 13)
+        path = os.path.join(self.directory, "merged.rec")
+        merge_recordings([(first, 0), (second, 10)], path)
+        _, frame_count, frames = read_recording(path)
+        self.assertEqual(frame_count, 13)
+        self.assertEqual(list(frames), [0, 5, 9, 10, 11, 12])
+        np.testing.assert_array_equal(frames[10].boxes, detections(4, 1).boxes)
+        self.assertIsNone(frames[11])
+
+
+if __name__ == '__main__':
+    unittest.main()
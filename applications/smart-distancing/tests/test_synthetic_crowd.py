@@ -0,0 +1,53 @@
+"""
+Determinism and bounds of the synthetic crowd of the Dummy device (libs/detectors/dummy/crowd.py).
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import numpy as np
+
+from libs.detectors.dummy.crowd import MIN_FEET_Y, SyntheticCrowd
+
+NUM_FRAMES = 300
+
+
+def sequence(crowd, num_frames=NUM_FRAMES):
+    # The detections of num_frames frames
+    batches = []
+    for _ in range(num_frames):
+        batches.append(crowd.detections())
+        crowd.step()
+    return batches
+
+
+class SyntheticCrowdTest(unittest.TestCase):
+
+    def test_same_seed_generates_the_same_sequence(self):
+        first = sequence(SyntheticCrowd(crowd_size=50, seed=7))
+        second = sequence(SyntheticCrowd(crowd_size=50, seed=7))
+        for first_batch, second_batch in zip(first, second):
+            np.testing.assert_array_equal(first_batch.data, second_batch.data)
+        other = sequence(SyntheticCrowd(crowd_size=50, seed=8), 1)
+        self.assertFalse(np.array_equal(first[0].boxes, other[0].boxes))
+
+    def test_persons_stay_on_the_floor(self):
+        # A fast crowd bounces off the borders of the floor many times
+        crowd = SyntheticCrowd(crowd_size=100, walking_speed=0.05, seed=3)
+        for batch in sequence(crowd):
+            self.assertTrue(np.all((batch.boxes >= 0) & (batch.boxes <= 1)))
+            self.assertTrue(np.all(batch.boxes[:, :2] <= batch.boxes[:, 2:]))
+            self.assertTrue(np.all((batch.scores >= 0) & (batch.scores <= 1)))
+            self.assertTrue(np.all((crowd.feet[:, 0] >= 0) & (crowd.feet[:, 0] <= 1)))
+            self.assertTrue(np.all((crowd.feet[:, 1] >= MIN_FEET_Y) & (crowd.feet[:, 1] <= 1)))
+        self.assertEqual(crowd.frame_index, NUM_FRAMES)
+
+    def test_missed_persons(self):
+        self.assertEqual(len(SyntheticCrowd(crowd_size=30, flicker_rate=0, occlusion_rate=0).detections()), 30)
+        self.assertEqual(len(SyntheticCrowd(crowd_size=30, flicker_rate=1).detections()), 0)
+        self.assertEqual(len(SyntheticCrowd(crowd_size=0).detections()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
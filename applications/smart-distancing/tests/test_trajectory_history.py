@@ -0,0 +1,83 @@
+"""
+Ring buffers of the trajectory history (libs/trajectory_history.py) and their alignment with the tracks of the
+assignment tracker.
+
+Usage (from applications/smart-distancing):
+    python -m pytest tests
+"""
+import unittest
+
+import numpy as np
+
+from libs.assignment_tracker import AssignmentTracker
+from libs.detections import DetectionBatch
+from libs.trajectory_history import TrajectoryHistory
+from tests.fixtures import person
+
+
+class TrajectoryHistoryTest(unittest.TestCase):
+
+    def test_wrapped_buffers_are_in_chronological_order(self):
+        history = TrajectoryHistory(length=4)
+        history.add_tracks(2)
+        for frame in range(6):
+            history.record(np.array([person(0.1 * frame, 0.2), person(0.5, 0.1 * frame)]), frame,
+                           np.array([frame % 2 == 0, True]))
+        self.assertEqual(history.counts.tolist(), [6, 6])
+        result = history.chronological()
+        np.testing.assert_array_equal(result["timestamps"], [[2, 3, 4, 5], [2, 3, 4, 5]])
+        np.testing.assert_allclose(result["positions"][0, :, 0], [0.25, 0.35, 0.45, 0.55])
+        np.testing.assert_allclose(result["positions"][1, :, 1], [0.35, 0.45, 0.55, 0.65])
+        np.testing.assert_array_equal(result["detected"][0], [True, False, True, False])
+        self.assertTrue(np.all(result["valid"]))
+
+    def test_short_tracks_are_padded(self):
+        history = TrajectoryHistory(length=4)
+        history.add_tracks(1)
+        history.record(np.array([person(0.1, 0.2)]), 0, np.array([True]))
+        history.add_tracks(1)
+        for frame in (1, 2):
+            history.record(np.array([person(0.1, 0.2), person(0.5, 0.2)]), frame, np.array([True, True]))
+        result = history.chronological()
+        np.testing.assert_array_equal(result["valid"], [[True, True, True, False], [True, True, False, False]])
+        np.testing.assert_array_equal(result["timestamps"][1, :2], [1, 2])
+        self.assertTrue(np.all(np.isnan(result["timestamps"][~result["valid"]])))
+        self.assertTrue(np.all(np.isnan(result["heights"][~result["valid"]])))
+        self.assertTrue(np.all(np.isnan(result["positions"][~result["valid"]])))
+        self.assertFalse(np.any(result["detected"][~result["valid"]]))
+        # A selection of rows
+        np.testing.assert_array_equal(history.chronological([1])["valid"], result["valid"][1:])
+
+
+class TrackerTrajectoryTest(unittest.TestCase):
+
+    def test_history_rows_follow_the_tracks(self):
+        tracker = AssignmentTracker(max_disappeared=0)
+        lanes = {0: 0.1, 1: 0.4, 2: 0.7}
+        for frame in range(5):
+            # The person of the middle lane leaves after the 2nd frame
+            ys = [y for track_id, y in lanes.items() if frame < 2 or track_id != 1]
+            tracker.update(DetectionBatch.from_arrays([person(0.1 + 0.02 * frame, y) for y in ys]))
+        self.assertEqual(tracker.tracks["track_id"].tolist(), [0, 2])
+        self.assertEqual(len(tracker.history), len(tracker.tracks))
+        for track_id in (0, 2):
+            trajectory = tracker.trajectory(track_id)
+            np.testing.assert_allclose(trajectory["positions"][:, 1], lanes[track_id] + 0.15, atol=1e-6)
+            np.testing.assert_allclose(trajectory["positions"][:, 0], 0.15 + 0.02 * np.arange(5), atol=1e-6)
+            np.testing.assert_array_equal(trajectory["timestamps"], np.arange(1, 6))
+        trajectories = tracker.trajectories()
+        self.assertEqual(trajectories["track_ids"].tolist(), [0, 2])
+        np.testing.assert_allclose(trajectories["positions"][:, 0, 1], [0.25, 0.85], atol=1e-6)
+
+    def test_removed_track_has_no_trajectory(self):
+        tracker = AssignmentTracker(max_disappeared=1)
+        tracker.update(DetectionBatch.from_arrays([person(0.1, 0.2)]))
+        tracker.update(DetectionBatch())
+        self.assertIsNotNone(tracker.trajectory(0))
+        tracker.update(DetectionBatch())
+        self.assertIsNone(tracker.trajectory(0))
+        self.assertIsNone(tracker.trajectory(42))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,18 +3,23 @@ This module includes set of functions that apply as a post-processing to the det
 """
 import numpy as np
 
+from libs.spatial_hash import SparseDistances
+
 
 def extract_violating_objects(distances, dist_threshold):
     """Extract pair of objects that are closer than the distance threshold.
 
     Args:
-        distances: A 2-d numpy array that stores distance between each pair of objects.
+        distances: A 2-d numpy array that stores distance between each pair of objects, or a SparseDistances
+        instance that stores only the distances of the close pairs.
         dist_threshold: the minimum distance for considering unsafe distance between objects
 
     Returns:
         violating_objects: A 2-d numpy array where each row is the ids of the objects that violated the social distancing.
 
     """
+    if isinstance(distances, SparseDistances):
+        return distances.violating_pairs(dist_threshold)
     triu_distances = np.triu(distances) + np.tril((float(dist_threshold) + 1) * np.ones(distances.shape))
     violating_objects = np.argwhere(triu_distances < float(dist_threshold))
     return violating_objects
@@ -26,6 +26,7 @@ import PIL.ImageColor as ImageColor
 import PIL.ImageDraw as ImageDraw
 import PIL.ImageFont as ImageFont
 import cv2 as cv
+from libs.detections import DetectionBatch
 
 _TITLE_LEFT_MARGIN = 10
 _TITLE_TOP_MARGIN = 10
@@ -396,49 +397,34 @@ def visualization_preparation(nn_out, distances, dist_threshold):
     prepare the objects boxes and id in order to visualize
 
     Args:
-        nn_out: a list of dicionary contains normalized numbers of bonding boxes
+        nn_out: a DetectionBatch of the objects, or a list of dicionary contains normalized numbers of bonding boxes
         {'id' : '0-0', 'bbox' : [x0, y0, x1, y1], 'score' : 0.99(optional} of shape [N, 3] or [N, 2]
-        distances: a symmetric matrix of normalized distances
+        distances: a symmetric matrix of normalized distances (or a SparseDistances instance)
         dist_threshold: the minimum distance for considering unsafe distance between objects
     Returns:
         an output dictionary contains object classes, boxes, scores
     """
     output_dict = {}
-    detection_classes = []
-    detection_scores = []
-    detection_boxes = []
-    is_violating = []
-    colors = []
-
-    distance = np.amin(distances + np.identity(len(distances)) * dist_threshold * 2, 0) if distances != [] else [dist_threshold]
-    for i, obj in enumerate(nn_out):
-        # Colorizing bounding box based on the distances between them
-        # R = 255 when dist=0 and R = 0 when dist > dist_threshold
-        redness_factor = 1.5
-        r_channel = np.maximum(255 * (dist_threshold - distance[i]) / dist_threshold, 0) * redness_factor
-        g_channel = 255 - r_channel
-        b_channel = 0
-        # Create a tuple object of colors
-        color = (int(b_channel), int(g_channel), int(r_channel))
-        # Get the object id
-        obj_id = obj["id"]
-        # Split and get the first item of obj_id
-        obj_id = obj_id.split("-")[0]
-        box = obj["bbox"]
-        if "score" in obj:
-            score = obj["score"]
-        else:
-            score = 1.0
-        # Append all processed items
-        detection_classes.append(int(obj_id))
-        detection_scores.append(score)
-        detection_boxes.append(box)
-        colors.append(color)
-        is_violating.append(True) if distance[i] < dist_threshold else is_violating.append(False)
-    output_dict["detection_boxes"] = np.array(detection_boxes)
-    output_dict["detection_scores"] = detection_scores
-    output_dict["detection_classes"] = detection_classes
-    output_dict["violating_objects"] = is_violating
+    nn_out = DetectionBatch.from_dicts(nn_out)
+
+    if hasattr(distances, "min_distances"):
+        # Sparse distances (see libs/spatial_hash.py) only store the pairs closer than the threshold
+        distance = distances.min_distances(dist_threshold)
+    else:
+        distance = np.amin(distances + np.identity(len(distances)) * dist_threshold * 2, 0) if len(distances) > 0 else [dist_threshold]
+    distance = np.asarray(distance, dtype=np.float64)[:len(nn_out)]
+    # Colorizing bounding box based on the distances between them
+    # R = 255 when dist=0 and R = 0 when dist > dist_threshold
+    redness_factor = 1.5
+    r_channel = np.maximum(255 * (dist_threshold - distance) / dist_threshold, 0) * redness_factor
+    g_channel = 255 - r_channel
+    b_channel = 0
+    # Create a tuple object of colors
+    colors = [(b_channel, int(g), int(r)) for g, r in zip(g_channel, r_channel)]
+    output_dict["detection_boxes"] = nn_out.boxes.astype(np.float64)
+    output_dict["detection_scores"] = nn_out.scores.tolist()
+    output_dict["detection_classes"] = nn_out.class_ids.tolist()
+    output_dict["violating_objects"] = (distance < dist_threshold).tolist()
     output_dict["detection_colors"] = colors
     return output_dict
 
@@ -466,6 +452,39 @@ def birds_eye_view(input_frame, boxes, is_violating):
     return input_frame
 
 
+def birds_eye_view_ground(input_frame, ground_points, is_violating, bounds, margin=0.1):
+    """
+    This function receives a black window and draws circles at the floor positions of the objects of a
+    calibrated camera, a true top-down view of the floor (see libs/ground_plane.py).
+    Args:
+        input_frame: uint8 numpy array with shape (img_height, img_width, 3)
+        ground_points: A numpy array of shape [N, 2], (x, y) floor positions in metres, NaN if unknown
+        is_violating: List of boolean (True/False) which indicates the correspond object at ground_points is
+        a violating object or not
+        bounds: (xmin, ymin, xmax, ymax) of the calibrated area of the floor in metres, it fills the window
+        margin: Fraction of the window left around the calibrated area
+
+    Returns:
+        input_frame: Frame with red and green circles
+
+    """
+    h, w = input_frame.shape[0:2]
+    xmin, ymin, xmax, ymax = [float(value) for value in bounds]
+    # Same scale on both axes so the distances in the view are true to the floor
+    scale = (1 - 2 * margin) * min(w / max(xmax - xmin, 1e-6), h / max(ymax - ymin, 1e-6))
+    offset_x = (w - scale * (xmax - xmin)) / 2 - scale * xmin
+    offset_y = (h - scale * (ymax - ymin)) / 2 - scale * ymin
+    cv.rectangle(input_frame, (int(offset_x + scale * xmin), int(offset_y + scale * ymin)),
+                 (int(offset_x + scale * xmax), int(offset_y + scale * ymax)), (80, 80, 80), 1)
+    for i, point in enumerate(np.asarray(ground_points).reshape(-1, 2)):
+        if not np.all(np.isfinite(point)):
+            continue
+        center_coordinates = (int(offset_x + scale * point[0]), int(offset_y + scale * point[1]))
+        color = (0, 0, 255) if is_violating[i] else (0, 255, 0)
+        input_frame = cv.circle(input_frame, center_coordinates, 2, color, 2)
+    return input_frame
+
+
 def text_putter(input_frame, txt, origin, fontscale=0.75, color=(255, 0, 20), thickness=2):
     """
     The function renders the specified text string in the image. This function does not return a
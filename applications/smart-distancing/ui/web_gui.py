@@ -4,12 +4,16 @@ import cv2 as cv
 import numpy as np
 from datetime import date
 from flask import Flask
+from flask import abort
 from flask import render_template
 from flask import Response
+from flask import jsonify
+from flask import request
 
 from .utils import visualization_utils as vis_util
 from tools.objects_post_process import extract_violating_objects
 from tools.environment_score import mx_environment_scoring_consider_crowd
+from libs.metrics import format_prometheus
 
 
 class WebGUI:
@@ -18,15 +22,18 @@ class WebGUI:
     Once it is created it will act as a central application for viewing outputs.
 
     :param config: Is a ConfigEngine instance which provides necessary parameters.
-    :param engine_instance:  A ConfigEngine object which store all of the config parameters. Access to any parameter
-        is possible by calling get_section_dict method.
+    :param engine_instance:  A Distancing instance, or a list of Distancing instances (one for each camera),
+        which process the videos and pass the results to the ui.
     """
 
     def __init__(self, config, engine_instance):
         self.config = config
-        self.__ENGINE_INSTANCE = engine_instance
-        self._output_frame = None
-        self._birds_view = None
+        if not isinstance(engine_instance, (list, tuple)):
+            engine_instance = [engine_instance]
+        self.__ENGINE_INSTANCES = list(engine_instance)
+        # Output frames of each camera, keyed by the camera id
+        self._output_frame = {}
+        self._birds_view = {}
         self._lock = threading.Lock()
         self._host = self.config.get_section_dict("App")["Host"]
         self._port = int(self.config.get_section_dict("App")["Port"])
@@ -38,13 +45,28 @@ class WebGUI:
         file_name = str(date.today()) + '.csv'
         self.objects_log = './static/data/objects_log/' + file_name
 
-    def update(self, input_frame, nn_out, distances):
+    def _check_camera(self, camera_id):
+        # Answer 404 to the requests of a camera which does not exist, its frames would never be available
+        if not 0 <= camera_id < len(self.__ENGINE_INSTANCES):
+            abort(404)
+
+    def _objects_log(self, camera_id):
+        # Path of the objects log of a camera, each camera of a multi-camera config has its own log directory
+        self._check_camera(camera_id)
+        if len(self.__ENGINE_INSTANCES) == 1:
+            return self.objects_log
+        file_name = str(date.today()) + '.csv'
+        source_name = self.__ENGINE_INSTANCES[camera_id].source["Name"]
+        return './static/data/' + source_name + '/objects_log/' + file_name
+
+    def update(self, input_frame, nn_out, distances, camera_id=0):
         """
         Args:
             input_frame: uint8 numpy array with shape (img_height, img_width, 3)
-            nn_out: List of dicionary contains normalized numbers of bounding boxes
-            {'id' : '0-0', 'bbox' : [x0, y0, x1, y1], 'score' : 0.99(optional} of shape [N, 3] or [N, 2]
+            nn_out: A DetectionBatch of the objects (or a list of dicionary contains normalized numbers of bounding
+            boxes {'id' : '0-0', 'bbox' : [x0, y0, x1, y1], 'score' : 0.99(optional} of shape [N, 3] or [N, 2])
             distances: a symmetric matrix of normalized distances
+            camera_id: Id of the video source which the frame belongs to
 
         Returns:
             draw the bounding boxes to an output frame
@@ -72,11 +94,18 @@ class WebGUI:
             use_normalized_coordinates=True,
             line_thickness=3,
         )
-        # TODO: Implement perspective view for objects
-        birds_eye_window = vis_util.birds_eye_view(birds_eye_window, output_dict["detection_boxes"],
-                                                   output_dict["violating_objects"])
+        ground_plane = self.__ENGINE_INSTANCES[camera_id].ground_plane
+        if ground_plane is not None:
+            # Top-down view of the floor of a calibrated camera
+            width, height = ground_plane.resolution
+            boxes = output_dict["detection_boxes"] * [width, height, width, height]
+            birds_eye_window = vis_util.birds_eye_view_ground(birds_eye_window, ground_plane.ground_positions(boxes),
+                                                              output_dict["violating_objects"], ground_plane.bounds)
+        else:
+            birds_eye_window = vis_util.birds_eye_view(birds_eye_window, output_dict["detection_boxes"],
+                                                       output_dict["violating_objects"])
         try:
-            self._displayed_items['fps'] = self.__ENGINE_INSTANCE.detector.fps
+            self._displayed_items['fps'] = self.__ENGINE_INSTANCES[camera_id].detector.fps
         except:
             # fps is not implemented for the detector instance"
             self._displayed_items['fps'] = None
@@ -85,6 +114,10 @@ class WebGUI:
         # region
         # -_- -_- -_- -_- -_- -_- -_- -_- -_- -_- -_- -_- -_- -_-
         txt_fps = 'Frames rate = ' + str(self._displayed_items['fps']) + '(fps)'  # Frames rate = 95 (fps)
+        if len(self.__ENGINE_INSTANCES) > 1:
+            # The detector is shared, also put the throughput of this camera
+            stream_fps = self.__ENGINE_INSTANCES[camera_id].stats.report()['fps']
+            txt_fps += ' Camera = ' + str(stream_fps) + '(fps)'  # Frames rate = 95 (fps) Camera = 24.5(fps)
         # (0, 0) is the top-left (x,y); normalized number between 0-1
         origin = (0.05, 0.93)
         vis_util.text_putter(input_frame, txt_fps, origin)
@@ -104,8 +137,8 @@ class WebGUI:
 
         # Lock the main thread and copy input_frame to output_frame
         with self._lock:
-            self._output_frame = input_frame.copy()
-            self._birds_view = birds_eye_window.copy()
+            self._output_frame[camera_id] = input_frame.copy()
+            self._birds_view[camera_id] = birds_eye_window.copy()
 
     def create_flask_app(self):
         # Create and return a flask instance named 'app'
@@ -114,37 +147,77 @@ class WebGUI:
         @app.route("/")
         def _index():
             # Render a html file located at templates as home page
-            return render_template("index.html")
+            cameras = [(engine.source_id, engine.source["Name"]) for engine in self.__ENGINE_INSTANCES]
+            return render_template("index.html", cameras=cameras)
 
         @app.route("/video_feed")
-        def video_feed():
+        @app.route("/video_feed/<int:camera_id>")
+        def video_feed(camera_id=0):
+            self._check_camera(camera_id)
             # Return the response generated along with the specific media
             # Type (mime type)
             return Response(
-                self._generate(1), mimetype="multipart/x-mixed-replace; boundary=frame"
+                self._generate(1, camera_id), mimetype="multipart/x-mixed-replace; boundary=frame"
             )
 
         @app.route("/birds_view_feed")
-        def birds_view_feed():
+        @app.route("/birds_view_feed/<int:camera_id>")
+        def birds_view_feed(camera_id=0):
+            self._check_camera(camera_id)
             # Return the response generated along with the specific media
             # Type (mime type)
             return Response(
-                self._generate(2), mimetype="multipart/x-mixed-replace; boundary=frame"
+                self._generate(2, camera_id), mimetype="multipart/x-mixed-replace; boundary=frame"
             )
 
         @app.route("/visualize_logs", methods=['GET'])
         def visualizer_page():
             # Render a html file located at templates as home page
-            path = [self.objects_log]
+            camera_id = request.args.get("camera", default=0, type=int)
+            path = [self._objects_log(camera_id)]
             return render_template("visualizer.html", csv_path=path)
 
+        @app.route("/stats")
+        def stats():
+            # Return the throughput and latency of each camera separately
+            return jsonify({
+                engine.source["Name"]: engine.stats.report() for engine in self.__ENGINE_INSTANCES
+            })
+
+        @app.route("/metrics")
+        def metrics():
+            # Return the stage latency histograms, queue depths and dropped frames in the Prometheus text format
+            return Response(self._metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
         return app
 
-    def _generate(self, out_frame: int):
+    def _metrics(self):
+        sources = []
+        for engine in self.__ENGINE_INSTANCES:
+            try:
+                fps = engine.detector.fps
+            except:
+                # fps is not implemented for the detector instance
+                fps = None
+            sources.append({
+                "camera": engine.source["Name"],
+                "metrics": engine.metrics,
+                "queue_depths": engine.queue_depths(),
+                "dropped_frames": engine.dropped_frames(),
+                "frames": engine.stats.frames,
+                "fps": fps,
+                "distance_work": engine.distance_work(),
+                "gated_inferences": engine.gated_inferences(),
+                "latency_control": engine.latency_control(),
+            })
+        return format_prometheus(sources)
+
+    def _generate(self, out_frame: int, camera_id: int = 0):
         """
         Args:
             out_frame: The name of required frame. out_frame = 1 encoded camera/video frame otherwise
             encoded birds-eye window
+            camera_id: Id of the video source
 
         Returns:
             Yield and encode output_frame for flask the response object that is used by default in Flask
@@ -153,11 +226,14 @@ class WebGUI:
             with self._lock:
                 # Check if the output frame is available, otherwise skip
                 # The iteration of the loop
-                if self._output_frame is None:
+                if self._output_frame.get(camera_id) is None:
                     continue
                 # Encode the frames in JPEG format
-                (flag, encoded_birds_eye_img) = cv.imencode(".jpeg", self._birds_view)
-                (flag, encoded_input_img) = cv.imencode(".jpeg", self._output_frame)
+                engine = self.__ENGINE_INSTANCES[camera_id]
+                encode_params = [int(cv.IMWRITE_JPEG_QUALITY), engine.jpeg_quality()]
+                with engine.metrics.time("jpeg_encode"):
+                    (flag, encoded_birds_eye_img) = cv.imencode(".jpeg", self._birds_view[camera_id], encode_params)
+                    (flag, encoded_input_img) = cv.imencode(".jpeg", self._output_frame[camera_id], encode_params)
                 # Ensure the frame was successfully encoded
                 if not flag:
                     continue
@@ -182,10 +258,13 @@ class WebGUI:
         """
         Start the thread's activity.
         It must be called at most once. It runes self._run method on a separate thread and starts
-        process_video method at engine instance
+        process_video method at each engine instance (one thread per camera)
         """
         threading.Thread(target=self._run).start()
         time.sleep(1)
-        # Get video file path from the config
-        video_path = self.config.get_section_dict("App")["VideoPath"]
-        self.__ENGINE_INSTANCE.process_video(video_path)
+        # Each engine processes the VideoPath of its own video source
+        engine_threads = [threading.Thread(target=engine.process_video) for engine in self.__ENGINE_INSTANCES]
+        for engine_thread in engine_threads:
+            engine_thread.start()
+        for engine_thread in engine_threads:
+            engine_thread.join()